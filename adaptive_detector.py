@@ -0,0 +1,155 @@
+import cv2
+import os
+import time
+import logging
+import face_recognition
+import numpy as np
+from collections import deque, namedtuple
+
+DETECT_SCALES = tuple(float(s) for s in os.getenv('FACE_DETECT_SCALES', '0.25,0.33,0.5,0.75,1.0').split(','))
+PROBE_EVERY = int(os.getenv('FACE_DETECT_PROBE_EVERY', '50'))
+ENCODE_SCALE = os.getenv('FACE_ENCODE_SCALE', '')
+
+# HOG finds faces down to ~40 px once face_locations upsamples once; keep some margin
+MIN_FACE_PX = 40
+MARGIN = 1.5
+# Smallest crop HOG is run on when searching regions, in detection pixels
+MIN_REGION_PX = 64
+
+
+class Detection(namedtuple('Detection', 'image scale locations face_locations')):
+    """Faces found in ``image`` (the resized RGB frame) and the same boxes in input coordinates"""
+
+    def to_image(self, face_locations):
+        """Map input-frame boxes to ``image`` coordinates, e.g. for encoding"""
+        return [tuple(int(round(v * self.scale)) for v in box) for box in face_locations]
+
+
+class AdaptiveDetector:
+    """HOG detection at the smallest resolution that still finds the faces being seen
+
+    Recent face sizes (in input pixels, over the last ``memory`` seconds) are
+    kept, and the smallest scale that still makes the smallest of them
+    detectable is used. Distant faces are typically only seen by probes, so
+    a single sighting is enough to raise the scale until it ages out. With
+    no faces seen, the smallest scale is used. Every ``probe_every`` calls
+    one detection runs at the largest scale so that faces too small for the
+    current scale are still noticed and pull the scale up.
+    """
+
+    def __init__(self, scales=DETECT_SCALES, probe_every=PROBE_EVERY, memory=30.0,
+                 bgr=False, model="hog", metrics=None):
+        self.scales = sorted(scales)
+        self.probe_every = probe_every
+        self.memory = memory
+        self.bgr = bgr
+        self.model = model
+        self.metrics = metrics
+        self.scale = self.scales[0]
+        self.calls = 0
+        self._sizes = deque()
+
+    def detect(self, frame, regions=None):
+        """Find faces in a frame (BGR when ``bgr``, else RGB) and return a Detection
+
+        With ``regions`` (input-frame boxes, see RegionPlanner) HOG only runs
+        inside them. The whole frame is still resized, so the Detection image
+        can be used for encoding. Probes always scan the full frame.
+        """
+        self.calls += 1
+        probe = self.probe_every and self.calls % self.probe_every == 0 and self.scale < self.scales[-1]
+        scale = self.scales[-1] if probe else self.scale
+
+        image = frame if scale == 1.0 else cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        if self.bgr:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        if regions is None or probe:
+            locations = face_recognition.face_locations(image, model=self.model)
+        else:
+            locations = self._detect_regions(image, scale, regions)
+        face_locations = [tuple(int(round(v / scale)) for v in box) for box in locations]
+
+        if probe and self.metrics is not None:
+            self.metrics.count('detect_probes')
+        self._observe(face_locations)
+        return Detection(image, scale, locations, face_locations)
+
+    def _detect_regions(self, image, scale, regions):
+        """HOG on each region's crop of the resized image, in image coordinates"""
+        height, width = image.shape[:2]
+        locations = []
+        for top, right, bottom, left in regions:
+            # Keep enough context around small regions for the detector window
+            top, bottom = _widen(int(top * scale), int(bottom * scale), MIN_REGION_PX, height)
+            left, right = _widen(int(left * scale), int(right * scale), MIN_REGION_PX, width)
+            crop = np.ascontiguousarray(image[top:bottom, left:right])
+            for t, r, b, l in face_recognition.face_locations(crop, model=self.model):
+                box = (t + top, r + left, b + top, l + left)
+                # Widened regions can overlap; keep one box per face
+                centre_y, centre_x = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+                if not any(o[0] <= centre_y <= o[2] and o[3] <= centre_x <= o[1] for o in locations):
+                    locations.append(box)
+        return locations
+
+    def _observe(self, face_locations):
+        now = time.monotonic()
+        for top, right, bottom, left in face_locations:
+            self._sizes.append((now, min(bottom - top, right - left)))
+        while self._sizes and now - self._sizes[0][0] > self.memory:
+            self._sizes.popleft()
+
+        scale = self._choose(min((size for _, size in self._sizes), default=None))
+        if scale != self.scale:
+            logging.info(f"Detection scale {self.scale} -> {scale} "
+                         f"({len(self._sizes)} recent faces)")
+            self.scale = scale
+
+    def _choose(self, smallest):
+        """Smallest scale at which a face of ``smallest`` input pixels is still detectable"""
+        if smallest is None:
+            return self.scales[0]
+        for scale in self.scales:
+            if smallest * scale >= MIN_FACE_PX * MARGIN:
+                return scale
+        return self.scales[-1]
+
+
+def encode_scale_from_env(default=None):
+    """FACE_ENCODE_SCALE as a float, None for 'detect' (reuse the detection image), else ``default``"""
+    if not ENCODE_SCALE:
+        return default
+    if ENCODE_SCALE == 'detect':
+        return None
+    return float(ENCODE_SCALE)
+
+
+def encode_faces(frame, detection, face_locations, scale=None, bgr=False):
+    """Encode all given faces (input-frame boxes) with one face_encodings call
+
+    ``scale`` sets the encode resolution independently of the detection
+    resolution: None reuses the detection image, 1.0 encodes from the full
+    frame (BGR when ``bgr``), anything else resizes the frame once.
+    """
+    if not face_locations:
+        return []
+    if scale is None or scale == detection.scale:
+        image, scale = detection.image, detection.scale
+    else:
+        image = frame if scale == 1.0 else cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        if bgr:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    boxes = [tuple(int(round(v * scale)) for v in box) for box in face_locations]
+    return face_recognition.face_encodings(image, boxes)
+
+
+def _widen(low, high, minimum, limit):
+    """Grow [low, high) to at least ``minimum`` long, staying inside [0, limit)"""
+    missing = minimum - (high - low)
+    if missing > 0:
+        low -= missing // 2
+        high += missing - missing // 2
+    if low < 0:
+        high, low = high - low, 0
+    if high > limit:
+        low, high = max(0, low - (high - limit)), limit
+    return low, high
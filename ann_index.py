@@ -0,0 +1,169 @@
+import os
+import logging
+import numpy as np
+
+# Smaller galleries are searched exactly: too few vectors for meaningful
+# clusters, and a full scan of them is cheap anyway
+MIN_TRAINING_ROWS = 1024
+# The clusters are re-learned once a gallery has grown this many times past its training size
+RETRAIN_GROWTH = 4
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index over face encodings
+
+    Encodings are partitioned into ``n_lists`` k-means clusters. A search only
+    visits the ``n_probe`` clusters closest to the query and returns the keys
+    stored there as candidates, so callers re-rank them with exact distances.
+    Raising ``n_probe`` trades latency for recall.
+
+    FaceGallery only trains the index once it holds MIN_TRAINING_ROWS
+    encodings, and builds a fresh one when the gallery has grown
+    RETRAIN_GROWTH times past the training size (see needs_training).
+    """
+
+    def __init__(self, n_lists=None, n_probe=8, train_iterations=10, seed=0):
+        self.n_lists = n_lists
+        self._requested_lists = n_lists
+        self.n_probe = n_probe
+        self.train_iterations = train_iterations
+        self.seed = seed
+        self.centroids = None
+        self.trained_rows = 0
+        self._lists = []
+        self._key_list = {}
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def __len__(self):
+        return len(self._key_list)
+
+    def train(self, vectors):
+        """Learn the coarse clusters with k-means on (a sample of) the vectors"""
+        vectors = np.asarray(vectors, dtype=np.float64)
+        rng = np.random.default_rng(self.seed)
+        n_lists = self.n_lists or max(1, int(4 * np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+        if n_lists == 0:
+            raise ValueError("Cannot train an index without vectors")
+
+        # A few dozen points per cluster is enough for the coarse quantizer, and
+        # float32 halves the cost of the assignment products
+        sample_size = min(len(vectors), 64 * n_lists)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)].astype(np.float32)
+        centroids = kmeans(sample, n_lists, self.train_iterations, rng)
+
+        self.n_lists = n_lists
+        self.trained_rows = len(vectors)
+        self.centroids = centroids.astype(np.float64)
+        self._sq_centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        self._lists = [np.empty(0, dtype=np.int64) for _ in range(n_lists)]
+        self._key_list = {}
+        logging.info(f"Trained IVF index with {n_lists} lists on {sample_size} vectors")
+
+    def needs_training(self, size):
+        """Whether a gallery of ``size`` encodings should (re)build this index instead of updating it"""
+        if not self.is_trained:
+            return size >= MIN_TRAINING_ROWS
+        return size >= RETRAIN_GROWTH * self.trained_rows
+
+    def add(self, keys, vectors):
+        """Add integer keys with their vectors, training first if needed"""
+        keys = np.asarray(keys, dtype=np.int64).ravel()
+        vectors = np.asarray(vectors, dtype=np.float64).reshape(len(keys), -1)
+        if not len(keys):
+            return
+        if not self.is_trained:
+            self.train(vectors)
+
+        self.remove([key for key in keys.tolist() if key in self._key_list])
+        assignment = self._nearest_lists(vectors, self.centroids, 1)[:, 0]
+        order = np.argsort(assignment, kind='stable')
+        lists, starts = np.unique(assignment[order], return_index=True)
+        for list_id, group in zip(lists, np.split(keys[order], starts[1:])):
+            self._lists[list_id] = np.concatenate((self._lists[list_id], group))
+            for key in group.tolist():
+                self._key_list[key] = int(list_id)
+
+    def remove(self, keys):
+        """Remove keys from the index, ignoring keys that are not present"""
+        by_list = {}
+        for key in keys:
+            list_id = self._key_list.pop(int(key), None)
+            if list_id is not None:
+                by_list.setdefault(list_id, []).append(int(key))
+
+        for list_id, removed in by_list.items():
+            members = self._lists[list_id]
+            self._lists[list_id] = members[~np.isin(members, removed)]
+
+    def empty_copy(self):
+        """Untrained index with the same settings, for building a fresh gallery"""
+        return IVFIndex(self._requested_lists, self.n_probe, self.train_iterations, self.seed)
+
+    def copy(self):
+        """Independent copy sharing the (read-only) trained centroids"""
+        clone = IVFIndex(self.n_lists, self.n_probe, self.train_iterations, self.seed)
+        clone._requested_lists = self._requested_lists
+        if self.is_trained:
+            clone.trained_rows = self.trained_rows
+            clone.centroids = self.centroids
+            clone._sq_centroid_norms = self._sq_centroid_norms
+            clone._lists = [members.copy() for members in self._lists]
+            clone._key_list = dict(self._key_list)
+        return clone
+
+    def candidates(self, queries, n_probe=None):
+        """Keys stored in the n_probe lists nearest to each query"""
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, self.centroids.shape[1])
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        probes = self._nearest_lists(queries, self.centroids, n_probe, self._sq_centroid_norms)
+        return [np.concatenate([self._lists[list_id] for list_id in row]) for row in probes]
+
+    @staticmethod
+    def _nearest_lists(vectors, centroids, n, sq_centroid_norms=None):
+        """Indices of the n closest centroids for every vector (unordered)"""
+        if sq_centroid_norms is None:
+            sq_centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        # |v|^2 is constant per row, so it does not change the ranking
+        scores = sq_centroid_norms[None, :] - 2.0 * (vectors @ centroids.T)
+        if n >= scores.shape[1]:
+            return np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        if n == 1:
+            return np.argmin(scores, axis=1)[:, None]
+        return np.argpartition(scores, n - 1, axis=1)[:, :n]
+
+
+def kmeans(sample, n_clusters, iterations, rng):
+    """Lloyd's k-means over the rows of ``sample``, seeded from random sample points"""
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = IVFIndex._nearest_lists(sample, centroids, 1)[:, 0]
+        counts = np.bincount(assignment, minlength=n_clusters)
+        order = np.argsort(assignment, kind='stable')
+        occupied = np.flatnonzero(counts)
+        sums = np.zeros_like(centroids)
+        sums[occupied] = np.add.reduceat(sample[order], np.cumsum(counts)[occupied] - counts[occupied])
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters from random sample points
+        if empty.any():
+            centroids[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+    return centroids
+
+
+def index_from_env():
+    """Build an IVF index when FACE_ANN_INDEX=ivf, otherwise None (exact matching)
+
+    FACE_ANN_LISTS and FACE_ANN_PROBE tune the number of clusters and how many
+    of them each search visits.
+    """
+    if os.getenv('FACE_ANN_INDEX', '').lower() != 'ivf':
+        return None
+    n_lists = int(os.getenv('FACE_ANN_LISTS', '0')) or None
+    n_probe = int(os.getenv('FACE_ANN_PROBE', '8'))
+    return IVFIndex(n_lists=n_lists, n_probe=n_probe)
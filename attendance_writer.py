@@ -0,0 +1,198 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 1.0
+MAX_PENDING = 10000
+MAX_RETRIES = 5
+
+
+class AttendanceWriter:
+    """Write-behind attendance marks flushed as multi-row inserts
+
+    submit() only enqueues; a background thread flushes when ``batch_size``
+    marks are waiting or ``flush_interval`` seconds after the oldest one
+    arrived. Duplicates are resolved by the unique_attendance (student_id, date)
+    key, so no SELECT is needed. The queue is bounded: when it is full, submit()
+    waits up to ``timeout`` and then rejects the mark. Pending marks are flushed
+    on close() and at interpreter exit.
+
+    With a ``marked`` DailyAttendanceSet, students already marked today are
+    rejected before any queueing or database work, and marks that could not
+    be written are removed again so the next sighting retries. ``on_failed``
+    is called as on_failed(student_id, date) for those marks too, for callers
+    keeping their own record of who was marked.
+
+    Each flush is recorded as the 'mark' stage of ``metrics`` when given.
+    """
+
+    def __init__(self, connect, status='present', recorded_by=None, marked=None,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING,
+                 metrics=None, on_failed=None):
+        self.connect = connect
+        self.marked = marked
+        self.on_failed = on_failed
+        self.metrics = metrics
+        self.status = status
+        self.recorded_by = recorded_by
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._retry = []
+        self._retries = 0
+        self.dropped = 0
+
+    def submit(self, student_id, when=None, status=None, notes=None, timeout=0.05):
+        """Queue a mark; False when already marked today, saturated or closed"""
+        if self._stop.is_set():
+            return False
+
+        when = when or datetime.now()
+        if self.marked is not None and not self.marked.add(student_id, when.date()):
+            return False
+        self._ensure_started()
+
+        mark = (student_id, when.date(), when.time().replace(microsecond=0),
+                status or self.status, notes)
+        try:
+            self._queue.put(mark, timeout=timeout)
+            return True
+        except queue.Full:
+            self._forget(mark)
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                logging.warning(f"Attendance writer backlog full, {self.dropped} marks rejected so far")
+            return False
+
+    def pending(self):
+        return self._queue.qsize() + len(self._retry)
+
+    def close(self, timeout=10):
+        """Stop accepting marks and flush everything still queued"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # Its own final flush is still running; a second one would race it
+                logging.warning(f"Attendance writer still flushing after {timeout}s, "
+                                f"{self.pending()} marks not yet written")
+                return
+        # Catch marks that raced with shutdown
+        self._drain_and_flush()
+
+    def _forget(self, mark):
+        """Keep the daily set and the caller consistent with marks that were never written"""
+        if self.marked is not None:
+            self.marked.discard(mark[0], mark[1])
+        if self.on_failed is not None:
+            try:
+                self.on_failed(mark[0], mark[1])
+            except Exception as e:
+                logging.error(f"Attendance failure callback failed for {mark[0]}: {e}")
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = list(self._retry)
+            self._retry = []
+            try:
+                if not batch:
+                    batch.append(self._queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                continue
+
+            # Collect until the batch is full or the oldest mark is due
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            if self._flush(batch):
+                self._retries = 0
+                continue
+
+            self._retries += 1
+            if self._retries > MAX_RETRIES:
+                logging.error(f"Dropping {len(batch)} attendance marks after {MAX_RETRIES} retries")
+                for mark in batch:
+                    self._forget(mark)
+                self._retries = 0
+            else:
+                # Back off while the database is unavailable
+                self._retry = batch
+                self._stop.wait(min(2 ** self._retries, 30))
+
+        self._drain_and_flush()
+
+    def _drain_and_flush(self):
+        """Final synchronous flush used on shutdown"""
+        batch, self._retry = self._retry, []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        unsaved = 0
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            if not self._flush(chunk):
+                unsaved += len(chunk)
+        if unsaved:
+            logging.error(f"Attendance writer shut down with {unsaved} unsaved marks")
+
+    def _flush(self, batch):
+        """Write one batch as a single multi-row insert; returns False on failure"""
+        if not batch:
+            return True
+        if self.recorded_by is None:
+            columns = "(student_id, date, time, status)"
+            rows = [mark[:4] for mark in batch]
+        else:
+            columns = "(student_id, date, time, status, recorded_by, notes)"
+            rows = [mark[:4] + (self.recorded_by, mark[4]) for mark in batch]
+
+        placeholders = ", ".join(["(" + ", ".join(["%s"] * len(rows[0])) + ")"] * len(rows))
+        params = [value for row in rows for value in row]
+        start = time.perf_counter()
+        try:
+            with self.connect() as conn:
+                cursor = conn.cursor()
+                try:
+                    # The no-op update lets unique_attendance absorb duplicates
+                    cursor.execute(f"""
+                        INSERT INTO attendance {columns}
+                        VALUES {placeholders}
+                        ON DUPLICATE KEY UPDATE student_id = student_id
+                    """, params)
+                    conn.commit()
+                    inserted = cursor.rowcount
+                finally:
+                    cursor.close()
+            if self.metrics is not None:
+                self.metrics.observe('mark', time.perf_counter() - start)
+            logging.info(f"Flushed {len(batch)} attendance marks ({inserted} new)")
+            return True
+        except Exception as e:
+            logging.error(f"Error flushing {len(batch)} attendance marks: {e}")
+            return False
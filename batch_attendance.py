@@ -0,0 +1,195 @@
+import cv2
+import os
+import re
+import time
+import logging
+import argparse
+import multiprocessing as mp
+from datetime import datetime, timedelta
+from recognition_pipeline import RecognitionPipeline
+from multi_camera import IMAGE_EXTENSIONS
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Snapshot names such as 20241104_083015.jpg or cam1-2024-11-04 08.30.15.png
+FILENAME_TIME = re.compile(r'(\d{4})\D?(\d{2})\D?(\d{2})\D?(\d{2})\D?(\d{2})\D?(\d{2})')
+
+
+def video_frames(path, start=None, sample_fps=None):
+    """Yield (frame, timestamp) from a video file without display or waitKey
+
+    Timestamps are ``start`` plus the frame's position in the file; by default
+    the recording is assumed to have ended at the file's modification time.
+    Frames not needed for ``sample_fps`` are only grabbed, never decoded.
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"could not open {path}")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25
+        if start is None:
+            duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+            start = datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=duration)
+        step = max(1, int(round(fps / sample_fps))) if sample_fps else 1
+
+        index = 0
+        while cap.grab():
+            if index % step == 0:
+                ret, frame = cap.retrieve()
+                if ret:
+                    yield frame, start + timedelta(seconds=index / fps)
+            index += 1
+    finally:
+        cap.release()
+
+
+def snapshot_frames(directory):
+    """Yield (frame, timestamp) for the images in a directory, oldest first
+
+    The time comes from the file name when it contains one, else from the
+    file's modification time.
+    """
+    snapshots = []
+    for name in os.listdir(directory):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        path = os.path.join(directory, name)
+        match = FILENAME_TIME.search(name)
+        try:
+            taken = datetime(*map(int, match.groups())) if match else None
+        except ValueError:
+            taken = None
+        snapshots.append((taken or datetime.fromtimestamp(os.path.getmtime(path)), path))
+
+    for taken, path in sorted(snapshots):
+        frame = cv2.imread(path)
+        if frame is None:
+            logging.warning(f"Skipping unreadable image {path}")
+            continue
+        yield frame, taken
+
+
+def run_batch(frames, gallery, on_match, detect_workers=2, encode_workers=2,
+              tolerance=0.6, scale=0.25, frame_shape=None, seen=None):
+    """Recognise every frame as fast as the workers allow; returns a stats dict
+
+    ``on_match(student_id, when)`` is called for each sighting of a student
+    until it returns True (the mark was accepted) for that day. Accepted
+    (student_id, date) pairs are kept in ``seen``; pass a set that the writer
+    removes failed marks from so that later sightings retry them.
+    """
+    pipeline = RecognitionPipeline(lambda: gallery, detect_workers, encode_workers,
+                                   queue_size=2 * (detect_workers + encode_workers),
+                                   scale=scale, tolerance=tolerance, frame_shape=frame_shape)
+    stats = {'frames': 0, 'faces': 0, 'recognized': 0, 'marked': 0}
+    seen = set() if seen is None else seen
+    when_by_seq = {}
+
+    def handle(result):
+        when = when_by_seq.pop(result.seq)
+        stats['frames'] += 1
+        stats['faces'] += len(result.face_locations)
+        for match in result.matches:
+            if match is None:
+                continue
+            stats['recognized'] += 1
+            # Only accepted marks count as seen, so a rejected one is retried
+            if (match[0], when.date()) not in seen and on_match(match[0], when):
+                seen.add((match[0], when.date()))
+                stats['marked'] += 1
+
+    started = time.time()
+    pipeline.start()
+    try:
+        for frame, when in frames:
+            while True:
+                seq = pipeline.submit(frame, when.timestamp())
+                if seq is not None:
+                    when_by_seq[seq] = when
+                    break
+                # Pipeline full: wait for the oldest frame to come out
+                result = pipeline.get(timeout=1)
+                if result is not None:
+                    handle(result)
+            # Drain whatever is ready without waiting
+            while True:
+                result = pipeline.get(timeout=0)
+                if result is None:
+                    break
+                handle(result)
+    finally:
+        while when_by_seq:
+            result = pipeline.get(timeout=5)
+            if result is None:
+                logging.error(f"Gave up waiting for {len(when_by_seq)} frames")
+                break
+            handle(result)
+        pipeline.stop()
+
+    stats['seconds'] = round(time.time() - started, 2)
+    stats['fps'] = round(stats['frames'] / stats['seconds'], 2) if stats['seconds'] else 0.0
+    return stats
+
+
+def main():
+    """Backfill attendance from a recorded video or a folder of snapshots"""
+    from take_attendance import load_known_faces, attendance_writer
+
+    parser = argparse.ArgumentParser(description='Offline batch attendance')
+    parser.add_argument('path', help='video file or directory of images')
+    parser.add_argument('--start', help='time of the first video frame, "YYYY-MM-DD HH:MM:SS"')
+    parser.add_argument('--sample-fps', type=float, default=None,
+                        help='video frames per second to recognise (default: every frame)')
+    parser.add_argument('--detect-workers', type=int, default=2)
+    parser.add_argument('--encode-workers', type=int, default=max(1, mp.cpu_count() - 2))
+    parser.add_argument('--tolerance', type=float, default=0.6)
+    parser.add_argument('--dry-run', action='store_true', help='log marks instead of writing them')
+    args = parser.parse_args()
+
+    faces = load_known_faces()
+    if not faces or not faces.gallery:
+        logging.error("No known faces found in database!")
+        return
+
+    frame_shape = None
+    if os.path.isdir(args.path):
+        frames = snapshot_frames(args.path)
+    else:
+        start = datetime.strptime(args.start, "%Y-%m-%d %H:%M:%S") if args.start else None
+        frames = video_frames(args.path, start, args.sample_fps)
+        # Video frames all have one size, so they can travel through shared memory
+        first = next(frames, None)
+        if first is None:
+            logging.error(f"No frames in {args.path}")
+            return
+        frame_shape = first[0].shape
+        frames = _prepend(first, frames)
+
+    def on_match(student_id, when):
+        if args.dry_run:
+            logging.info(f"Would mark {student_id} at {when}")
+            return True
+        return attendance_writer.submit(student_id, when=when)
+
+    # A mark the writer could not save is forgotten, so the next sighting retries it
+    seen = set()
+    attendance_writer.on_failed = lambda student_id, day: seen.discard((student_id, day))
+    try:
+        stats = run_batch(frames, faces.gallery, on_match, args.detect_workers,
+                          args.encode_workers, args.tolerance, frame_shape=frame_shape, seen=seen)
+        logging.info("Batch finished: " + ", ".join(f"{key}={value}" for key, value in stats.items()))
+    finally:
+        attendance_writer.close()
+
+
+def _prepend(item, iterator):
+    yield item
+    yield from iterator
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_gallery import FaceGallery, ENCODING_DIM
+from ann_index import IVFIndex, MIN_TRAINING_ROWS
+from pq_gallery import PQGallery
+
+
+def synthetic_gallery(size, seed=0):
+    """Random unit-norm encodings standing in for enrolled students"""
+    rng = np.random.default_rng(seed)
+    encodings = rng.standard_normal((size, ENCODING_DIM))
+    encodings /= np.linalg.norm(encodings, axis=1, keepdims=True)
+    return encodings
+
+
+def synthetic_queries(encodings, count, noise=0.35, seed=1):
+    """Noisy re-captures of random enrolled students, with their true rows"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(encodings), count, replace=False)
+    jitter = rng.standard_normal((count, ENCODING_DIM))
+    jitter *= noise / np.linalg.norm(jitter, axis=1, keepdims=True)
+    return encodings[rows] + jitter, rows
+
+
+def time_frames(gallery, queries, faces_per_frame):
+    """Mean per-frame match latency in ms and the top-1 rows found"""
+    found = []
+    start = time.perf_counter()
+    for offset in range(0, len(queries), faces_per_frame):
+        indices, _ = gallery.match(queries[offset:offset + faces_per_frame], k=1)
+        found.append(indices[:, 0])
+    elapsed = time.perf_counter() - start
+    frames = -(-len(queries) // faces_per_frame)
+    return elapsed / frames * 1000, np.concatenate(found)
+
+
+def run(size, probes, queries_count, faces_per_frame, subquantizers=(), rerank=32):
+    encodings = synthetic_gallery(size)
+    ids = list(range(size))
+    queries, truth = synthetic_queries(encodings, queries_count)
+
+    exact = FaceGallery(encodings, ids)
+    exact_ms, exact_rows = time_frames(exact, queries, faces_per_frame)
+    print(f"{size:>9,}  brute-force        {exact_ms:8.2f} ms/frame  "
+          f"recall@1 {np.mean(exact_rows == truth):.3f}  {exact.nbytes / 2**20:8.1f} MiB")
+
+    start = time.perf_counter()
+    index = IVFIndex()
+    indexed = FaceGallery(exact.encodings, ids, index=index)
+    build_s = time.perf_counter() - start
+    if index.is_trained:
+        print(f"{size:>9,}  ivf build          {build_s:8.2f} s  ({index.n_lists} lists)")
+    else:
+        print(f"{size:>9,}  ivf                not trained below {MIN_TRAINING_ROWS:,} encodings (exact search)")
+        probes = []
+
+    for n_probe in probes:
+        index.n_probe = n_probe
+        ivf_ms, ivf_rows = time_frames(indexed, queries, faces_per_frame)
+        print(f"{size:>9,}  ivf n_probe={n_probe:<5} {ivf_ms:8.2f} ms/frame  "
+              f"recall@1 {np.mean(ivf_rows == exact_rows):.3f}  "
+              f"speedup {exact_ms / ivf_ms:5.1f}x")
+
+    for n_subquantizers in subquantizers:
+        start = time.perf_counter()
+        compressed = PQGallery(exact.encodings, ids, n_subquantizers=n_subquantizers, rerank=rerank)
+        build_s = time.perf_counter() - start
+        pq_ms, pq_rows = time_frames(compressed, queries, faces_per_frame)
+        print(f"{size:>9,}  pq m={n_subquantizers:<3} rerank={rerank:<4} {pq_ms:8.2f} ms/frame  "
+              f"recall@1 {np.mean(pq_rows == exact_rows):.3f}  {compressed.nbytes / 2**20:8.1f} MiB  "
+              f"({compressed.nbytes / exact.nbytes:.0%}, built in {build_s:.1f} s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare IVF and product-quantized matching against brute force')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='Gallery sizes to benchmark')
+    parser.add_argument('--probes', type=int, nargs='+', default=[1, 4, 8, 16, 32],
+                        help='n_probe values to sweep')
+    parser.add_argument('--queries', type=int, default=400, help='Faces matched per size')
+    parser.add_argument('--faces-per-frame', type=int, default=8,
+                        help='Faces matched together, as in one camera frame')
+    parser.add_argument('--pq', type=int, nargs='*', default=[8, 16, 32],
+                        help='Sub-quantizer counts to benchmark for the compressed gallery')
+    parser.add_argument('--rerank', type=int, default=32,
+                        help='Candidates the compressed gallery re-ranks exactly (0 = table distances only)')
+    args = parser.parse_args()
+
+    print("\n=== ANN and compressed vs brute-force gallery matching ===")
+    for size in args.sizes:
+        run(size, args.probes, min(args.queries, size), args.faces_per_frame, args.pq, args.rerank)
+
+
+if __name__ == "__main__":
+    main()
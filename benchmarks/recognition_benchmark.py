@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_gallery import FaceGallery
+from encoding_cache import load_gallery
+from attendance_writer import AttendanceWriter
+from storage import SQLiteStorage
+from encoding_format import encode
+from ann_benchmark import synthetic_gallery, synthetic_queries
+
+class StageTimer:
+    """Per-stage latency samples"""
+
+    def __init__(self):
+        self.samples = {}
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        yield
+        self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        results = {}
+        for stage, samples in self.samples.items():
+            values = np.array(samples) * 1000
+            results[stage] = {
+                'count': len(values),
+                'throughput_per_s': round(len(values) / (values.sum() / 1000), 2) if values.sum() else None,
+                'p50_ms': round(float(np.percentile(values, 50)), 3),
+                'p99_ms': round(float(np.percentile(values, 99)), 3),
+                'mean_ms': round(float(values.mean()), 3),
+            }
+        return results
+
+
+def build_standin(storage, encodings):
+    """Store encodings in the format Storage.save_student writes"""
+    with storage.connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO students (student_id, name) VALUES (%s, %s)",
+                           ((f"S{i:07d}", f"Student {i}") for i in range(len(encodings))))
+        cursor.executemany("INSERT INTO face_encodings (student_id, encoding) VALUES (%s, %s)",
+                           ((f"S{i:07d}", encode(encoding)) for i, encoding in enumerate(encodings)))
+        conn.commit()
+
+
+def bench_storage(timer, workdir, size, frames, faces_per_frame, tolerance):
+    """Gallery load (cold and warm), match and mark stages against the stand-in"""
+    encodings = synthetic_gallery(size)
+    # The embedded SQLite storage stands in for the MySQL server
+    storage = SQLiteStorage(os.path.join(workdir, 'standin.sqlite3'))
+    with timer.time('db_populate'):
+        build_standin(storage, encodings)
+
+    cache_dir = os.path.join(workdir, 'cache')
+    with storage.connection() as conn:
+        with timer.time('gallery_load_cold'):
+            gallery = load_gallery(conn, cache_dir=cache_dir)
+        for _ in range(5):
+            with timer.time('gallery_load_warm'):
+                load_gallery(conn, cache_dir=cache_dir)
+
+    queries, rows = synthetic_queries(encodings, min(frames * faces_per_frame, size))
+    for offset in range(0, len(queries), faces_per_frame):
+        with timer.time('match'):
+            gallery.identify(queries[offset:offset + faces_per_frame], tolerance=tolerance)
+
+    # Marks go through the real writer; one flush per batch is the database cost
+    class TimedWriter(AttendanceWriter):
+        def _flush(self, batch):
+            with timer.time('mark_flush'):
+                return super()._flush(batch)
+
+    writer = TimedWriter(storage.connection, batch_size=200)
+    for i in range(0, len(queries)):
+        with timer.time('mark_submit'):
+            writer.submit(gallery.ids[rows[i]])
+    writer.close()
+    storage.close()
+    return len(gallery)
+
+
+def bench_frames(timer, frames, gallery, scale, tolerance, limit):
+    """Detect, encode and match stages on recorded frames (needs cv2 and face_recognition)"""
+    import cv2
+    import face_recognition
+    from batch_attendance import video_frames, snapshot_frames
+
+    source = snapshot_frames(frames) if os.path.isdir(frames) else video_frames(frames, datetime.now())
+    count = 0
+    for frame, _ in source:
+        if count >= limit:
+            break
+        count += 1
+        with timer.time('detect'):
+            small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+            rgb_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+            face_locations = face_recognition.face_locations(rgb_frame, model="hog")
+        if not face_locations:
+            continue
+        with timer.time('encode'):
+            encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+        with timer.time('frame_match'):
+            gallery.identify(encodings, tolerance=tolerance)
+    return count
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline_path, threshold):
+    """Print p50 changes against an earlier results file; returns the regressed stages"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['stages']
+    regressed = []
+    print(f"\n=== Compared with {baseline_path} ===")
+    for stage, result in current.items():
+        if stage not in baseline:
+            continue
+        before, after = baseline[stage]['p50_ms'], result['p50_ms']
+        change = (after - before) / before if before else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        if flag:
+            regressed.append(stage)
+        print(f"{stage:<18} p50 {before:9.3f} -> {after:9.3f} ms  ({change:+.1%}){flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-stage recognition benchmark')
+    parser.add_argument('--gallery-size', type=int, default=10_000)
+    parser.add_argument('--frames', help='video file or image directory for detect/encode timings')
+    parser.add_argument('--max-frames', type=int, default=200)
+    parser.add_argument('--match-frames', type=int, default=500,
+                        help='synthetic frames matched against the gallery')
+    parser.add_argument('--faces-per-frame', type=int, default=4)
+    parser.add_argument('--scale', type=float, default=0.25, help='detection resize factor')
+    parser.add_argument('--tolerance', type=float, default=0.6)
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--compare', help='earlier JSON results to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='p50 slowdown that counts as a regression')
+    args = parser.parse_args()
+
+    timer = StageTimer()
+    with tempfile.TemporaryDirectory() as workdir:
+        loaded = bench_storage(timer, workdir, args.gallery_size, args.match_frames,
+                               args.faces_per_frame, args.tolerance)
+        frames_run = 0
+        if args.frames:
+            gallery = FaceGallery(synthetic_gallery(args.gallery_size), list(range(args.gallery_size)))
+            frames_run = bench_frames(timer, args.frames, gallery, args.scale,
+                                      args.tolerance, args.max_frames)
+
+    stages = timer.summary()
+    print(f"\n=== Recognition stages (gallery {loaded:,}) ===")
+    for stage, result in stages.items():
+        print(f"{stage:<18} n={result['count']:<6} p50 {result['p50_ms']:9.3f} ms  "
+              f"p99 {result['p99_ms']:9.3f} ms  {result['throughput_per_s'] or 0:10.1f}/s")
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'params': dict(vars(args), frames_run=frames_run),
+        'stages': stages,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare and compare(stages, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_report import (ExcelReportWriter, SummaryAccumulator, SUMMARY_COLUMNS,
+                             write_excel, write_excel_fast)
+
+COLUMNS = ['student_id', 'name', 'department', 'date', 'time', 'status', 'notes']
+DEPARTMENTS = ['Computer Science', 'Electrical', 'Mechanical', 'Civil', 'Biotechnology']
+STATUSES = ['Present', 'Late', 'Absent']
+
+
+def synthetic_chunks(rows, chunk_size, seed=0):
+    """Attendance rows shaped like ATTENDANCE_QUERY results, a chunk at a time"""
+    rng = np.random.default_rng(seed)
+    start = date(2025, 1, 1)
+    for offset in range(0, rows, chunk_size):
+        count = min(chunk_size, rows - offset)
+        students = rng.integers(0, 5000, count)
+        days = np.sort(rng.integers(0, 180, count))
+        seconds = rng.integers(8 * 3600, 10 * 3600, count)
+        statuses = rng.integers(0, len(STATUSES), count)
+        yield [(f"S{student:05d}", f"Student {student}", DEPARTMENTS[student % len(DEPARTMENTS)],
+                start + timedelta(days=int(day)),
+                f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}",
+                STATUSES[status], None)
+               for student, day, second, status in zip(students, days, seconds, statuses)]
+
+
+def summarize(chunks):
+    summary = SummaryAccumulator({department: 1000 for department in DEPARTMENTS})
+    for rows in chunks:
+        summary.add(rows, COLUMNS.index('department'), COLUMNS.index('status'))
+    return summary.rows()
+
+
+def measure(write, trace):
+    """Seconds taken by write(), or its peak traced Python memory in MiB"""
+    if not trace:
+        start = time.perf_counter()
+        write()
+        return time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        write()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def run(rows, chunk_size, workdir, trace_memory):
+    df_attendance = pd.DataFrame([row for rows_ in synthetic_chunks(rows, chunk_size) for row in rows_],
+                                 columns=COLUMNS)
+    summary_rows = summarize(synthetic_chunks(rows, chunk_size))
+    df_summary = pd.DataFrame(summary_rows, columns=SUMMARY_COLUMNS)
+
+    def streamed(path):
+        excel = ExcelReportWriter(path)
+        for chunk in synthetic_chunks(rows, chunk_size):
+            excel.add_rows(COLUMNS, chunk)
+        excel.write_summary(SUMMARY_COLUMNS, summary_rows)
+        excel.save()
+
+    writers = [
+        ('pandas + per-cell widths', lambda path: write_excel(path, df_attendance, df_summary)),
+        ('write-only from DataFrame', lambda path: write_excel_fast(path, df_attendance, df_summary, chunk_size)),
+        ('write-only streamed', streamed),
+    ]
+    baseline = None
+    for label, write in writers:
+        path = os.path.join(workdir, f"{label.split()[0]}.xlsx")
+        seconds = measure(lambda: write(path), False)
+        baseline = baseline or seconds
+        line = (f"{rows:>9,}  {label:<26} {seconds:8.2f} s  speedup {baseline / seconds:5.1f}x  "
+                f"file {os.path.getsize(path) / 2**20:6.1f} MiB")
+        if trace_memory:
+            line += f"  peak {measure(lambda: write(path), True):8.1f} MiB"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the Excel report writers')
+    parser.add_argument('--rows', type=int, nargs='+', default=[50_000, 200_000],
+                        help='Attendance rows per report')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per streamed chunk')
+    parser.add_argument('--memory', action='store_true',
+                        help='Also report peak traced Python memory (a second, slower pass per writer)')
+    args = parser.parse_args()
+
+    print("\n=== Excel report writers ===")
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            run(rows, args.chunk_size, workdir, args.memory)
+
+
+if __name__ == "__main__":
+    main()
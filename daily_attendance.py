@@ -0,0 +1,88 @@
+import logging
+import threading
+from datetime import date
+
+
+class DailyAttendanceSet:
+    """Thread-safe set of student ids already marked present today
+
+    Preloaded from the attendance table at startup and again after midnight,
+    so repeat sightings are answered with a set lookup instead of a database
+    round trip. add() is an atomic test-and-set: only the first caller for a
+    student gets True and goes on to write the mark.
+    """
+
+    def __init__(self, connect=None):
+        self.connect = connect
+        self._lock = threading.Lock()
+        self._date = date.today()
+        self._ids = set()
+
+    def preload(self):
+        """Merge in today's marks from the database; returns how many were found"""
+        today = date.today()
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT student_id FROM attendance WHERE date = %s", (today,))
+                ids = {student_id for (student_id,) in cursor}
+            finally:
+                cursor.close()
+
+        self.update(ids, today)
+        logging.info(f"Preloaded {len(ids)} attendance marks for {today}")
+        return len(ids)
+
+    def add(self, student_id, day=None):
+        """Record a mark; False when the student was already marked that day
+
+        Marks for other days cannot be answered from today's set, so they are
+        always let through (the unique key still rejects duplicates).
+        """
+        with self._lock:
+            self._check_rollover()
+            if day is not None and day != self._date:
+                return True
+            if student_id in self._ids:
+                return False
+            self._ids.add(student_id)
+            return True
+
+    def discard(self, student_id, day=None):
+        """Forget a mark that could not be written so the next sighting retries"""
+        with self._lock:
+            if day is None or day == self._date:
+                self._ids.discard(student_id)
+
+    def update(self, student_ids, day=None):
+        with self._lock:
+            self._check_rollover()
+            if day is None or day == self._date:
+                self._ids.update(student_ids)
+
+    def __contains__(self, student_id):
+        with self._lock:
+            self._check_rollover()
+            return student_id in self._ids
+
+    def __len__(self):
+        with self._lock:
+            self._check_rollover()
+            return len(self._ids)
+
+    def _check_rollover(self):
+        """Start a fresh set after midnight (caller holds the lock)"""
+        today = date.today()
+        if today == self._date:
+            return
+        self._date = today
+        self._ids = set()
+        if self.connect is not None:
+            # Other kiosks may already have marked people today
+            threading.Thread(target=self._preload_quietly, daemon=True).start()
+
+    def _preload_quietly(self):
+        try:
+            self.preload()
+        except Exception as e:
+            logging.error(f"Error preloading today's attendance: {e}")
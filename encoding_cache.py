@@ -0,0 +1,143 @@
+import os
+import json
+import uuid
+import logging
+import numpy as np
+from face_gallery import FaceGallery, ENCODING_DIM
+from encoding_format import GALLERY_DTYPE, parse, stack
+from pq_gallery import PQGallery, PQ_SUBQUANTIZERS, PQ_RERANK
+
+CACHE_DIR = os.getenv('FACE_CACHE_DIR', 'face_cache')
+
+GALLERY_QUERY = """
+    SELECT s.student_id, s.name, f.encoding
+    FROM students s
+    JOIN face_encodings f ON s.student_id = f.student_id
+"""
+
+STAMP_QUERY = """
+    SELECT COUNT(*), MAX(f.last_updated)
+    FROM students s
+    JOIN face_encodings f ON s.student_id = f.student_id
+"""
+
+ACTIVE_FILTER = " WHERE s.is_active = TRUE"
+
+
+def load_gallery(conn, active_only=False, cache_dir=CACHE_DIR, index=None):
+    """Load the known-face gallery, memory-mapping a local cache when it is still fresh
+
+    The cache is one .npy matrix (in GALLERY_DTYPE) plus a JSON sidecar with ids, names and
+    the (row count, MAX(last_updated)) stamp it was built from. A warm start only
+    runs the stamp query; a stale or missing cache is rebuilt from a full fetch.
+    Renames (and is_active changes) in students bump face_encodings.last_updated
+    through the sync triggers (see gallery_sync.create_sync_schema), so they
+    change the stamp as well; other students columns are not cached.
+    With FACE_PQ_SUBQUANTIZERS set the gallery is compressed (see pq_gallery)
+    and ``index`` is not used.
+    """
+    where = ACTIVE_FILTER if active_only else ""
+    sidecar_path = os.path.join(cache_dir, f"gallery_{'active' if active_only else 'all'}.json")
+
+    cursor = conn.cursor()
+    try:
+        try:
+            cursor.execute(STAMP_QUERY + where)
+            count, last_updated = cursor.fetchone()
+            stamp = [int(count), str(last_updated)]
+        except Exception as e:
+            # e.g. an older schema without face_encodings.last_updated
+            logging.warning(f"Encoding cache disabled, cannot stamp gallery: {e}")
+            stamp = None
+
+        if stamp is not None:
+            gallery = _read_cache(sidecar_path, stamp, index)
+            if gallery is not None:
+                logging.info(f"Mapped {len(gallery)} known faces from cache")
+                return gallery
+
+        cursor.execute(GALLERY_QUERY + where)
+        ids, names, encodings = _decode_rows(cursor)
+    finally:
+        cursor.close()
+
+    if stamp is not None:
+        try:
+            _write_cache(sidecar_path, stamp, ids, names, encodings)
+        except OSError as e:
+            logging.warning(f"Could not write encoding cache: {e}")
+
+    return _build_gallery(encodings, ids, names, index)
+
+
+def _build_gallery(encodings, ids, names, index):
+    """Full-precision gallery, or a product-quantized one when FACE_PQ_SUBQUANTIZERS is set"""
+    if PQ_SUBQUANTIZERS:
+        return PQGallery(encodings, ids, names, n_subquantizers=PQ_SUBQUANTIZERS, rerank=PQ_RERANK)
+    return FaceGallery(encodings, ids, names, index=index)
+
+
+def _decode_rows(rows):
+    """Decode (student_id, name, encoding_bytes) rows into one matrix, one pass per stored dtype
+
+    Versioned float16/float32 encodings and legacy headerless float64 ones can
+    be mixed; rows from other models or with a bad size are skipped.
+    """
+    ids, names, parsed = [], [], []
+
+    for student_id, name, encoding_bytes in rows:
+        try:
+            parsed.append(parse(encoding_bytes))
+        except ValueError as e:
+            logging.error(f"Error decoding face for {student_id}: {e}")
+            continue
+        ids.append(student_id)
+        names.append(name)
+
+    return ids, names, stack(parsed)
+
+
+def _read_cache(sidecar_path, stamp, index):
+    """Return a gallery over the memory-mapped cache, or None when it is missing or stale"""
+    try:
+        with open(sidecar_path) as f:
+            sidecar = json.load(f)
+        if sidecar.get('stamp') != stamp:
+            return None
+
+        matrix_path = os.path.join(os.path.dirname(sidecar_path), sidecar['matrix'])
+        encodings = np.load(matrix_path, mmap_mode='r')
+        if encodings.shape != (len(sidecar['ids']), ENCODING_DIM) or encodings.dtype != GALLERY_DTYPE:
+            return None
+        return _build_gallery(encodings, sidecar['ids'], sidecar['names'], index)
+    except (OSError, ValueError, KeyError) as e:
+        logging.info(f"Encoding cache unavailable, rebuilding: {e}")
+        return None
+
+
+def _write_cache(sidecar_path, stamp, ids, names, encodings):
+    """Write a new matrix file, then atomically point the sidecar at it"""
+    cache_dir = os.path.dirname(sidecar_path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    previous = None
+    try:
+        with open(sidecar_path) as f:
+            previous = json.load(f).get('matrix')
+    except (OSError, ValueError):
+        pass
+
+    # A unique matrix name means readers never see a half-written file
+    matrix_name = f"gallery_{uuid.uuid4().hex}.npy"
+    np.save(os.path.join(cache_dir, matrix_name), np.ascontiguousarray(encodings, dtype=GALLERY_DTYPE))
+
+    tmp_path = f"{sidecar_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'stamp': stamp, 'matrix': matrix_name, 'ids': ids, 'names': names}, f)
+    os.replace(tmp_path, sidecar_path)
+
+    if previous and previous != matrix_name:
+        try:
+            os.remove(os.path.join(cache_dir, previous))
+        except OSError:
+            pass  # still mapped by another process (Windows) or already gone
@@ -0,0 +1,148 @@
+import os
+import sys
+import struct
+import logging
+import argparse
+import numpy as np
+from face_gallery import ENCODING_DIM
+
+# Stored precision of new encodings: float32 (default), float16 or float64
+ENCODING_DTYPE = np.dtype(os.getenv('FACE_ENCODING_DTYPE', 'float32'))
+# Galleries are held as float32 unless encodings are stored as float64;
+# float16 is widened because numpy's float16 arithmetic is slow
+GALLERY_DTYPE = np.dtype(np.float64) if ENCODING_DTYPE == np.float64 else np.dtype(np.float32)
+
+# Model ids; encodings from different models are not comparable
+MODEL_DLIB_RESNET = 1  # face_recognition / dlib_face_recognition_resnet_model_v1
+MODEL_ID = MODEL_DLIB_RESNET
+
+MAGIC = b'FE'
+VERSION = 1
+# magic, version, dtype code, dimension, model id
+HEADER = struct.Struct('<2sBBHH')
+DTYPE_CODES = {1: np.dtype('<f2'), 2: np.dtype('<f4'), 3: np.dtype('<f8')}
+CODES = {dtype: code for code, dtype in DTYPE_CODES.items()}
+
+# Headerless float64 BLOBs written before the versioned format
+LEGACY_DTYPE = np.dtype('<f8')
+LEGACY_SIZE = ENCODING_DIM * LEGACY_DTYPE.itemsize
+
+
+def encode(encoding, dtype=ENCODING_DTYPE, model_id=MODEL_ID):
+    """Serialize one encoding as header + little-endian payload"""
+    dtype = np.dtype(dtype).newbyteorder('<')
+    vector = np.asarray(encoding, dtype=dtype).ravel()
+    return HEADER.pack(MAGIC, VERSION, CODES[dtype], len(vector), model_id) + vector.tobytes()
+
+
+def parse(blob, model_id=MODEL_ID, dim=ENCODING_DIM):
+    """(dtype, payload bytes) of a stored encoding; ValueError when it cannot be used"""
+    if blob is None:
+        raise ValueError("missing encoding")
+    blob = bytes(blob)
+    if len(blob) == LEGACY_SIZE and dim == ENCODING_DIM:
+        return LEGACY_DTYPE, blob
+    if len(blob) < HEADER.size:
+        raise ValueError(f"unexpected encoding size {len(blob)}")
+
+    magic, version, code, blob_dim, blob_model = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != VERSION or code not in DTYPE_CODES:
+        raise ValueError("unknown encoding format")
+    if blob_model != model_id:
+        raise ValueError(f"encoding from model {blob_model}, expected {model_id}")
+    dtype = DTYPE_CODES[code]
+    if blob_dim != dim or len(blob) != HEADER.size + dim * dtype.itemsize:
+        raise ValueError(f"unexpected encoding size {len(blob)}")
+    return dtype, blob[HEADER.size:]
+
+
+def decode(blob, dtype=GALLERY_DTYPE):
+    """One stored encoding as a vector of ``dtype``; ValueError when it cannot be used"""
+    source, payload = parse(blob)
+    return np.frombuffer(payload, dtype=source).astype(dtype)
+
+
+def stack(parsed, dtype=GALLERY_DTYPE, dim=ENCODING_DIM):
+    """Matrix of ``dtype`` from parse() results, decoding each stored dtype in one pass"""
+    matrix = np.empty((len(parsed), dim), dtype=dtype)
+    groups = {}
+    for row, (source, payload) in enumerate(parsed):
+        rows, payloads = groups.setdefault(source, ([], []))
+        rows.append(row)
+        payloads.append(payload)
+    for source, (rows, payloads) in groups.items():
+        matrix[rows] = np.frombuffer(b''.join(payloads), dtype=source).reshape(-1, dim)
+    return matrix
+
+
+def migrate(connect, dtype=ENCODING_DTYPE, batch_size=500, dry_run=False):
+    """Rewrite stored encodings that are not in the target format; returns (checked, rewritten)
+
+    Rows are walked in student_id order, one committed batch at a time. An
+    update only applies while the row still holds the blob that was read,
+    so a concurrent re-registration is never overwritten. Rewritten rows get
+    a new last_updated, so running kiosks pick them up as deltas.
+    """
+    target = np.dtype(dtype).newbyteorder('<')
+    checked = rewritten = 0
+    after = ''
+    while True:
+        with connect() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT student_id, encoding FROM face_encodings
+                    WHERE student_id > %s ORDER BY student_id LIMIT %s
+                """, (after, batch_size))
+                rows = cursor.fetchall()
+                updates = []
+                changed = 0
+                for student_id, blob in rows:
+                    try:
+                        source, payload = parse(blob)
+                    except ValueError as e:
+                        logging.error(f"Skipping encoding of {student_id}: {e}")
+                        continue
+                    if len(bytes(blob)) != LEGACY_SIZE and source == target:
+                        continue
+                    vector = np.frombuffer(payload, dtype=source)
+                    updates.append((encode(vector, target), student_id, bytes(blob)))
+
+                if updates and not dry_run:
+                    cursor.executemany("""
+                        UPDATE face_encodings SET encoding = %s
+                        WHERE student_id = %s AND encoding = %s
+                    """, updates)
+                    conn.commit()
+                    changed = cursor.rowcount
+                elif dry_run:
+                    changed = len(updates)
+            finally:
+                cursor.close()
+
+        checked += len(rows)
+        rewritten += changed
+        if rows:
+            logging.info(f"Checked {checked} encodings, {'would rewrite' if dry_run else 'rewrote'} {rewritten}")
+        if len(rows) < batch_size:
+            return checked, rewritten
+        after = rows[-1][0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rewrite stored face encodings in the versioned format')
+    parser.add_argument('--dtype', choices=['float16', 'float32', 'float64'], default=ENCODING_DTYPE.name,
+                        help='Stored precision (default: FACE_ENCODING_DTYPE or float32)')
+    parser.add_argument('--batch-size', type=int, default=500, help='Rows per committed batch')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would change')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from db_utils import db_connection
+    checked, rewritten = migrate(db_connection, args.dtype, args.batch_size, args.dry_run)
+    print(f"{rewritten} of {checked} encodings {'need rewriting' if args.dry_run else 'rewritten'} as {args.dtype}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
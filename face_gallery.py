@@ -0,0 +1,197 @@
+import numpy as np
+
+# face_recognition (dlib) produces 128-dimensional encodings
+ENCODING_DIM = 128
+
+
+class FaceGallery:
+    """Immutable snapshot of known face encodings held as one contiguous matrix
+
+    The matrix is read-only and ids/names are tuples, so a gallery can be built
+    on a background thread and published to recognition threads with a single
+    reference assignment. Readers take the reference once per frame and always
+    see a consistent (matrix, ids, names) triple; updates produce a new gallery
+    through with_changes instead of mutating this one.
+
+    An optional approximate index (see ann_index.IVFIndex) narrows each search
+    to a candidate subset which is then re-ranked with exact distances, so the
+    tolerance check is unchanged. The gallery takes ownership of the index.
+    Galleries too small to train it on are searched exactly, and
+    with_changes rebuilds it once the gallery has outgrown its clusters
+    (see IVFIndex.needs_training).
+    """
+
+    def __init__(self, encodings, ids, names=None, index=None, copy=True):
+        # float32 galleries (see encoding_format) stay float32, anything else becomes float64
+        dtype = np.float32 if getattr(encodings, 'dtype', None) == np.float32 else np.float64
+        if len(encodings):
+            matrix = np.asarray(encodings, dtype=dtype).reshape(-1, ENCODING_DIM)
+        else:
+            matrix = np.empty((0, ENCODING_DIM), dtype=dtype)
+
+        # Read-only inputs (e.g. a memory-mapped cache) can be shared as they are
+        if copy and matrix.flags.writeable:
+            matrix = matrix.copy()
+        self.encodings = np.ascontiguousarray(matrix)
+        self.encodings.flags.writeable = False
+        self.ids = tuple(ids)
+        self.names = tuple(names) if names is not None else self.ids
+
+        if not (len(self.ids) == len(self.names) == len(self.encodings)):
+            raise ValueError("Encodings, ids and names must have the same length")
+
+        self._rows = {student_id: row for row, student_id in enumerate(self.ids)}
+
+        # Squared norms are reused by every match call
+        self._sq_norms = np.einsum('ij,ij->i', self.encodings, self.encodings)
+        self._sq_norms.flags.writeable = False
+
+        # The index is keyed by row number
+        self.index = index
+        if index is not None and not len(index) and index.needs_training(len(self)):
+            index.add(np.arange(len(self)), self.encodings)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, student_id):
+        return student_id in self._rows
+
+    @property
+    def nbytes(self):
+        """Bytes held by the encoding matrix and its norms"""
+        return self.encodings.nbytes + self._sq_norms.nbytes
+
+    def with_changes(self, upserts=(), removed_ids=()):
+        """New gallery with (student_id, name, encoding) upserts and removals applied
+
+        Removed rows are filled by moving the last row into the hole, so only the
+        touched rows have to be re-indexed. Unchanged upserts are skipped and the
+        same gallery is returned when nothing changed.
+        """
+        rows = dict(self._rows)
+        ids, names = list(self.ids), list(self.names)
+        matrix = np.array(self.encodings)
+        changed, dropped = set(), []
+
+        for student_id in removed_ids:
+            row = rows.pop(student_id, None)
+            if row is None:
+                continue
+            last = len(ids) - 1
+            if row != last:
+                matrix[row], ids[row], names[row] = matrix[last], ids[last], names[last]
+                rows[ids[row]] = row
+                changed.add(row)
+            changed.discard(last)
+            dropped.append(last)
+            ids.pop()
+            names.pop()
+            matrix = matrix[:last]
+
+        appended = []
+        for student_id, name, encoding in upserts:
+            encoding = np.asarray(encoding, dtype=matrix.dtype).reshape(ENCODING_DIM)
+            row = rows.get(student_id)
+            if row is None:
+                rows[student_id] = len(ids)
+                ids.append(student_id)
+                names.append(name)
+                appended.append(encoding)
+                changed.add(rows[student_id])
+            elif row >= len(matrix):
+                appended[row - len(matrix)] = encoding
+                names[row] = name
+            elif names[row] != name or not np.array_equal(matrix[row], encoding):
+                matrix[row] = encoding
+                names[row] = name
+                changed.add(row)
+
+        if not changed and not dropped:
+            return self
+        if appended:
+            matrix = np.vstack([matrix] + appended)
+
+        index = None
+        if self.index is not None and self.index.needs_training(len(ids)):
+            # Too few rows before, or far more now: the new gallery trains a fresh index
+            index = self.index.empty_copy()
+        elif self.index is not None:
+            index = self.index.copy()
+            if len(index):
+                index.remove(dropped)
+                changed = sorted(changed)
+                index.add(changed, matrix[changed])
+        # matrix is already a private copy
+        return FaceGallery(matrix, ids, names, index=index, copy=False)
+
+    def distances(self, face_encodings):
+        """Euclidean distance from every face to every known encoding, shape (faces, known)"""
+        # Queries take the gallery's precision so the product never copies the matrix
+        faces = np.asarray(face_encodings, dtype=self.encodings.dtype).reshape(-1, ENCODING_DIM)
+        if not len(faces) or not len(self):
+            return np.empty((len(faces), len(self)), dtype=self.encodings.dtype)
+
+        # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b, one matrix product for the whole frame
+        face_sq_norms = np.einsum('ij,ij->i', faces, faces)
+        sq_dist = face_sq_norms[:, None] + self._sq_norms[None, :] - 2.0 * (faces @ self.encodings.T)
+        np.maximum(sq_dist, 0.0, out=sq_dist)
+        return np.sqrt(sq_dist, out=sq_dist)
+
+    def match(self, face_encodings, k=1):
+        """Return (indices, distances) of the k nearest known encodings per face, nearest first"""
+        if self.index is not None and len(self.index):
+            return self._match_indexed(face_encodings, k)
+
+        dist = self.distances(face_encodings)
+        return self._top_k(dist, k)
+
+    def _match_indexed(self, face_encodings, k):
+        """Exact re-rank of the candidates proposed by the approximate index"""
+        faces = np.asarray(face_encodings, dtype=np.float64).reshape(-1, ENCODING_DIM)
+        k = min(k, len(self))
+        indices = np.zeros((len(faces), k), dtype=np.intp)
+        distances = np.full((len(faces), k), np.inf)
+
+        for row, (face, candidates) in enumerate(zip(faces, self.index.candidates(faces))):
+            if not len(candidates):
+                continue
+            diff = self.encodings[candidates] - face
+            candidate_dist = np.sqrt(np.einsum('ij,ij->i', diff, diff))[None, :]
+            top, top_dist = self._top_k(candidate_dist, k)
+            indices[row, :top.shape[1]] = candidates[top[0]]
+            distances[row, :top.shape[1]] = top_dist[0]
+
+        # Queries with fewer than k candidates keep infinite distances
+        return indices, distances
+
+    @staticmethod
+    def _top_k(dist, k):
+        """Column indices and values of the k smallest entries per row, ascending"""
+        k = min(k, dist.shape[1])
+        if k == 0:
+            empty = np.empty((dist.shape[0], 0))
+            return empty.astype(np.intp), empty
+
+        if k < dist.shape[1]:
+            candidates = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(dist.shape[1]), dist.shape)
+        candidate_dist = np.take_along_axis(dist, candidates, axis=1)
+        order = np.argsort(candidate_dist, axis=1)
+        return (np.take_along_axis(candidates, order, axis=1),
+                np.take_along_axis(candidate_dist, order, axis=1))
+
+    def identify(self, face_encodings, tolerance=0.6):
+        """Best (student_id, name, distance) per face, or None when no known face is within tolerance"""
+        indices, distances = self.match(face_encodings, k=1)
+        if indices.shape[1] == 0:
+            return [None] * indices.shape[0]
+
+        results = []
+        for index, distance in zip(indices[:, 0], distances[:, 0]):
+            if distance <= tolerance:
+                results.append((self.ids[index], self.names[index], float(distance)))
+            else:
+                results.append(None)
+        return results
@@ -0,0 +1,149 @@
+import itertools
+import time
+import numpy as np
+
+
+class Track:
+    """A face followed across frames and the identity last matched to it"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, box, frame_no):
+        self.track_id = next(self._ids)
+        self.box = box
+        self.identity = None  # (student_id, name, distance) or None
+        self.confirmed = False
+        self.agreements = 0
+        self.last_encoded = None
+        self.last_seen = frame_no
+
+    @property
+    def student_id(self):
+        return self.identity[0] if self.identity else None
+
+
+class FaceTracker:
+    """IoU/centroid tracker that decides which faces actually need encoding
+
+    A track is encoded while it is new or unconfirmed. Once the same student
+    has been matched ``confirm_after`` times in a row it is only re-verified
+    every ``reverify_every`` processed frames. Unknown faces are retried every
+    ``retry_unknown_every`` frames instead of on every frame. Encoder and
+    gallery time are recorded as the 'encode' and 'match' stages of
+    ``metrics`` when one is given.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=5, confirm_after=1,
+                 reverify_every=15, retry_unknown_every=3, metrics=None):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.confirm_after = confirm_after
+        self.reverify_every = reverify_every
+        self.retry_unknown_every = retry_unknown_every
+        self.metrics = metrics
+        self.tracks = []
+        self.frame_no = 0
+        self.encoded = 0
+        self.skipped = 0
+
+    def update(self, face_locations):
+        """Associate this frame's (top, right, bottom, left) boxes with tracks, in order"""
+        self.frame_no += 1
+        boxes = [tuple(location) for location in face_locations]
+        assigned = [None] * len(boxes)
+
+        if boxes and self.tracks:
+            pairs = self._pair_scores(boxes)
+            used = set()
+            for score, box_index, track_index in pairs:
+                if assigned[box_index] is not None or track_index in used:
+                    continue
+                assigned[box_index] = self.tracks[track_index]
+                used.add(track_index)
+
+        for box_index, box in enumerate(boxes):
+            track = assigned[box_index]
+            if track is None:
+                track = Track(box, self.frame_no)
+                self.tracks.append(track)
+                assigned[box_index] = track
+            track.box = box
+            track.last_seen = self.frame_no
+
+        self.tracks = [track for track in self.tracks
+                       if self.frame_no - track.last_seen <= self.max_missed]
+        return assigned
+
+    def identify(self, face_locations, encode, gallery, tolerance=0.6):
+        """Per-face matches for this frame, encoding only the tracks that need it
+
+        ``encode`` maps a list of face locations to their encodings (one
+        batched encoder call); tracks that are skipped reuse their last match.
+        """
+        tracks = self.update(face_locations)
+        pending = [i for i, track in enumerate(tracks) if self.needs_encoding(track)]
+        if pending:
+            start = time.perf_counter()
+            encodings = encode([face_locations[i] for i in pending])
+            encoded = time.perf_counter()
+            identities = gallery.identify(encodings, tolerance=tolerance)
+            if self.metrics is not None:
+                self.metrics.observe('encode', encoded - start)
+                self.metrics.observe('match', time.perf_counter() - encoded)
+            for i, identity in zip(pending, identities):
+                self.assign(tracks[i], identity)
+        return [track.identity for track in tracks]
+
+    def needs_encoding(self, track):
+        """Whether this frame should spend an encoder call on the track"""
+        if track.last_encoded is None:
+            needed = True
+        elif not track.confirmed:
+            interval = 1 if track.identity else self.retry_unknown_every
+            needed = self.frame_no - track.last_encoded >= interval
+        else:
+            needed = self.frame_no - track.last_encoded >= self.reverify_every
+
+        if needed:
+            self.encoded += 1
+        else:
+            self.skipped += 1
+        return needed
+
+    def assign(self, track, identity):
+        """Record the gallery match for a freshly encoded track"""
+        track.last_encoded = self.frame_no
+        same = identity is not None and track.student_id == identity[0]
+        track.agreements = track.agreements + 1 if same else (1 if identity else 0)
+        track.identity = identity
+        track.confirmed = identity is not None and track.agreements >= self.confirm_after
+
+    def _pair_scores(self, boxes):
+        """Candidate (score, box, track) pairs, best first: IoU, then centroid proximity"""
+        new = np.array(boxes, dtype=np.float64)
+        old = np.array([track.box for track in self.tracks], dtype=np.float64)
+
+        # Boxes are (top, right, bottom, left)
+        top = np.maximum(new[:, None, 0], old[None, :, 0])
+        right = np.minimum(new[:, None, 1], old[None, :, 1])
+        bottom = np.minimum(new[:, None, 2], old[None, :, 2])
+        left = np.maximum(new[:, None, 3], old[None, :, 3])
+        inter = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+        area_new = (new[:, 1] - new[:, 3]) * (new[:, 2] - new[:, 0])
+        area_old = (old[:, 1] - old[:, 3]) * (old[:, 2] - old[:, 0])
+        iou = inter / np.maximum(area_new[:, None] + area_old[None, :] - inter, 1e-9)
+
+        # Fast movement can drop IoU to zero; accept centroids within half a face width
+        centre_new = np.stack(((new[:, 0] + new[:, 2]) / 2, (new[:, 1] + new[:, 3]) / 2), axis=1)
+        centre_old = np.stack(((old[:, 0] + old[:, 2]) / 2, (old[:, 1] + old[:, 3]) / 2), axis=1)
+        shift = np.linalg.norm(centre_new[:, None, :] - centre_old[None, :, :], axis=2)
+        width = np.maximum(new[:, None, 1] - new[:, None, 3], 1.0)
+        proximity = 1.0 - shift / (0.5 * width)
+
+        pairs = []
+        for box_index, track_index in zip(*np.nonzero(iou >= self.iou_threshold)):
+            pairs.append((1.0 + iou[box_index, track_index], box_index, track_index))
+        for box_index, track_index in zip(*np.nonzero((iou < self.iou_threshold) & (proximity > 0))):
+            pairs.append((proximity[box_index, track_index], box_index, track_index))
+        pairs.sort(key=lambda pair: -pair[0])
+        return pairs
@@ -0,0 +1,157 @@
+import logging
+import os
+import time
+import multiprocessing as mp
+from collections import namedtuple
+from multiprocessing import shared_memory
+import numpy as np
+
+RingFrame = namedtuple('RingFrame', 'seq timestamp slot image')
+
+# Header columns per slot; the extra last row holds (latest slot, next seq, unused)
+_SEQ, _TIME, _PINS = 0, 1, 2
+_WRITING = -1
+
+
+class FrameRing:
+    """Fixed-slot ring of frames in shared memory where the latest frame wins
+
+    The capture side writes into the oldest slot that nobody is reading and
+    never waits for consumers. Consumers (threads or processes) receive
+    read-only views of the newest frame, which stay valid until release();
+    a consumer that falls behind skips straight to the newest frame instead
+    of working through a backlog. Allocate one slot per concurrent reader
+    plus two, so the writer always has somewhere to go.
+    """
+
+    def __init__(self, shape, slots=4, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        size = self._header_bytes() + slots * int(np.prod(self.shape)) * self.dtype.itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._cond = mp.Condition()
+        self._owner_pid = os.getpid()
+        self._attach()
+        self._header[:] = 0
+        self._header[:, _SEQ] = -1
+        self._header[-1, 0] = -1
+
+    def __getstate__(self):
+        # Handed to worker processes at start-up; they attach to the same block
+        return {'shape': self.shape, 'dtype': self.dtype, 'slots': self.slots,
+                '_shm': self._shm, '_cond': self._cond, '_owner_pid': self._owner_pid}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._attach()
+
+    def claim(self):
+        """Reserve the oldest free slot; returns (slot, writable array) or None when all are pinned
+
+        Capture code can decode straight into the array (cv2 ``cap.read(array)``)
+        and then publish() it, so frames are never copied on the way in.
+        """
+        with self._cond:
+            header = self._header[:self.slots]
+            free = np.flatnonzero((header[:, _PINS] == 0) & (np.arange(self.slots) != self._header[-1, 0]))
+            if not len(free):
+                return None
+            slot = int(free[np.argmin(header[free, _SEQ])])
+            header[slot, _SEQ] = -1
+            header[slot, _PINS] = _WRITING
+        return slot, self._frames[slot]
+
+    def publish(self, slot, timestamp=None, pin=False):
+        """Make a claimed slot the newest frame and wake waiting readers; returns its seq"""
+        with self._cond:
+            seq = int(self._header[-1, 1])
+            self._header[-1, 1] = seq + 1
+            self._header[slot] = (seq, int((timestamp or time.time()) * 1e9), 1 if pin else 0)
+            self._header[-1, 0] = slot
+            self._cond.notify_all()
+        return seq
+
+    def abandon(self, slot):
+        """Give back a claimed slot without publishing it"""
+        with self._cond:
+            self._header[slot, _PINS] = 0
+
+    def write(self, frame, timestamp=None, pin=False):
+        """Copy a frame into the ring; returns its seq, or None when no slot is free
+
+        With ``pin`` the frame stays pinned for the caller (or whoever it hands
+        the seq to), who must release() it.
+        """
+        claimed = self.claim()
+        if claimed is None:
+            return None
+        slot, array = claimed
+        try:
+            np.copyto(array, frame)
+        except Exception:
+            self.abandon(slot)
+            raise
+        return self.publish(slot, timestamp, pin)
+
+    def latest(self, after=-1, timeout=None):
+        """Pin and return the newest frame with a seq above ``after``, or None on timeout"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._newest_seq() > after, timeout):
+                return None
+            return self._view(int(self._header[-1, 0]), pin=True)
+
+    def get(self, seq, pin=True):
+        """The frame with this seq if it is still in the ring, else None
+
+        Pass ``pin=False`` when the caller already holds a pin from write().
+        """
+        with self._cond:
+            header = self._header[:self.slots]
+            slots = np.flatnonzero((header[:, _SEQ] == seq) & (header[:, _PINS] >= 0))
+            if not len(slots):
+                return None
+            return self._view(int(slots[0]), pin)
+
+    def release(self, frame):
+        """Unpin a frame returned by latest()/get() or pinned by write(pin=True)"""
+        seq = frame.seq if isinstance(frame, RingFrame) else frame
+        with self._cond:
+            header = self._header[:self.slots]
+            for slot in np.flatnonzero((header[:, _SEQ] == seq) & (header[:, _PINS] > 0)):
+                header[slot, _PINS] -= 1
+
+    def close(self):
+        """Detach from the shared block; the creating process also frees it"""
+        self._header = self._frames = None
+        try:
+            self._shm.close()
+        except BufferError:
+            logging.warning("Frame ring closed while frame views were still in use")
+            return
+        # Forked readers inherit the object, so ownership goes by process id
+        if os.getpid() == self._owner_pid:
+            self._shm.unlink()
+
+    def _attach(self):
+        buf = self._shm.buf
+        self._header = np.ndarray((self.slots + 1, 3), dtype=np.int64, buffer=buf)
+        self._frames = np.ndarray((self.slots,) + self.shape, dtype=self.dtype,
+                                  buffer=buf, offset=self._header_bytes())
+
+    def _header_bytes(self):
+        # Keep frame data 64-byte aligned
+        return -(-(self.slots + 1) * 3 * 8 // 64) * 64
+
+    def _newest_seq(self):
+        slot = self._header[-1, 0]
+        return self._header[slot, _SEQ] if slot >= 0 else -1
+
+    def _view(self, slot, pin):
+        """Read-only view of a slot (caller holds the lock)"""
+        if pin:
+            self._header[slot, _PINS] += 1
+        image = self._frames[slot].view()
+        image.flags.writeable = False
+        seq, stamp = self._header[slot, _SEQ], self._header[slot, _TIME]
+        return RingFrame(int(seq), stamp / 1e9, slot, image)
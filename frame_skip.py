@@ -0,0 +1,80 @@
+import os
+import time
+import logging
+
+LATENCY_BUDGET = float(os.getenv('FACE_LATENCY_BUDGET_MS', '200')) / 1000
+MAX_SKIP = int(os.getenv('FACE_MAX_SKIP', '10'))
+
+
+class FrameSkipController:
+    """Decides how many camera frames to skip between processed ones
+
+    It tracks the camera frame interval, the time spent processing a frame
+    and the camera-to-result latency as moving averages. When latency runs
+    over ``target_latency`` because frames are waiting, or processing takes
+    longer than the frames it covers, the skip count goes up. When there is
+    plenty of headroom it comes back down one step at a time. Changes are at least
+    ``hold_frames`` processed frames apart so the controller does not
+    oscillate, and every change is logged.
+    """
+
+    def __init__(self, target_latency=LATENCY_BUDGET, initial_skip=1, min_skip=0,
+                 max_skip=MAX_SKIP, hold_frames=10, smoothing=0.2, name="frame skip"):
+        self.target_latency = target_latency
+        self.skip = initial_skip
+        self.min_skip = min_skip
+        self.max_skip = max_skip
+        self.hold_frames = hold_frames
+        self.smoothing = smoothing
+        self.name = name
+        self.frame_interval = None
+        self.processing_time = None
+        self.latency = None
+        self._since_processed = 0
+        self._since_change = 0
+        self._last_arrival = None
+
+    def should_process(self, timestamp=None, frames=1):
+        """Call once per captured frame (``frames`` > 1 when a buffer already dropped some)"""
+        now = timestamp or time.time()
+        if self._last_arrival is not None and now > self._last_arrival:
+            self.frame_interval = self._average(self.frame_interval, (now - self._last_arrival) / frames)
+        self._last_arrival = now
+
+        self._since_processed += frames
+        if self._since_processed <= self.skip:
+            return False
+        self._since_processed = 0
+        return True
+
+    def processed(self, processing_time, latency=None):
+        """Report how long the frame took to process and, if known, capture-to-result latency"""
+        self.processing_time = self._average(self.processing_time, processing_time)
+        self.latency = self._average(self.latency, latency if latency is not None else processing_time)
+        self._since_change += 1
+        if self._since_change < self.hold_frames or not self.frame_interval:
+            return
+
+        # Time available to process one frame before the next one is due
+        covered = (self.skip + 1) * self.frame_interval
+        # Skipping only helps latency that comes from frames waiting, not from slow frames
+        waiting = self.latency - self.processing_time
+        if self.processing_time > covered or (self.latency > self.target_latency
+                                              and waiting > 0.1 * self.target_latency):
+            self._change(min(self.max_skip, self.skip + max(1, self.skip // 2)), "over budget")
+        elif (self.latency < 0.6 * self.target_latency
+              and self.processing_time < 0.7 * self.skip * self.frame_interval):
+            self._change(max(self.min_skip, self.skip - 1), "idle")
+
+    def _change(self, skip, reason):
+        if skip == self.skip:
+            return
+        logging.info(f"{self.name}: {self.skip} -> {skip} ({reason}; latency {self.latency * 1000:.0f} ms, "
+                     f"processing {self.processing_time * 1000:.0f} ms, "
+                     f"frame interval {self.frame_interval * 1000:.0f} ms, "
+                     f"budget {self.target_latency * 1000:.0f} ms)")
+        self.skip = skip
+        self._since_change = 0
+
+    def _average(self, current, value):
+        return value if current is None else current + self.smoothing * (value - current)
@@ -0,0 +1,230 @@
+import os
+import logging
+import threading
+from datetime import timedelta
+from encoding_cache import load_gallery
+from encoding_format import decode
+
+# Seconds between background delta refreshes
+SYNC_INTERVAL = float(os.getenv('FACE_SYNC_INTERVAL', '5'))
+
+# Re-read this much history on every refresh so rows committed slightly after
+# their last_updated timestamp are not missed (re-applied rows are no-ops)
+SYNC_OVERLAP = timedelta(seconds=5)
+
+DELTA_QUERY = """
+    SELECT f.student_id, s.name, f.encoding, s.is_active
+    FROM face_encodings f
+    JOIN students s ON s.student_id = f.student_id
+    WHERE f.last_updated >= %s
+"""
+
+# Galleries that include inactive students do not need students.is_active
+DELTA_QUERY_NO_ACTIVE = """
+    SELECT f.student_id, s.name, f.encoding, TRUE
+    FROM face_encodings f
+    JOIN students s ON s.student_id = f.student_id
+    WHERE f.last_updated >= %s
+"""
+
+TOMBSTONE_QUERY = """
+    SELECT student_id FROM face_encoding_tombstones
+    WHERE deleted_at >= %s
+"""
+
+EXISTING_TRIGGERS_QUERY = """
+    SELECT TRIGGER_NAME FROM information_schema.TRIGGERS
+    WHERE TRIGGER_SCHEMA = DATABASE()
+"""
+
+# MySQL's ER_TRG_ALREADY_EXISTS
+TRIGGER_EXISTS_ERRNO = 1359
+
+
+def create_sync_schema(cursor, track_is_active=True):
+    """Create the tombstone table and the triggers that keep it (and last_updated) current
+
+    Triggers that already exist are left as they are; drop one by hand to
+    have it recreated with a changed definition.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS face_encoding_tombstones (
+            student_id VARCHAR(20) PRIMARY KEY,
+            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_deleted_at (deleted_at)
+        )
+    """)
+
+    # Cascaded deletes do not fire triggers, so students need their own
+    triggers = {
+        'face_encodings_tombstone': """
+            CREATE TRIGGER face_encodings_tombstone AFTER DELETE ON face_encodings
+            FOR EACH ROW
+                INSERT INTO face_encoding_tombstones (student_id, deleted_at)
+                VALUES (OLD.student_id, NOW())
+                ON DUPLICATE KEY UPDATE deleted_at = NOW()
+        """,
+        'students_tombstone': """
+            CREATE TRIGGER students_tombstone BEFORE DELETE ON students
+            FOR EACH ROW
+                INSERT INTO face_encoding_tombstones (student_id, deleted_at)
+                VALUES (OLD.student_id, NOW())
+                ON DUPLICATE KEY UPDATE deleted_at = NOW()
+        """,
+    }
+    # Renames bump last_updated too, so the cache stamp and the delta see the new name
+    triggers['students_name_touch'] = """
+        CREATE TRIGGER students_name_touch AFTER UPDATE ON students
+        FOR EACH ROW
+            UPDATE face_encodings SET last_updated = NOW()
+            WHERE student_id = NEW.student_id AND NOT (NEW.name <=> OLD.name)
+    """
+    if track_is_active:
+        # Deactivating a student bumps last_updated so the delta picks it up
+        triggers['students_active_touch'] = """
+            CREATE TRIGGER students_active_touch AFTER UPDATE ON students
+            FOR EACH ROW
+                UPDATE face_encodings SET last_updated = NOW()
+                WHERE student_id = NEW.student_id AND NOT (NEW.is_active <=> OLD.is_active)
+        """
+
+    # Only missing triggers are created: replacing them would need the TRIGGER
+    # privilege on every start and leave a window where deletes are not recorded
+    cursor.execute(EXISTING_TRIGGERS_QUERY)
+    existing = {row[0] for row in cursor.fetchall()}
+    for name, statement in triggers.items():
+        if name in existing:
+            continue
+        try:
+            cursor.execute(statement)
+        except Exception as e:
+            # Another kiosk starting at the same time created it first
+            if getattr(e, 'errno', None) != TRIGGER_EXISTS_ERRNO:
+                raise
+        else:
+            logging.info(f"Created trigger {name}")
+
+
+class GallerySync:
+    """Keeps an in-memory FaceGallery current by pulling only changed rows
+
+    Changes are found through face_encodings.last_updated, and deletions through
+    the face_encoding_tombstones table. Every applied delta publishes a new
+    immutable gallery on ``self.gallery`` (built off the reader's thread);
+    readers should fetch that attribute once per frame and use that snapshot
+    throughout, which needs no locking.
+    """
+
+    def __init__(self, connect, active_only=False, index=None, on_change=None):
+        self.connect = connect
+        self.active_only = active_only
+        self.index = index
+        self.on_change = on_change
+        self.gallery = None
+        self.watermark = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """Full (cached) load that establishes the delta watermark
+
+        The new gallery is built completely before it is published, so readers
+        keep matching against the previous snapshot until the swap.
+        """
+        index = self.index.empty_copy() if self.index is not None else None
+        with self._lock:
+            with self.connect() as conn:
+                watermark = self._db_now(conn)
+                gallery = load_gallery(conn, active_only=self.active_only, index=index)
+            self.watermark = watermark
+            self._publish(gallery)
+        return gallery
+
+    def refresh(self):
+        """Apply rows changed since the last refresh; returns the number of changes"""
+        if self.gallery is None:
+            self.load()
+            return len(self.gallery)
+
+        with self._lock:
+            with self.connect() as conn:
+                watermark = self._db_now(conn)
+                since = self.watermark - SYNC_OVERLAP
+                upserts, removed = self._fetch_changes(conn, since)
+            self.watermark = watermark
+
+            gallery = self.gallery.with_changes(upserts, removed)
+            if gallery is self.gallery:
+                return 0
+            self._publish(gallery)
+
+        logging.info(f"Gallery refresh applied {len(upserts)} updates and {len(removed)} removals")
+        return len(upserts) + len(removed)
+
+    def start(self, interval=SYNC_INTERVAL):
+        """Refresh in a background thread every ``interval`` seconds"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Gallery refresh failed: {e}")
+
+    def _publish(self, gallery):
+        # A single reference assignment: readers see the old or the new snapshot
+        self.gallery = gallery
+        if self.on_change:
+            self.on_change(gallery)
+
+    def _fetch_changes(self, conn, since):
+        """Changed rows as upserts and removed student ids (tombstones, deactivations)"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(DELTA_QUERY if self.active_only else DELTA_QUERY_NO_ACTIVE, (since,))
+            rows = cursor.fetchall()
+
+            removed = []
+            try:
+                cursor.execute(TOMBSTONE_QUERY, (since,))
+                removed = [student_id for (student_id,) in cursor.fetchall()]
+            except Exception as e:
+                logging.warning(f"Tombstones unavailable, deletions will not sync: {e}")
+        finally:
+            cursor.close()
+
+        upserts = []
+        live = set()
+        for student_id, name, encoding_bytes, is_active in rows:
+            if self.active_only and not is_active:
+                removed.append(student_id)
+            else:
+                try:
+                    upserts.append((student_id, name, decode(encoding_bytes)))
+                    live.add(student_id)
+                except ValueError as e:
+                    logging.error(f"Error decoding face for {student_id}: {e}")
+
+        # A row that still exists was re-registered after its tombstone
+        removed = [student_id for student_id in removed if student_id not in live]
+        return upserts, removed
+
+    @staticmethod
+    def _db_now(conn):
+        """Database clock, ending any open snapshot so the next reads are fresh"""
+        conn.commit()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT CURRENT_TIMESTAMP")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
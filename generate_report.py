@@ -1,138 +1,359 @@
-import pandas as pd
-from db_utils import db_connection  # Using the connection pool
-import logging
-from datetime import datetime
-import os
-import argparse
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-
-def generate_report(start_date, end_date, output_format='csv', output_dir='reports'):
-    """
-    Generate comprehensive attendance report with multiple output options
-    
-    Args:
-        start_date (str): Start date in YYYY-MM-DD format
-        end_date (str): End date in YYYY-MM-DD format
-        output_format (str): 'csv', 'excel', or 'both'
-        output_dir (str): Directory to save reports
-    """
-    try:
-        # Validate and parse dates
-        start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
-        end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
-        
-        if start_dt > end_dt:
-            raise ValueError("Start date cannot be after end date")
-            
-        # Create output directory if it doesn't exist
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Base filename with timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        base_filename = f"attendance_report_{start_date}_to_{end_date}_{timestamp}"
-        
-        with db_connection() as conn:
-            # Main attendance data
-            attendance_query = """
-                SELECT 
-                    s.student_id, 
-                    s.name, 
-                    s.department,
-                    a.date, 
-                    TIME_FORMAT(a.time, '%H:%i:%s') as time,
-                    a.status,
-                    a.notes
-                FROM attendance a
-                JOIN students s ON a.student_id = s.student_id
-                WHERE a.date BETWEEN %s AND %s
-                ORDER BY a.date, s.department, s.student_id
-            """
-            df_attendance = pd.read_sql_query(attendance_query, conn, params=(start_date, end_date))
-            
-            # Summary statistics
-            summary_query = """
-                SELECT 
-                    s.department,
-                    COUNT(DISTINCT s.student_id) as total_students,
-                    SUM(CASE WHEN a.status = 'present' THEN 1 ELSE 0 END) as present_count,
-                    SUM(CASE WHEN a.status = 'absent' THEN 1 ELSE 0 END) as absent_count,
-                    SUM(CASE WHEN a.status = 'late' THEN 1 ELSE 0 END) as late_count
-                FROM students s
-                LEFT JOIN attendance a ON s.student_id = a.student_id 
-                    AND a.date BETWEEN %s AND %s
-                GROUP BY s.department
-                ORDER BY s.department
-            """
-            df_summary = pd.read_sql_query(summary_query, conn, params=(start_date, end_date))
-            
-            # Calculate percentages
-            df_summary['present_percentage'] = (df_summary['present_count'] / 
-                                              (df_summary['present_count'] + 
-                                               df_summary['absent_count'] + 
-                                               df_summary['late_count'])) * 100
-            
-        if df_attendance.empty:
-            print(" No attendance records found for the selected date range")
-            return
-        
-        # Generate reports based on requested format
-        if output_format in ('csv', 'both'):
-            csv_path = os.path.join(output_dir, f"{base_filename}.csv")
-            df_attendance.to_csv(csv_path, index=False)
-            print(f" CSV report saved to {csv_path}")
-            
-        if output_format in ('excel', 'both'):
-            excel_path = os.path.join(output_dir, f"{base_filename}.xlsx")
-            with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                df_attendance.to_excel(writer, sheet_name='Attendance Details', index=False)
-                df_summary.to_excel(writer, sheet_name='Summary Statistics', index=False)
-                
-                # Add some Excel formatting
-                workbook = writer.book
-                for sheetname in writer.sheets:
-                    worksheet = writer.sheets[sheetname]
-                    for column in worksheet.columns:
-                        max_length = 0
-                        column = [cell for cell in column]
-                        for cell in column:
-                            try:
-                                if len(str(cell.value)) > max_length:
-                                    max_length = len(cell.value)
-                            except:
-                                pass
-                        adjusted_width = (max_length + 2) * 1.2
-                        worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
-                
-            print(f"Excel report saved to {excel_path}")
-            
-        logging.info(f"Generated report from {start_date} to {end_date}")
-        
-    except ValueError as e:
-        print(f" Error: {e}")
-        logging.error(f"Invalid date input: {e}")
-    except Exception as e:
-        print(f" Unexpected error: {e}")
-        logging.error(f"Report generation failed: {e}")
-
-def main():
-    parser = argparse.ArgumentParser(description='Generate attendance reports')
-    parser.add_argument('start_date', help='Start date (YYYY-MM-DD)')
-    parser.add_argument('end_date', help='End date (YYYY-MM-DD)')
-    parser.add_argument('--format', choices=['csv', 'excel', 'both'], 
-                       default='csv', help='Output format')
-    parser.add_argument('--output', default='reports', 
-                       help='Output directory path')
-    
-    args = parser.parse_args()
-    
-    print("\n=== Attendance Report Generator ===")
-    print(f"Generating report from {args.start_date} to {args.end_date}")
-    generate_report(args.start_date, args.end_date, args.format, args.output)
-
-if __name__ == "__main__":
+import pandas as pd
+from db_utils import storage  # Pooled repository shared by every entry point
+import logging
+from datetime import datetime
+import os
+import csv
+import time
+import argparse
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Rows fetched and written per step in streaming mode
+REPORT_CHUNK_SIZE = int(os.getenv('REPORT_CHUNK_SIZE', '5000'))
+
+# Rows per worksheet, header included (Excel's limit)
+EXCEL_MAX_ROWS = 1048576
+
+ATTENDANCE_QUERY = """
+    SELECT 
+        s.student_id, 
+        s.name, 
+        s.department,
+        a.date, 
+        TIME_FORMAT(a.time, '%H:%i:%s') as time,
+        a.status,
+        a.notes
+    FROM attendance a
+    JOIN students s ON a.student_id = s.student_id
+    WHERE a.date BETWEEN %s AND %s
+    ORDER BY a.date, s.department, s.student_id
+"""
+
+SUMMARY_QUERY = """
+    SELECT 
+        s.department,
+        COUNT(DISTINCT s.student_id) as total_students,
+        SUM(CASE WHEN a.status = 'present' THEN 1 ELSE 0 END) as present_count,
+        SUM(CASE WHEN a.status = 'absent' THEN 1 ELSE 0 END) as absent_count,
+        SUM(CASE WHEN a.status = 'late' THEN 1 ELSE 0 END) as late_count
+    FROM students s
+    LEFT JOIN attendance a ON s.student_id = a.student_id 
+        AND a.date BETWEEN %s AND %s
+    GROUP BY s.department
+    ORDER BY s.department
+"""
+
+COUNT_QUERY = "SELECT COUNT(*) FROM attendance WHERE date BETWEEN %s AND %s"
+
+ROSTER_QUERY = "SELECT department, COUNT(*) FROM students GROUP BY department"
+
+SUMMARY_COLUMNS = ['department', 'total_students', 'present_count', 'absent_count',
+                   'late_count', 'present_percentage']
+
+
+class SummaryAccumulator:
+    """Per-department status counts built up chunk by chunk, matching SUMMARY_QUERY"""
+
+    def __init__(self, roster):
+        # roster: department -> number of students, so departments without marks still appear
+        self.totals = dict(roster)
+        self.counts = {department: {'present': 0, 'absent': 0, 'late': 0} for department in self.totals}
+
+    def add(self, rows, department_col, status_col):
+        for row in rows:
+            counts = self.counts.setdefault(row[department_col], {'present': 0, 'absent': 0, 'late': 0})
+            status = (row[status_col] or '').lower()
+            if status in counts:
+                counts[status] += 1
+
+    def rows(self):
+        """Summary rows in SUMMARY_COLUMNS order, sorted by department (NULL first)"""
+        result = []
+        for department in sorted(self.counts, key=lambda d: (d is not None, d or '')):
+            counts = self.counts[department]
+            marked = counts['present'] + counts['absent'] + counts['late']
+            percentage = counts['present'] / marked * 100 if marked else None
+            result.append([department, self.totals.get(department, 0), counts['present'],
+                           counts['absent'], counts['late'], percentage])
+        return result
+
+
+def column_widths(columns, rows):
+    """Excel column widths from the longest header or value per column in ``rows`` (a sample)"""
+    widths = []
+    for column, values in zip(columns, zip(*rows) if rows else [()] * len(columns)):
+        longest = max([len(str(value)) for value in values if value is not None] + [len(str(column))])
+        widths.append((longest + 2) * 1.2)
+    return widths
+
+
+class ExcelReportWriter:
+    """Constant-memory workbook: detail rows are streamed in, the summary is added last
+
+    openpyxl's write-only mode spools rows to disk as they are appended instead
+    of keeping a cell object per value. Such a sheet cannot be revisited, so
+    column widths are fixed up front from the header and the first chunk.
+    Detail rows beyond ``max_rows`` per sheet continue on "Attendance Details 2",
+    "Attendance Details 3", ... Rows are written as given, so missing values
+    must be None (NaN would be written as an empty number, not a blank cell).
+    """
+
+    def __init__(self, path, max_rows=EXCEL_MAX_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        self.workbook = Workbook(write_only=True)
+        self._details = None
+        self._details_sheets = 0
+        self._details_rows = 0
+
+    def add_rows(self, columns, rows):
+        start = 0
+        while start < len(rows):
+            if self._details is None or self._details_rows == self.max_rows:
+                self._details_sheets += 1
+                title = 'Attendance Details'
+                if self._details_sheets > 1:
+                    title += f" {self._details_sheets}"
+                self._details = self._sheet(title, columns, rows[start:])
+                self._details_rows = 1
+            part = rows[start:start + self.max_rows - self._details_rows]
+            for row in part:
+                self._details.append(row)
+            self._details_rows += len(part)
+            start += len(part)
+
+    def write_summary(self, columns, rows):
+        """Summary sheet from already aggregated rows"""
+        sheet = self._sheet('Summary Statistics', columns, rows)
+        for row in rows:
+            sheet.append(row)
+
+    def save(self):
+        self.workbook.save(self.path)
+
+    def _sheet(self, title, columns, sample):
+        sheet = self.workbook.create_sheet(title)
+        for index, width in enumerate(column_widths(columns, sample), start=1):
+            sheet.column_dimensions[get_column_letter(index)].width = width
+        sheet.append(list(columns))
+        return sheet
+
+
+def write_excel(excel_path, df_attendance, df_summary):
+    """Workbook through pandas' openpyxl writer, sizing columns from every cell"""
+    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
+        df_attendance.to_excel(writer, sheet_name='Attendance Details', index=False)
+        df_summary.to_excel(writer, sheet_name='Summary Statistics', index=False)
+        
+        # Add some Excel formatting
+        workbook = writer.book
+        for sheetname in writer.sheets:
+            worksheet = writer.sheets[sheetname]
+            for column in worksheet.columns:
+                max_length = 0
+                column = [cell for cell in column]
+                for cell in column:
+                    try:
+                        if len(str(cell.value)) > max_length:
+                            max_length = len(cell.value)
+                    except:
+                        pass
+                adjusted_width = (max_length + 2) * 1.2
+                worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
+
+
+def write_excel_fast(excel_path, df_attendance, df_summary, chunk_size=REPORT_CHUNK_SIZE):
+    """Same workbook through ExcelReportWriter, a chunk of rows at a time"""
+    excel = ExcelReportWriter(excel_path)
+    columns = list(df_attendance.columns)
+    for start in range(0, len(df_attendance), chunk_size):
+        excel.add_rows(columns, _frame_rows(df_attendance.iloc[start:start + chunk_size]))
+    excel.write_summary(list(df_summary.columns), _frame_rows(df_summary))
+    excel.save()
+
+
+def _frame_rows(df):
+    """DataFrame rows as tuples with NaN/NaT as None, which openpyxl leaves blank like pandas does"""
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def stream_report(start_date, end_date, csv_path=None, excel_path=None, summary_path=None,
+                  chunk_size=REPORT_CHUNK_SIZE):
+    """Write the attendance rows and the summary without holding the range in memory
+
+    Rows are pulled in chunks of ``chunk_size`` from a streaming cursor and
+    appended to the CSV and/or the write-only workbook as they arrive, while
+    the summary counters are updated from the same chunks, so peak memory is
+    one chunk plus one counter set per department. The summary goes to
+    ``summary_path`` and to the workbook's summary sheet. Returns the number
+    of rows written (no files when 0).
+    """
+    with storage.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(COUNT_QUERY, (start_date, end_date))
+            (total,) = cursor.fetchone()
+            cursor.execute(ROSTER_QUERY)
+            summary = SummaryAccumulator(cursor.fetchall())
+        finally:
+            cursor.close()
+    if not total:
+        return 0
+
+    written = 0
+    started = time.perf_counter()
+    excel = ExcelReportWriter(excel_path) if excel_path else None
+    with storage.stream(ATTENDANCE_QUERY, (start_date, end_date)) as cursor:
+        columns = [column[0] for column in cursor.description]
+        department_col, status_col = columns.index('department'), columns.index('status')
+        f = open(csv_path, 'w', newline='', encoding='utf-8') if csv_path else None
+        try:
+            writer = csv.writer(f) if f else None
+            if writer:
+                writer.writerow(columns)
+            for rows in iter(lambda: cursor.fetchmany(chunk_size), []):
+                if writer:
+                    writer.writerows(rows)
+                if excel:
+                    excel.add_rows(columns, rows)
+                summary.add(rows, department_col, status_col)
+                written += len(rows)
+                elapsed = time.perf_counter() - started
+                print(f"\r Wrote {written:,} of {total:,} rows ({written / max(total, written):.0%}, "
+                      f"{written / max(elapsed, 1e-9):,.0f} rows/s)", end='', flush=True)
+        finally:
+            if f:
+                f.close()
+    print()
+
+    summary_rows = summary.rows()
+    if summary_path:
+        with open(summary_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(SUMMARY_COLUMNS)
+            writer.writerows(summary_rows)
+    if excel:
+        excel.write_summary(SUMMARY_COLUMNS, summary_rows)
+        excel.save()
+    return written
+
+
+def generate_report(start_date, end_date, output_format='csv', output_dir='reports', stream=False,
+                    chunk_size=REPORT_CHUNK_SIZE, fast_excel=False):
+    """
+    Generate comprehensive attendance report with multiple output options
+    
+    Args:
+        start_date (str): Start date in YYYY-MM-DD format
+        end_date (str): End date in YYYY-MM-DD format
+        output_format (str): 'csv', 'excel', or 'both'
+        output_dir (str): Directory to save reports
+        stream (bool): Write chunk by chunk in bounded memory
+        chunk_size (int): Rows per chunk in streaming mode
+        fast_excel (bool): Use the write-only Excel writer (always used when streaming)
+    """
+    try:
+        # Validate and parse dates
+        start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
+        
+        if start_dt > end_dt:
+            raise ValueError("Start date cannot be after end date")
+            
+        # Create output directory if it doesn't exist
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # Base filename with timestamp
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        base_filename = f"attendance_report_{start_date}_to_{end_date}_{timestamp}"
+        
+        if stream:
+            csv_path = summary_path = excel_path = None
+            if output_format in ('csv', 'both'):
+                csv_path = os.path.join(output_dir, f"{base_filename}.csv")
+                summary_path = os.path.join(output_dir, f"{base_filename}_summary.csv")
+            if output_format in ('excel', 'both'):
+                excel_path = os.path.join(output_dir, f"{base_filename}.xlsx")
+            if not stream_report(start_date, end_date, csv_path, excel_path, summary_path, chunk_size):
+                print(" No attendance records found for the selected date range")
+                return
+            if csv_path:
+                print(f" CSV report saved to {csv_path}")
+                print(f" Summary saved to {summary_path}")
+            if excel_path:
+                print(f"Excel report saved to {excel_path}")
+            logging.info(f"Generated streaming report from {start_date} to {end_date}")
+            return
+        
+        with storage.connection() as conn:
+            # Main attendance data
+            df_attendance = pd.read_sql_query(ATTENDANCE_QUERY, conn, params=(start_date, end_date))
+            
+            # Summary statistics
+            df_summary = pd.read_sql_query(SUMMARY_QUERY, conn, params=(start_date, end_date))
+            
+            # Calculate percentages
+            df_summary['present_percentage'] = (df_summary['present_count'] / 
+                                              (df_summary['present_count'] + 
+                                               df_summary['absent_count'] + 
+                                               df_summary['late_count'])) * 100
+            
+        if df_attendance.empty:
+            print(" No attendance records found for the selected date range")
+            return
+        
+        # Generate reports based on requested format
+        if output_format in ('csv', 'both'):
+            csv_path = os.path.join(output_dir, f"{base_filename}.csv")
+            df_attendance.to_csv(csv_path, index=False)
+            print(f" CSV report saved to {csv_path}")
+            
+        if output_format in ('excel', 'both'):
+            excel_path = os.path.join(output_dir, f"{base_filename}.xlsx")
+            if fast_excel:
+                write_excel_fast(excel_path, df_attendance, df_summary, chunk_size)
+            else:
+                write_excel(excel_path, df_attendance, df_summary)
+                
+            print(f"Excel report saved to {excel_path}")
+            
+        logging.info(f"Generated report from {start_date} to {end_date}")
+        
+    except ValueError as e:
+        print(f" Error: {e}")
+        logging.error(f"Invalid date input: {e}")
+    except Exception as e:
+        print(f" Unexpected error: {e}")
+        logging.error(f"Report generation failed: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate attendance reports')
+    parser.add_argument('start_date', help='Start date (YYYY-MM-DD)')
+    parser.add_argument('end_date', help='End date (YYYY-MM-DD)')
+    parser.add_argument('--format', choices=['csv', 'excel', 'both'], 
+                       default='csv', help='Output format')
+    parser.add_argument('--output', default='reports', 
+                       help='Output directory path')
+    parser.add_argument('--stream', action='store_true',
+                       help='Write in fixed-size chunks with bounded memory')
+    parser.add_argument('--chunk-size', type=int, default=REPORT_CHUNK_SIZE,
+                       help='Rows per chunk in streaming mode')
+    parser.add_argument('--fast-excel', action='store_true',
+                       help='Write Excel in write-only mode with sampled column widths')
+    
+    args = parser.parse_args()
+    
+    print("\n=== Attendance Report Generator ===")
+    print(f"Generating report from {args.start_date} to {args.end_date}")
+    generate_report(args.start_date, args.end_date, args.format, args.output, args.stream, args.chunk_size,
+                    args.fast_excel)
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_WINDOW = float(os.getenv('FACE_METRICS_WINDOW', '60'))
+METRICS_LOG_INTERVAL = float(os.getenv('FACE_METRICS_LOG_INTERVAL', '60'))
+METRICS_PORT = int(os.getenv('FACE_METRICS_PORT', '0'))
+
+# Latency buckets from 0.1 ms to ~100 s, each 20% wider than the last
+BUCKET_BOUNDS_MS = [0.1 * 1.2 ** i for i in range(77)]
+
+STAGES = ('capture', 'detect', 'encode', 'match', 'mark', 'display', 'latency')
+
+
+class RollingHistogram:
+    """Bucketed latency histogram over a sliding time window
+
+    Recording is a bisect and an increment under a lock. The window is kept
+    as ``slices`` sub-histograms that are dropped as they age out, so
+    percentiles always describe roughly the last ``window`` seconds.
+    Percentiles are accurate to one bucket (about 20%).
+    """
+
+    def __init__(self, window=METRICS_WINDOW, slices=6):
+        self.slice_seconds = window / slices
+        self._slices = deque([self._empty()], maxlen=slices)
+        self._slice_start = self._created = time.monotonic()
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def record(self, ms):
+        index = bisect.bisect_left(BUCKET_BOUNDS_MS, ms)
+        with self._lock:
+            self._rotate()
+            self._slices[-1][index] += 1
+            self.total += 1
+
+    def summary(self):
+        with self._lock:
+            self._rotate()
+            counts = [sum(column) for column in zip(*self._slices)]
+            covered = min(time.monotonic() - self._created,
+                          self.slice_seconds * (len(self._slices) - 1)
+                          + time.monotonic() - self._slice_start)
+            total = self.total
+
+        count = sum(counts)
+        result = {'count': count, 'total': total,
+                  'rate_per_s': round(count / max(covered, 1.0), 2)}
+        for name, q in (('p50_ms', 0.50), ('p90_ms', 0.90), ('p99_ms', 0.99)):
+            result[name] = self._percentile(counts, count, q)
+        return result
+
+    @staticmethod
+    def _percentile(counts, count, q):
+        if not count:
+            return None
+        rank, seen = q * count, 0
+        for index, bucket in enumerate(counts):
+            seen += bucket
+            if seen >= rank:
+                # Geometric middle of the bucket
+                upper = BUCKET_BOUNDS_MS[min(index, len(BUCKET_BOUNDS_MS) - 1)]
+                return round(upper / 1.2 ** 0.5, 3)
+        return round(BUCKET_BOUNDS_MS[-1], 3)
+
+    def _empty(self):
+        return [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def _rotate(self):
+        """Start new slices for the time that has passed (caller holds the lock)"""
+        elapsed = int((time.monotonic() - self._slice_start) // self.slice_seconds)
+        if elapsed <= 0:
+            return
+        for _ in range(min(elapsed, self._slices.maxlen)):
+            self._slices.append(self._empty())
+        self._slice_start += elapsed * self.slice_seconds
+
+
+class Metrics:
+    """Per-stage rolling latency histograms and counters for one process"""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._logger = None
+
+    def observe(self, stage, seconds):
+        """Record one stage duration in seconds"""
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, RollingHistogram(self.window))
+        histogram.record(seconds * 1000)
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        return {'stages': {stage: histogram.summary() for stage, histogram in histograms.items()},
+                'counters': counters}
+
+    def rate(self, stage):
+        """Events per second for a stage over the window"""
+        histogram = self._histograms.get(stage)
+        return histogram.summary()['rate_per_s'] if histogram else 0.0
+
+    def status_line(self, rate_stage='latency'):
+        """Compact one-line summary for a status bar"""
+        # One snapshot, so every figure on the line covers the same moment
+        snapshot = self.snapshot()
+        stages, counters = snapshot['stages'], snapshot['counters']
+        rate = stages[rate_stage]['rate_per_s'] if rate_stage in stages else 0.0
+        parts = [f"{rate:.1f} fps"]
+        for stage in STAGES:
+            summary = stages.get(stage)
+            if summary and summary['p50_ms'] is not None:
+                parts.append(f"{stage} {summary['p50_ms']:.0f}/{summary['p99_ms']:.0f}ms")
+        if counters.get('gate_checks'):
+            parts.append(f"gate skip {counters.get('gate_skipped', 0) / counters['gate_checks']:.0%}")
+        return " | ".join(parts)
+
+    def render_text(self):
+        """Plain-text exposition of the current snapshot for scrapers"""
+        snapshot = self.snapshot()
+        lines = []
+        for stage, summary in sorted(snapshot['stages'].items()):
+            for key in ('p50_ms', 'p90_ms', 'p99_ms'):
+                if summary[key] is not None:
+                    quantile = key[1:3]
+                    lines.append(f'face_stage_latency_ms{{stage="{stage}",quantile="0.{quantile}"}} {summary[key]}')
+            lines.append(f'face_stage_rate_per_s{{stage="{stage}"}} {summary["rate_per_s"]}')
+            lines.append(f'face_stage_total{{stage="{stage}"}} {summary["total"]}')
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f'face_{name}_total {value}')
+        return "\n".join(lines) + "\n"
+
+    def start_reporting(self, log_interval=METRICS_LOG_INTERVAL, port=METRICS_PORT):
+        """Log a JSON snapshot every ``log_interval`` seconds and serve text on 127.0.0.1:``port``
+
+        Either is skipped when set to 0. Safe to call more than once.
+        """
+        with self._lock:
+            if log_interval and self._logger is None:
+                self._logger = threading.Thread(target=self._log_loop, args=(log_interval,), daemon=True)
+                self._logger.start()
+            if port and self._server is None:
+                try:
+                    self._server = ThreadingHTTPServer(('127.0.0.1', port), _handler(self))
+                except OSError as e:
+                    logging.error(f"Could not serve metrics on port {port}: {e}")
+                else:
+                    threading.Thread(target=self._server.serve_forever, daemon=True).start()
+                    logging.info(f"Serving metrics on http://127.0.0.1:{port}/metrics")
+
+    def _log_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            logging.info("metrics " + json.dumps(self.snapshot(), sort_keys=True))
+
+
+def _handler(metrics):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = metrics.render_text().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+# Shared by everything in the process
+metrics = Metrics()
@@ -0,0 +1,73 @@
+import cv2
+import os
+import numpy as np
+
+GATE_WIDTH = 64
+OPEN_THRESHOLD = float(os.getenv('FACE_MOTION_OPEN', '0.02'))
+CLOSE_THRESHOLD = float(os.getenv('FACE_MOTION_CLOSE', '0.005'))
+HOLD_FRAMES = int(os.getenv('FACE_MOTION_HOLD', '15'))
+
+
+class MotionGate:
+    """Cheap change detector that decides whether a frame is worth running HOG on
+
+    Each frame is shrunk to a ``width``-pixel-wide blurred grayscale thumbnail
+    and compared with the previous one. The gate opens when more than
+    ``open_threshold`` of the thumbnail's pixels changed by over
+    ``pixel_threshold`` grey levels. It closes again only after
+    ``hold_frames`` consecutive frames below ``close_threshold``, so people
+    who pause in front of the camera are still recognised. Checks and
+    skipped frames are counted as gate_checks/gate_skipped in ``metrics``.
+    """
+
+    def __init__(self, width=GATE_WIDTH, pixel_threshold=12, open_threshold=OPEN_THRESHOLD,
+                 close_threshold=CLOSE_THRESHOLD, hold_frames=HOLD_FRAMES, bgr=True, metrics=None):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.open_threshold = open_threshold
+        self.close_threshold = close_threshold
+        self.hold_frames = hold_frames
+        self.conversion = cv2.COLOR_BGR2GRAY if bgr else cv2.COLOR_RGB2GRAY
+        self.metrics = metrics
+        self.is_open = True
+        self.checks = 0
+        self.skipped = 0
+        self._previous = None
+        self._quiet = 0
+
+    @property
+    def hit_rate(self):
+        """Fraction of checked frames that skipped detection"""
+        return self.skipped / self.checks if self.checks else 0.0
+
+    def check(self, frame):
+        """True when something changed enough to run detection on this frame"""
+        height = max(1, frame.shape[0] * self.width // frame.shape[1])
+        thumbnail = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        thumbnail = cv2.GaussianBlur(cv2.cvtColor(thumbnail, self.conversion), (3, 3), 0)
+
+        if self._previous is None or self._previous.shape != thumbnail.shape:
+            changed = 1.0
+        else:
+            changed = np.count_nonzero(cv2.absdiff(thumbnail, self._previous) > self.pixel_threshold) / thumbnail.size
+        self._previous = thumbnail
+
+        if changed >= self.open_threshold:
+            self.is_open = True
+            self._quiet = 0
+        elif changed < self.close_threshold:
+            self._quiet += 1
+            if self._quiet >= self.hold_frames:
+                self.is_open = False
+        else:
+            # Some activity: not enough to open, but it keeps an open gate open
+            self._quiet = 0
+
+        self.checks += 1
+        if not self.is_open:
+            self.skipped += 1
+        if self.metrics is not None:
+            self.metrics.count('gate_checks')
+            if not self.is_open:
+                self.metrics.count('gate_skipped')
+        return self.is_open
@@ -0,0 +1,367 @@
+import cv2
+import os
+import time
+import logging
+import argparse
+import threading
+import multiprocessing as mp
+from collections import deque
+from datetime import datetime
+from recognition_pipeline import RecognitionPipeline
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class FrameSource:
+    """A camera index, video file or directory of images read on its own thread
+
+    Only the newest frame is kept (``latest`` is a (seq, timestamp, frame)
+    tuple), so a source that produces faster than it is recognised never
+    builds up lag. Files and image directories are paced at ``fps`` (the
+    file's own rate by default) to behave like a live camera.
+    """
+
+    def __init__(self, spec, name=None, budget=None, fps=None, loop=False):
+        self.spec = spec
+        self.name = name or spec
+        self.budget = budget  # max frames per second sent to recognition
+        self.fps = fps
+        self.loop = loop
+        self.latest = None
+        self.captured = 0
+        self.finished = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def _run(self):
+        try:
+            for frame, interval in self._frames():
+                self.captured += 1
+                self.latest = (self.captured, time.time(), frame)
+                if interval:
+                    self._stop.wait(interval)
+                if self._stop.is_set():
+                    break
+        except Exception as e:
+            logging.error(f"Source {self.name} failed: {e}")
+        finally:
+            self.finished = True
+
+    def _frames(self):
+        """Yield (frame, seconds to wait before the next one)"""
+        if os.path.isdir(self.spec):
+            names = sorted(name for name in os.listdir(self.spec)
+                           if name.lower().endswith(IMAGE_EXTENSIONS))
+            interval = 1.0 / (self.fps or 5)
+            while True:
+                for name in names:
+                    frame = cv2.imread(os.path.join(self.spec, name))
+                    if frame is not None:
+                        yield frame, interval
+                if not self.loop or not names:
+                    return
+
+        is_device = self.spec.isdigit()
+        cap = cv2.VideoCapture(int(self.spec) if is_device else self.spec)
+        if not cap.isOpened():
+            raise IOError(f"could not open {self.spec}")
+        try:
+            # Cameras pace themselves; files are played back at their own rate
+            interval = 0 if is_device else 1.0 / (self.fps or cap.get(cv2.CAP_PROP_FPS) or 25)
+            while not self._stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    if self.loop and not is_device:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    return
+                yield frame, interval
+        finally:
+            cap.release()
+
+
+class SourceStats:
+    """Per-source counters kept by the host"""
+
+    def __init__(self):
+        self.submitted = 0
+        self.skipped = 0
+        self.resized = 0
+        self.rejected = 0
+        self.processed = 0
+        self.faces = 0
+        self.recognized = 0
+        self.marked = 0
+        self.in_flight = 0
+        self.last_submitted = 0
+        self.next_allowed = 0.0
+        self.latencies = deque(maxlen=200)
+
+    def summary(self, source, elapsed):
+        latencies = sorted(self.latencies)
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+        return {
+            'captured': source.captured,
+            'submitted': self.submitted,
+            'skipped': self.skipped,
+            'resized': self.resized,
+            'rejected': self.rejected,
+            'processed': self.processed,
+            'fps': round(self.processed / elapsed, 2) if elapsed else 0.0,
+            'faces': self.faces,
+            'recognized': self.recognized,
+            'marked': self.marked,
+            'latency_p50_ms': round(p50, 1),
+        }
+
+
+class MultiCameraHost:
+    """Recognise several sources with one gallery and one pool of workers
+
+    A scheduler thread hands the newest frame of each source to a shared
+    RecognitionPipeline in round-robin order. A source is skipped on its turn
+    while it has ``max_in_flight`` frames in the pipeline or has used its
+    frame budget, so a busy entrance cannot starve the others. ``on_match``
+    is called as on_match(source_name, (student_id, name, distance), timestamp)
+    and returns whether a mark was recorded.
+
+    When the sources agree on a frame size at start-up, frames of another size
+    (a camera switching resolution, mixed images in a directory) are resized
+    to it, or rejected when their channels differ; both are counted per source.
+    """
+
+    def __init__(self, sources, gallery_provider, on_match=None, detect_workers=2,
+                 encode_workers=2, queue_size=None, max_in_flight=None, tolerance=0.6):
+        self.sources = list(sources)
+        self.gallery_provider = gallery_provider
+        self.on_match = on_match
+        self.detect_workers = detect_workers
+        self.encode_workers = encode_workers
+        self.queue_size = queue_size or max(4, len(self.sources))
+        # Share the pipeline evenly, rounding up so every source keeps one frame queued
+        self.max_in_flight = max_in_flight or -(-(self.queue_size + detect_workers + encode_workers)
+                                                // len(self.sources))
+        self.tolerance = tolerance
+        self.stats = {source.name: SourceStats() for source in self.sources}
+        self.pipeline = None
+        self.frame_shape = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._drained = threading.Event()
+        self._threads = []
+        self._started = None
+
+    def start(self, warmup_timeout=10):
+        for source in self.sources:
+            source.start()
+
+        # Frames only go through shared memory when every source has the same size
+        deadline = time.time() + warmup_timeout
+        while time.time() < deadline and any(s.latest is None and not s.finished for s in self.sources):
+            time.sleep(0.05)
+        shapes = {s.latest[2].shape for s in self.sources if s.latest is not None}
+        self.frame_shape = shapes.pop() if len(shapes) == 1 else None
+
+        self.pipeline = RecognitionPipeline(self.gallery_provider, self.detect_workers,
+                                            self.encode_workers, self.queue_size,
+                                            tolerance=self.tolerance, frame_shape=self.frame_shape)
+        self.pipeline.start()
+        self._started = time.time()
+        for target in (self._schedule, self._collect):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logging.info(f"Recognising {len(self.sources)} sources, "
+                     f"at most {self.max_in_flight} frames in flight each")
+
+    def stop(self):
+        """Stop capturing, finish the frames already in the pipeline and stop the workers"""
+        for source in self.sources:
+            source.stop()
+        self._stop.set()
+        self._threads[0].join()
+        self.pipeline.stop()
+        self._drained.set()
+        self._threads[1].join()
+
+    def idle(self):
+        """True once every source has ended and nothing is left in the pipeline"""
+        with self._lock:
+            busy = bool(self._pending)
+        return not busy and all(
+            source.finished and (source.latest is None or source.latest[0] <= self.stats[source.name].last_submitted)
+            for source in self.sources)
+
+    def summary(self):
+        elapsed = time.time() - self._started if self._started else 0
+        return {source.name: self.stats[source.name].summary(source, elapsed) for source in self.sources}
+
+    def log_stats(self):
+        for name, summary in self.summary().items():
+            logging.info(f"[{name}] " + ", ".join(f"{key}={value}" for key, value in summary.items()))
+
+    def _schedule(self):
+        turn = 0
+        count = len(self.sources)
+        while not self._stop.is_set():
+            served = None
+            try:
+                served = self._schedule_turn(turn, count)
+            except Exception as e:
+                logging.error(f"Frame scheduling error: {e}")
+
+            if served is None:
+                time.sleep(0.005)
+            else:
+                turn = served + 1
+
+    def _schedule_turn(self, turn, count):
+        """Submit the newest frame of the first eligible source; returns its index or None"""
+        now = time.monotonic()
+        for offset in range(count):
+            source = self.sources[(turn + offset) % count]
+            stats = self.stats[source.name]
+            latest = source.latest
+            if latest is None or latest[0] <= stats.last_submitted:
+                continue
+            if stats.in_flight >= self.max_in_flight or now < stats.next_allowed:
+                continue
+
+            frame = latest[2]
+            try:
+                if self.frame_shape is not None and frame.shape != self.frame_shape:
+                    frame = self._fit(frame, stats)
+                if frame is not None:
+                    # Registered under the lock the collector pops with, so a result
+                    # can never arrive for a seq it does not know yet
+                    with self._lock:
+                        seq = self.pipeline.submit(frame, latest[1])
+                        if seq is not None:
+                            self._pending[seq] = source
+                            stats.in_flight += 1
+            except Exception as e:
+                logging.error(f"Could not submit frame {latest[0]} of {source.name}: {e}")
+                frame = None
+                stats.rejected += 1
+            if frame is None:
+                # Never offer the same unusable frame again
+                stats.last_submitted = latest[0]
+                continue
+            if seq is None:
+                return None  # Pipeline is full; this source goes first next time
+
+            stats.skipped += latest[0] - stats.last_submitted - 1
+            stats.last_submitted = latest[0]
+            stats.submitted += 1
+            if source.budget:
+                stats.next_allowed = now + 1.0 / source.budget
+            return (turn + offset) % count
+        return None
+
+    def _fit(self, frame, stats):
+        """Resize a frame to the pipeline's frame shape, or None when it cannot be"""
+        if frame.shape[2:] != self.frame_shape[2:]:
+            stats.rejected += 1
+            return None
+        stats.resized += 1
+        height, width = self.frame_shape[:2]
+        return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+    def _collect(self):
+        while True:
+            result = self.pipeline.get(timeout=0.2)
+            if result is None:
+                if self._drained.is_set():
+                    break
+                continue
+
+            with self._lock:
+                source = self._pending.pop(result.seq)
+                stats = self.stats[source.name]
+                stats.in_flight -= 1
+            stats.processed += 1
+            stats.faces += len(result.face_locations)
+            stats.latencies.append(time.time() - result.timestamp)
+            for match in result.matches:
+                if match is None:
+                    continue
+                stats.recognized += 1
+                if self.on_match and self.on_match(source.name, match, result.timestamp):
+                    stats.marked += 1
+
+
+def parse_source(spec, default_budget=None, loop=False):
+    """SPEC or SPEC@FPS, where FPS is that source's recognition budget"""
+    path, _, budget = spec.rpartition('@')
+    if path and budget.replace('.', '', 1).isdigit():
+        return FrameSource(path, budget=float(budget), loop=loop)
+    return FrameSource(spec, budget=default_budget, loop=loop)
+
+
+def main():
+    """One recognition host for several entrances sharing a single gallery"""
+    from take_attendance import load_known_faces, attendance_writer, marked_today
+
+    parser = argparse.ArgumentParser(description='Multi-camera attendance recognition')
+    parser.add_argument('sources', nargs='+',
+                        help='camera index, video file or image directory, optionally SPEC@FPS')
+    parser.add_argument('--budget', type=float, default=None,
+                        help='default frames per second recognised per source')
+    parser.add_argument('--detect-workers', type=int, default=2)
+    parser.add_argument('--encode-workers', type=int, default=max(1, mp.cpu_count() - 3))
+    parser.add_argument('--tolerance', type=float, default=0.6)
+    parser.add_argument('--loop', action='store_true', help='replay files and directories')
+    parser.add_argument('--stats-interval', type=float, default=10)
+    args = parser.parse_args()
+
+    faces = load_known_faces()
+    if not faces or not faces.gallery:
+        logging.error("No known faces found in database!")
+        return
+    faces.start()
+    try:
+        marked_today.preload()
+    except Exception as e:
+        logging.error(f"Error preloading today's attendance: {e}")
+
+    def on_match(source_name, match, timestamp):
+        return attendance_writer.submit(match[0], when=datetime.fromtimestamp(timestamp))
+
+    host = MultiCameraHost([parse_source(spec, args.budget, args.loop) for spec in args.sources],
+                           lambda: faces.gallery, on_match, args.detect_workers,
+                           args.encode_workers, tolerance=args.tolerance)
+    host.start()
+    try:
+        next_report = time.time() + args.stats_interval
+        while not host.idle():
+            time.sleep(0.2)
+            if time.time() >= next_report:
+                host.log_stats()
+                next_report += args.stats_interval
+    except KeyboardInterrupt:
+        logging.info("Stopped by user")
+    finally:
+        host.stop()
+        host.log_stats()
+        faces.stop()
+        attendance_writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import os
+import logging
+import numpy as np
+from face_gallery import FaceGallery, ENCODING_DIM
+from ann_index import IVFIndex, kmeans
+
+# Sub-quantizers (bytes) per stored encoding; 0 keeps the full-precision gallery
+PQ_SUBQUANTIZERS = int(os.getenv('FACE_PQ_SUBQUANTIZERS', '0'))
+# Candidates re-ranked with exact distances; 0 also drops the float cache
+PQ_RERANK = int(os.getenv('FACE_PQ_RERANK', '32'))
+
+# Precision of the re-rank cache, well below the tolerance granularity
+RERANK_DTYPE = np.float16
+
+# Codebooks are learned on at most this many vectors (32 points per code)
+TRAINING_SAMPLE = 32 * 256
+# Smaller galleries are searched exactly: too few faces to learn 256 codes per
+# subspace, and their float matrix is small anyway
+MIN_TRAINING_ROWS = 4 * 256
+# Codebooks are re-learned once a gallery has grown this many times past its training size
+RETRAIN_GROWTH = 4
+
+
+class ProductQuantizer:
+    """Codes encodings as one byte per sub-vector
+
+    The 128 dimensions are split into ``n_subquantizers`` equal sub-vectors and
+    each subspace gets its own codebook of up to 256 k-means centroids. Distances
+    to a query come from per-subspace lookup tables (asymmetric distance
+    computation: only the stored side is quantized).
+    """
+
+    def __init__(self, n_subquantizers=16, train_iterations=10, seed=0):
+        if n_subquantizers <= 0 or ENCODING_DIM % n_subquantizers:
+            raise ValueError(f"Cannot split {ENCODING_DIM} dimensions into {n_subquantizers} sub-quantizers")
+        self.n_subquantizers = n_subquantizers
+        self.train_iterations = train_iterations
+        self.seed = seed
+        self.codebooks = None
+        self.trained_rows = 0
+
+    @property
+    def is_trained(self):
+        return self.codebooks is not None
+
+    @property
+    def nbytes(self):
+        return self.codebooks.nbytes if self.is_trained else 0
+
+    def empty_copy(self):
+        """Untrained quantizer with the same settings"""
+        return ProductQuantizer(self.n_subquantizers, self.train_iterations, self.seed)
+
+    def train(self, vectors):
+        """Learn the per-subspace codebooks with k-means on (a sample of) the vectors"""
+        rng = np.random.default_rng(self.seed)
+        # 32 points per code keeps training to a few passes over a small sample
+        sample_size = min(len(vectors), TRAINING_SAMPLE)
+        if sample_size == 0:
+            raise ValueError("Cannot train a quantizer without vectors")
+
+        # Sorted rows keep reads sequential when the vectors are memory-mapped
+        rows = np.sort(rng.choice(len(vectors), sample_size, replace=False))
+        sample = np.asarray(vectors[rows], dtype=np.float32).reshape(sample_size, self.n_subquantizers, -1)
+        n_codes = min(256, sample_size)
+        self.codebooks = np.stack([
+            kmeans(np.ascontiguousarray(sample[:, j]), n_codes, self.train_iterations, rng)
+            for j in range(self.n_subquantizers)
+        ])
+        self.codebooks.flags.writeable = False
+        self.trained_rows = len(vectors)
+        logging.info(f"Trained {self.n_subquantizers} sub-quantizers with {n_codes} codes on {sample_size} vectors")
+
+    def encode(self, vectors, chunk_size=16384):
+        """uint8 codes of shape (n_subquantizers, n), one contiguous row per subspace"""
+        codes = np.empty((self.n_subquantizers, len(vectors)), dtype=np.uint8)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+            chunk = chunk.reshape(len(chunk), self.n_subquantizers, -1)
+            for j, codebook in enumerate(self.codebooks):
+                codes[j, start:start + len(chunk)] = IVFIndex._nearest_lists(chunk[:, j], codebook, 1)[:, 0]
+        return codes
+
+    def sq_distances(self, codes, queries):
+        """Approximate squared distances, shape (queries, coded vectors)"""
+        sub = np.asarray(queries, dtype=np.float32).reshape(-1, self.n_subquantizers, 1, self.codebooks.shape[2])
+        diff = self.codebooks[None] - sub
+        # Lookup tables of shape (queries, subspaces, codes)
+        tables = np.einsum('qjkd,qjkd->qjk', diff, diff)
+
+        # One gather per subspace over a contiguous code row, for all queries at once
+        sq_dist = tables[:, 0][:, codes[0]]
+        for j in range(1, self.n_subquantizers):
+            sq_dist += tables[:, j][:, codes[j]]
+        return sq_dist
+
+class PQGallery(FaceGallery):
+    """Compressed FaceGallery holding product-quantized codes instead of a float matrix
+
+    Each known face costs ``n_subquantizers`` bytes of codes plus, unless
+    ``rerank`` is 0, a float16 copy used to re-rank the ``rerank`` best
+    candidates of the table scan with exact distances, so the tolerance check
+    sees true distances. With ``rerank=0`` distances are the table approximations.
+
+    Until it holds MIN_TRAINING_ROWS faces the gallery keeps a float32 matrix
+    and searches it exactly, so a kiosk that starts empty or small does not
+    fix its codebooks on the first few registrations. Like FaceGallery it is
+    immutable; with_changes codes new rows with the existing codebooks and
+    learns them anew once the gallery reaches MIN_TRAINING_ROWS or grows
+    RETRAIN_GROWTH times past the size they were trained on (the latter needs
+    the re-rank cache; a codes-only gallery re-learns them on a full reload).
+    """
+
+    def __init__(self, encodings, ids, names=None, n_subquantizers=16, rerank=PQ_RERANK, quantizer=None):
+        # Arrays (e.g. a memory-mapped cache) are read chunk by chunk, never copied whole
+        if not isinstance(encodings, np.ndarray):
+            encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        self.ids = tuple(ids)
+        self.names = tuple(names) if names is not None else self.ids
+        if not (len(self.ids) == len(self.names) == len(encodings)):
+            raise ValueError("Encodings, ids and names must have the same length")
+
+        self.quantizer = quantizer or ProductQuantizer(n_subquantizers)
+        if len(encodings) >= MIN_TRAINING_ROWS and not self.quantizer.is_trained:
+            self.quantizer.train(encodings)
+
+        codes, vectors = None, None
+        if self.quantizer.is_trained:
+            codes = self.quantizer.encode(encodings)
+            if rerank:
+                vectors = np.empty((len(encodings), ENCODING_DIM), dtype=RERANK_DTYPE)
+        else:
+            # Exact search over full-precision vectors until there are enough to train on
+            vectors = np.empty((len(encodings), ENCODING_DIM), dtype=np.float32)
+        if vectors is not None:
+            for start in range(0, len(encodings), 16384):
+                vectors[start:start + 16384] = encodings[start:start + 16384]
+        self._set_state(codes, vectors, rerank)
+
+    def _set_state(self, codes, vectors, rerank):
+        self.codes = codes
+        if codes is not None:
+            self.codes.flags.writeable = False
+        self.vectors = vectors
+        if vectors is not None:
+            self.vectors.flags.writeable = False
+        self.rerank = rerank
+        self.index = None
+        self._rows = {student_id: row for row, student_id in enumerate(self.ids)}
+
+    @classmethod
+    def _from_parts(cls, quantizer, codes, vectors, ids, names, rerank):
+        gallery = cls.__new__(cls)
+        gallery.quantizer = quantizer
+        gallery.ids = tuple(ids)
+        gallery.names = tuple(names)
+        gallery._set_state(codes, vectors, rerank)
+        return gallery
+
+    @property
+    def nbytes(self):
+        """Bytes held by the codes, codebooks and re-rank cache (or untrained float matrix)"""
+        codes = self.codes.nbytes if self.codes is not None else 0
+        vectors = self.vectors.nbytes if self.vectors is not None else 0
+        return codes + self.quantizer.nbytes + vectors
+
+    def with_changes(self, upserts=(), removed_ids=()):
+        """New gallery with (student_id, name, encoding) upserts and removals applied
+
+        Remaining rows are compacted in order; unchanged upserts are skipped and
+        the same gallery is returned when nothing changed.
+        """
+        keep = np.ones(len(self), dtype=bool)
+        for student_id in removed_ids:
+            row = self._rows.get(student_id)
+            if row is not None:
+                keep[row] = False
+
+        names = list(self.names)
+        replaced, appended = {}, {}
+        for student_id, name, encoding in upserts:
+            encoding = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_DIM)
+            row = self._rows.get(student_id)
+            if row is None or not keep[row]:
+                appended[student_id] = (name, encoding)
+            elif names[row] != name or not self._stores(row, encoding):
+                replaced[row] = (name, encoding)
+
+        if keep.all() and not replaced and not appended:
+            return self
+
+        quantizer = self.quantizer
+        train = self._should_train(int(keep.sum()) + len(appended))
+        # Rows are only coded here when the codebooks are kept
+        codes = self.codes if not train else None
+        vectors = self.vectors
+        if replaced:
+            rows = sorted(replaced)
+            encodings = np.stack([replaced[row][1] for row in rows])
+            if codes is not None:
+                codes = codes.copy()
+                codes[:, rows] = quantizer.encode(encodings)
+            if vectors is not None:
+                vectors = vectors.copy()
+                vectors[rows] = encodings
+            for row in rows:
+                names[row] = replaced[row][0]
+
+        # Boolean indexing always returns private copies
+        codes = codes[:, keep] if codes is not None else None
+        vectors = vectors[keep] if vectors is not None else None
+        ids = [student_id for student_id, kept in zip(self.ids, keep) if kept]
+        names = [name for name, kept in zip(names, keep) if kept]
+
+        if appended:
+            encodings = np.stack([encoding for _, encoding in appended.values()])
+            if codes is not None:
+                codes = np.hstack([codes, quantizer.encode(encodings)])
+            if vectors is not None:
+                vectors = np.vstack([vectors, encodings.astype(vectors.dtype)])
+            ids.extend(appended)
+            names.extend(name for name, _ in appended.values())
+
+        if train:
+            return PQGallery(vectors, ids, names, quantizer.n_subquantizers, self.rerank, quantizer.empty_copy())
+        return PQGallery._from_parts(quantizer, codes, vectors, ids, names, self.rerank)
+
+    def _should_train(self, size):
+        """Whether a gallery of ``size`` rows built from this one should learn new codebooks"""
+        if not self.quantizer.is_trained:
+            return size >= MIN_TRAINING_ROWS
+        # Re-learning needs the float vectors, and more rows stop helping past the sample size
+        return (self.vectors is not None and self.quantizer.trained_rows < TRAINING_SAMPLE
+                and size >= RETRAIN_GROWTH * self.quantizer.trained_rows)
+
+    def _stores(self, row, encoding):
+        """Whether the row already holds this encoding at the stored precision"""
+        if self.vectors is not None:
+            return np.array_equal(self.vectors[row], encoding.astype(self.vectors.dtype))
+        return np.array_equal(self.codes[:, row], self.quantizer.encode(encoding[None, :])[:, 0])
+
+    def distances(self, face_encodings):
+        """Distance from every face to every known face, from the re-rank cache when kept"""
+        faces = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        if not len(faces) or not len(self):
+            return np.empty((len(faces), len(self)), dtype=np.float32)
+        if self.vectors is None:
+            sq_dist = self.quantizer.sq_distances(self.codes, faces)
+        else:
+            vectors = self.vectors.astype(np.float32)
+            sq_dist = (np.einsum('ij,ij->i', faces, faces)[:, None]
+                       + np.einsum('ij,ij->i', vectors, vectors)[None, :] - 2.0 * (faces @ vectors.T))
+        np.maximum(sq_dist, 0.0, out=sq_dist)
+        return np.sqrt(sq_dist, out=sq_dist)
+
+    def match(self, face_encodings, k=1):
+        """Return (indices, distances) of the k nearest known encodings per face, nearest first
+
+        Lookup tables rank every code, then the best ``rerank`` candidates are
+        re-ranked with exact distances to their float16 vectors.
+        """
+        faces = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        if not len(faces) or not len(self):
+            return self._top_k(np.empty((len(faces), len(self))), k)
+        if self.codes is None:
+            indices, distances = self._top_k(self.distances(faces), k)
+            return indices, distances.astype(np.float64)
+
+        k = min(k, len(self))
+        n_candidates = k if self.vectors is None else min(len(self), max(k, self.rerank))
+        candidates, approx = self._top_k(self.quantizer.sq_distances(self.codes, faces), n_candidates)
+        if self.vectors is None:
+            return candidates, np.sqrt(np.maximum(approx, 0.0))
+
+        # Exact distances for the few candidates only
+        diff = self.vectors[candidates].astype(np.float32) - faces[:, None, :]
+        top, distances = self._top_k(np.sqrt(np.einsum('qcd,qcd->qc', diff, diff)), k)
+        return np.take_along_axis(candidates, top, axis=1), distances.astype(np.float64)
@@ -0,0 +1,309 @@
+import cv2
+import face_recognition
+import multiprocessing as mp
+import queue
+import threading
+import logging
+import argparse
+import time
+from collections import namedtuple
+from frame_ring import FrameRing
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+FrameResult = namedtuple('FrameResult', 'seq timestamp face_locations matches')
+
+# Seconds a frame may be missing while later ones are done before it counts as lost
+LOST_AFTER = 30.0
+
+
+def _detect_worker(frame_queue, encode_queue, scale, model, ring=None):
+    """Stage 1: downscale, convert to RGB and find faces"""
+    while True:
+        item = frame_queue.get()
+        if item is None:
+            break
+        seq, timestamp, frame = item
+        shared = None
+        try:
+            if ring is not None:
+                # The queue only carries the ring seq; read the frame in place
+                shared = ring.get(frame, pin=False)
+                frame = shared.image
+            small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+            rgb_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+            face_locations = face_recognition.face_locations(rgb_frame, model=model)
+        except Exception as e:
+            logging.error(f"Detection failed for frame {seq}: {e}")
+            rgb_frame, face_locations = None, []
+        finally:
+            if shared is not None:
+                ring.release(shared)
+        # Only the small frame travels on, and only when there is something to encode
+        encode_queue.put((seq, timestamp, rgb_frame if face_locations else None, face_locations))
+
+
+def _encode_worker(encode_queue, result_queue):
+    """Stage 2: encode every detected face of a frame in one call"""
+    while True:
+        item = encode_queue.get()
+        if item is None:
+            break
+        seq, timestamp, rgb_frame, face_locations = item
+        encodings = []
+        if face_locations:
+            try:
+                encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+            except Exception as e:
+                logging.error(f"Encoding failed for frame {seq}: {e}")
+                face_locations = []
+        result_queue.put((seq, timestamp, face_locations, encodings))
+
+
+class RecognitionPipeline:
+    """Capture -> detect -> encode -> match pipeline running detect/encode in processes
+
+    Detection and encoding each run in their own pool of worker processes,
+    connected by bounded queues. Results are matched against the gallery in
+    this process, since matching is one matrix product and must see the live
+    gallery snapshot, and then released strictly in submission order.
+
+    Given ``frame_shape``, frames are handed to the detect workers through a
+    shared-memory FrameRing instead of being pickled onto the queue.
+
+    Workers that die (out of memory, a crash in dlib) are restarted. A frame
+    still missing ``lost_after`` seconds after it became the next one due is
+    given up: it is released as a result without faces and its ring slot
+    is freed, so one lost frame cannot hold back every later one.
+    """
+
+    def __init__(self, gallery_provider, detect_workers=2, encode_workers=2, queue_size=4,
+                 scale=0.25, tolerance=0.6, model="hog", frame_shape=None, lost_after=LOST_AFTER):
+        self.gallery_provider = gallery_provider
+        self.detect_workers = detect_workers
+        self.encode_workers = encode_workers
+        self.scale = scale
+        self.tolerance = tolerance
+        self.model = model
+        self.lost_after = lost_after
+
+        self._frame_queue = mp.Queue(maxsize=queue_size)
+        # Every queued or in-detection frame holds a slot, plus two for the writer
+        self._ring = FrameRing(frame_shape, slots=queue_size + detect_workers + 2) if frame_shape else None
+        self._encode_queue = mp.Queue(maxsize=queue_size)
+        self._result_queue = mp.Queue(maxsize=queue_size * 2)
+        self._ordered = queue.Queue(maxsize=queue_size * 2)
+        self._processes = []
+        self._worker_args = []
+        self._spawn_lock = threading.Lock()
+        self._stopping = False
+        self._collector = None
+        self._next_seq = 0
+        # seq -> (timestamp, ring seq or None) of every frame handed to the workers
+        # and not yet released; the ring numbers every write, including rejected ones
+        self._submitted = {}
+
+    def start(self):
+        for _ in range(self.detect_workers):
+            self._spawn(_detect_worker, self._frame_queue, self._encode_queue,
+                        self.scale, self.model, self._ring)
+        for _ in range(self.encode_workers):
+            self._spawn(_encode_worker, self._encode_queue, self._result_queue)
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        logging.info(f"Pipeline started with {self.detect_workers} detect and "
+                     f"{self.encode_workers} encode workers")
+
+    def submit(self, frame, timestamp=None):
+        """Queue a BGR frame; returns its sequence number, or None when the pipeline is full"""
+        seq = self._next_seq
+        timestamp = timestamp or time.time()
+        if self._ring is not None:
+            frame = self._ring.write(frame, timestamp, pin=True)
+            if frame is None:
+                return None
+        self._submitted[seq] = (timestamp, frame if self._ring is not None else None)
+        try:
+            self._frame_queue.put_nowait((seq, timestamp, frame))
+        except queue.Full:
+            del self._submitted[seq]
+            if self._ring is not None:
+                self._ring.release(frame)
+            return None
+        self._next_seq += 1
+        return seq
+
+    def get(self, timeout=None):
+        """Next FrameResult in submission order, or None on timeout"""
+        try:
+            return self._ordered.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        """Drain the stages in order and stop all workers"""
+        with self._spawn_lock:
+            self._stopping = True
+        for _ in range(self.detect_workers):
+            self._frame_queue.put(None)
+        for process in self._processes[:self.detect_workers]:
+            process.join()
+        for _ in range(self.encode_workers):
+            self._encode_queue.put(None)
+        for process in self._processes[self.detect_workers:]:
+            process.join()
+        self._result_queue.put(None)
+        if self._collector:
+            self._collector.join()
+        if self._ring is not None:
+            self._ring.close()
+
+    def _spawn(self, target, *args):
+        process = mp.Process(target=target, args=args, daemon=True)
+        process.start()
+        self._processes.append(process)
+        self._worker_args.append((target,) + args)
+
+    def _revive(self):
+        """Restart workers that exited without being told to stop"""
+        with self._spawn_lock:
+            if self._stopping:
+                return
+            for i, process in enumerate(self._processes):
+                if process.is_alive():
+                    continue
+                logging.error(f"Pipeline worker {process.name} exited with code {process.exitcode}, restarting it")
+                target, *args = self._worker_args[i]
+                self._processes[i] = mp.Process(target=target, args=tuple(args), daemon=True)
+                self._processes[i].start()
+
+    def _collect(self):
+        """Match finished frames and release them in sequence order"""
+        pending = {}
+        next_seq = 0
+        waiting_since = None
+        scale_back = 1.0 / self.scale
+        while True:
+            try:
+                item = self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                seq, timestamp, face_locations, encodings = item
+                if seq >= next_seq:
+                    pending[seq] = (timestamp, face_locations, encodings)
+            self._revive()
+
+            if next_seq in pending or next_seq not in self._submitted:
+                waiting_since = None
+            elif waiting_since is None:
+                waiting_since = time.monotonic()
+            elif time.monotonic() - waiting_since > self.lost_after:
+                logging.warning(f"Frame {next_seq} lost in the pipeline, skipping it")
+                timestamp, ring_seq = self._submitted[next_seq]
+                if ring_seq is not None:
+                    # Normally the detect worker's pin; the worker holding it is gone
+                    self._ring.release(ring_seq)
+                pending[next_seq] = (timestamp, [], [])
+                waiting_since = None
+
+            while next_seq in pending:
+                timestamp, face_locations, encodings = pending.pop(next_seq)
+                self._submitted.pop(next_seq, None)
+                matches = []
+                if face_locations:
+                    matches = self.gallery_provider().identify(encodings, tolerance=self.tolerance)
+                locations = [tuple(int(round(v * scale_back)) for v in location)
+                             for location in face_locations]
+                # Blocks when the consumer falls behind, which backs up the stages
+                self._ordered.put(FrameResult(next_seq, timestamp, locations, matches))
+                next_seq += 1
+
+
+def main():
+    """Camera attendance loop with detection and encoding spread over worker processes"""
+    from take_attendance import load_known_faces, mark_attendance, attendance_writer, marked_today
+
+    parser = argparse.ArgumentParser(description='Multi-process attendance recognition')
+    parser.add_argument('--detect-workers', type=int, default=2)
+    parser.add_argument('--encode-workers', type=int, default=max(1, mp.cpu_count() - 3))
+    parser.add_argument('--queue-size', type=int, default=4)
+    parser.add_argument('--camera', type=int, default=0)
+    args = parser.parse_args()
+
+    faces = load_known_faces()
+    if not faces or not faces.gallery:
+        logging.error("No known faces found in database!")
+        return
+    faces.start()
+    try:
+        marked_today.preload()
+    except Exception as e:
+        logging.error(f"Error preloading today's attendance: {e}")
+
+    cap = cv2.VideoCapture(args.camera)
+    if not cap.isOpened():
+        logging.error("Could not open video capture")
+        return
+
+    ret, frame = cap.read()
+    if not ret:
+        logging.error("Error reading frame")
+        cap.release()
+        return
+
+    pipeline = RecognitionPipeline(lambda: faces.gallery, args.detect_workers,
+                                   args.encode_workers, args.queue_size, frame_shape=frame.shape)
+    pipeline.start()
+    frames = {}
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                logging.error("Error reading frame")
+                break
+
+            seq = pipeline.submit(frame)
+            if seq is not None:
+                frames[seq] = frame
+
+            # Show every frame that has come back, in order
+            while True:
+                result = pipeline.get(timeout=0)
+                if result is None:
+                    break
+                shown = frames.pop(result.seq, None)
+                for (top, right, bottom, left), match in zip(result.face_locations, result.matches):
+                    name = "Unknown"
+                    if match:
+                        name = f"ID: {match[0]}"
+                        mark_attendance(match[0])
+                    if shown is not None:
+                        cv2.rectangle(shown, (left, top), (right, bottom), (0, 255, 0), 2)
+                        cv2.putText(shown, name, (left + 6, bottom - 6),
+                                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 1)
+                if shown is not None:
+                    cv2.imshow('Attendance System', shown)
+
+            if cv2.waitKey(1) == 27:  # ESC key
+                break
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
+        # Keep draining results so the collector is never blocked during shutdown
+        stopper = threading.Thread(target=pipeline.stop)
+        stopper.start()
+        while stopper.is_alive():
+            pipeline.get(timeout=0.1)
+        faces.stop()
+        attendance_writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+import logging
+
+FULL_SCAN_EVERY = int(os.getenv('FACE_FULL_SCAN_EVERY', '10'))
+
+
+def zones_from_env(camera=None):
+    """Entrance zones as (left, top, right, bottom) fractions of the frame
+
+    Read from FACE_ENTRANCE_ZONES_<camera> or FACE_ENTRANCE_ZONES, e.g.
+    "0,0.2,0.35,1;0.8,0.2,1,1" for strips along both sides of the frame.
+    """
+    spec = os.getenv(f'FACE_ENTRANCE_ZONES_{camera}') if camera is not None else None
+    spec = spec or os.getenv('FACE_ENTRANCE_ZONES', '')
+    zones = []
+    for part in filter(None, (p.strip() for p in spec.split(';'))):
+        try:
+            left, top, right, bottom = (float(v) for v in part.split(','))
+        except ValueError:
+            logging.error(f"Ignoring malformed entrance zone {part!r}")
+            continue
+        zones.append((left, top, right, bottom))
+    return zones
+
+
+class RegionPlanner:
+    """Chooses where the next detection has to look
+
+    Between full scans, detection only searches the boxes of current tracks,
+    expanded by ``expand`` of their size on every side, plus the configured
+    entrance zones where new people appear. A full-frame scan runs every
+    ``full_scan_every`` detections, when there is nothing to focus on, and
+    on the next frame after a tracked face was not found again.
+    """
+
+    def __init__(self, zones=(), expand=0.6, full_scan_every=FULL_SCAN_EVERY, metrics=None):
+        self.zones = list(zones)
+        self.expand = expand
+        self.full_scan_every = full_scan_every
+        self.metrics = metrics
+        self.full_scans = 0
+        self.region_scans = 0
+        self._since_full = 0
+        self._force_full = True
+        self._searched_tracks = 0
+
+    def plan(self, frame_shape, boxes):
+        """Regions (top, right, bottom, left) to search, or None for a full-frame scan"""
+        height, width = frame_shape[:2]
+        self._since_full += 1
+        if self._force_full or (self.full_scan_every and self._since_full >= self.full_scan_every):
+            return self._full()
+        if not boxes and not self.zones:
+            return self._full()
+
+        regions = [self._expanded(box, height, width) for box in boxes]
+        regions += [(int(top * height), int(right * width), int(bottom * height), int(left * width))
+                    for left, top, right, bottom in self.zones]
+        self._searched_tracks = len(boxes)
+        self.region_scans += 1
+        if self.metrics is not None:
+            self.metrics.count('roi_scans')
+        return merge_regions(regions)
+
+    def update(self, regions, face_locations):
+        """Report what a detection found; a lost track forces a full scan next"""
+        if regions is not None and len(face_locations) < self._searched_tracks:
+            self._force_full = True
+
+    def _full(self):
+        self._since_full = 0
+        self._force_full = False
+        self._searched_tracks = 0
+        self.full_scans += 1
+        if self.metrics is not None:
+            self.metrics.count('full_scans')
+        return None
+
+    def _expanded(self, box, height, width):
+        top, right, bottom, left = box
+        pad_y = int((bottom - top) * self.expand)
+        pad_x = int((right - left) * self.expand)
+        return (max(0, top - pad_y), min(width, right + pad_x),
+                min(height, bottom + pad_y), max(0, left - pad_x))
+
+
+def merge_regions(regions):
+    """Union overlapping (top, right, bottom, left) boxes so no area is searched twice"""
+    merged = [list(region) for region in regions]
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                a, b = merged[i], merged[j]
+                if a[0] < b[2] and b[0] < a[2] and a[3] < b[1] and b[3] < a[1]:
+                    merged[i] = [min(a[0], b[0]), max(a[1], b[1]), max(a[2], b[2]), min(a[3], b[3])]
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return [tuple(region) for region in merged]
@@ -0,0 +1,602 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, time as dtime
+from functools import lru_cache
+from dotenv import load_dotenv
+from gallery_sync import create_sync_schema
+from encoding_format import encode
+
+# Load environment variables
+load_dotenv()
+
+# 'mysql' (default) or 'sqlite' for an embedded database file
+STORAGE_BACKEND = os.getenv('FACE_STORAGE', 'mysql')
+SQLITE_PATH = os.getenv('FACE_SQLITE_PATH', 'attendance.sqlite3')
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+# Seconds to wait for a free pooled connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+# Pooled connections idle for longer than this are pinged before use
+DB_CHECK_AFTER = float(os.getenv('DB_CHECK_AFTER', '30'))
+
+MYSQL_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS students (
+        student_id VARCHAR(20) PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        department VARCHAR(50),
+        email VARCHAR(100),
+        phone VARCHAR(20),
+        registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        is_active BOOLEAN DEFAULT TRUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS face_encodings (
+        student_id VARCHAR(20) PRIMARY KEY,
+        encoding BLOB NOT NULL,
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS attendance (
+        attendance_id INT AUTO_INCREMENT PRIMARY KEY,
+        student_id VARCHAR(20) NOT NULL,
+        date DATE NOT NULL,
+        time TIME NOT NULL,
+        status ENUM('present', 'absent', 'late') NOT NULL,
+        recorded_by VARCHAR(50),
+        notes TEXT,
+        FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE,
+        UNIQUE KEY unique_attendance (student_id, date)
+    )
+    """,
+)
+
+# Columns that databases created by the original attendance_ui schema lack;
+# initialize() adds them, since the sync queries and the writer depend on them
+MYSQL_UPGRADE_COLUMNS = (
+    ('students', 'email', "VARCHAR(100)"),
+    ('students', 'phone', "VARCHAR(20)"),
+    ('students', 'registration_date', "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"),
+    ('students', 'is_active', "BOOLEAN DEFAULT TRUE"),
+    ('face_encodings', 'last_updated', "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"),
+    ('attendance', 'recorded_by', "VARCHAR(50)"),
+    ('attendance', 'notes', "TEXT"),
+)
+
+EXISTING_COLUMNS_QUERY = """
+    SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE()
+"""
+
+# Same tables for SQLite. Timestamps are local time like MySQL's NOW(), and
+# triggers do what ON UPDATE CURRENT_TIMESTAMP and create_sync_schema do there.
+SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS students (
+        student_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        department TEXT,
+        email TEXT,
+        phone TEXT,
+        registration_date TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+        is_active BOOLEAN DEFAULT TRUE
+    );
+    CREATE TABLE IF NOT EXISTS face_encodings (
+        student_id TEXT PRIMARY KEY REFERENCES students(student_id) ON DELETE CASCADE,
+        encoding BLOB NOT NULL,
+        last_updated TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+    );
+    CREATE INDEX IF NOT EXISTS idx_last_updated ON face_encodings (last_updated);
+    CREATE TABLE IF NOT EXISTS attendance (
+        attendance_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id TEXT NOT NULL REFERENCES students(student_id) ON DELETE CASCADE,
+        date DATE NOT NULL,
+        time TIME NOT NULL,
+        status TEXT NOT NULL,
+        recorded_by TEXT,
+        notes TEXT,
+        UNIQUE (student_id, date)
+    );
+    CREATE TABLE IF NOT EXISTS face_encoding_tombstones (
+        student_id TEXT PRIMARY KEY,
+        deleted_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+    );
+    CREATE INDEX IF NOT EXISTS idx_deleted_at ON face_encoding_tombstones (deleted_at);
+
+    CREATE TRIGGER IF NOT EXISTS face_encodings_touch AFTER UPDATE OF encoding ON face_encodings
+    BEGIN
+        UPDATE face_encodings SET last_updated = datetime('now', 'localtime')
+        WHERE student_id = NEW.student_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS face_encodings_tombstone AFTER DELETE ON face_encodings
+    BEGIN
+        INSERT INTO face_encoding_tombstones (student_id, deleted_at)
+        VALUES (OLD.student_id, datetime('now', 'localtime'))
+        ON CONFLICT (student_id) DO UPDATE SET deleted_at = excluded.deleted_at;
+    END;
+    CREATE TRIGGER IF NOT EXISTS students_tombstone BEFORE DELETE ON students
+    BEGIN
+        INSERT INTO face_encoding_tombstones (student_id, deleted_at)
+        VALUES (OLD.student_id, datetime('now', 'localtime'))
+        ON CONFLICT (student_id) DO UPDATE SET deleted_at = excluded.deleted_at;
+    END;
+    CREATE TRIGGER IF NOT EXISTS students_active_touch AFTER UPDATE OF is_active ON students
+    WHEN NEW.is_active IS NOT OLD.is_active
+    BEGIN
+        UPDATE face_encodings SET last_updated = datetime('now', 'localtime')
+        WHERE student_id = NEW.student_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS students_name_touch AFTER UPDATE OF name ON students
+    WHEN NEW.name IS NOT OLD.name
+    BEGIN
+        UPDATE face_encodings SET last_updated = datetime('now', 'localtime')
+        WHERE student_id = NEW.student_id;
+    END;
+
+    -- MySQL's status ENUM stores 'Present' as 'present'; do the same here
+    CREATE TRIGGER IF NOT EXISTS attendance_status_insert AFTER INSERT ON attendance
+    WHEN NEW.status <> lower(NEW.status)
+    BEGIN
+        UPDATE attendance SET status = lower(NEW.status) WHERE attendance_id = NEW.attendance_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS attendance_status_update AFTER UPDATE OF status ON attendance
+    WHEN NEW.status <> lower(NEW.status)
+    BEGIN
+        UPDATE attendance SET status = lower(NEW.status) WHERE attendance_id = NEW.attendance_id;
+    END;
+    UPDATE attendance SET status = lower(status) WHERE status <> lower(status);
+"""
+
+
+# Hot statements, prepared once per pooled MySQL connection
+MARKED_ON_QUERY = "SELECT student_id FROM attendance WHERE date = %s"
+
+ATTENDANCE_ON_QUERY = """
+    SELECT s.student_id, s.name, a.time, a.status
+    FROM attendance a
+    JOIN students s ON a.student_id = s.student_id
+    WHERE a.date = %s
+    ORDER BY a.time
+"""
+
+MARK_QUERY = """
+    INSERT INTO attendance (student_id, date, time, status)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE student_id = student_id
+"""
+
+SAVE_STUDENT_QUERY = """
+    INSERT INTO students (student_id, name, department)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE name = VALUES(name), department = VALUES(department)
+"""
+
+SAVE_ENCODING_QUERY = """
+    INSERT INTO face_encodings (student_id, encoding)
+    VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE encoding = VALUES(encoding)
+"""
+
+
+def upgrade_mysql_schema(cursor):
+    """Add the columns an older schema is missing; returns the names of the added ones"""
+    cursor.execute(EXISTING_COLUMNS_QUERY)
+    existing = {(table.lower(), column.lower()) for table, column in cursor.fetchall()}
+    added = []
+    for table, column, definition in MYSQL_UPGRADE_COLUMNS:
+        if (table, column) not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            added.append(f"{table}.{column}")
+    if added:
+        logging.info(f"Upgraded the database schema, added {', '.join(added)}")
+    return added
+
+
+def mysql_config():
+    """Connection settings from DB_HOST, DB_USER, DB_PASSWORD and DB_NAME"""
+    return {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'user': os.getenv('DB_USER', 'root'),
+        'password': os.getenv('DB_PASSWORD', 'stuti123'),
+        'database': os.getenv('DB_NAME', 'attendance_system'),
+    }
+
+
+class Storage:
+    """Students, face encodings and attendance behind one thread-safe interface
+
+    connection() lends out a DB-API connection for components that run their
+    own statements (GallerySync, AttendanceWriter, DailyAttendanceSet,
+    reports). The methods below cover the queries the entry points run on
+    every sighting, registration and attendance view; stream() serves
+    report-sized results a chunk at a time.
+    """
+
+    def marked_on(self, day):
+        """Ids of the students with attendance on ``day``"""
+        with self.connection() as conn:
+            return {student_id for (student_id,) in self._execute(conn, MARKED_ON_QUERY, (day,)).fetchall()}
+
+    def attendance_on(self, day, newest_first=False):
+        """(student_id, name, time, status) rows for ``day``, ordered by time"""
+        query = ATTENDANCE_ON_QUERY + (" DESC" if newest_first else "")
+        with self.connection() as conn:
+            return self._execute(conn, query, (day,)).fetchall()
+
+    def mark_attendance(self, student_id, when=None, status='present'):
+        """Insert one mark; False when the student already has one that day"""
+        when = when or datetime.now()
+        with self.connection() as conn:
+            cursor = self._execute(conn, MARK_QUERY, (student_id, when.date(),
+                                                      when.time().replace(microsecond=0), status))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def save_student(self, student_id, name, department, encoding):
+        """Insert or update a student and their face encoding in one transaction"""
+        with self.connection() as conn:
+            conn.start_transaction()
+            self._execute(conn, SAVE_STUDENT_QUERY, (student_id, name, department))
+            self._execute(conn, SAVE_ENCODING_QUERY, (student_id, encode(encoding)))
+            conn.commit()
+
+    @contextmanager
+    def stream(self, query, params=()):
+        """Cursor for a large result, read with fetchmany() so rows are never all in memory"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, params)
+                yield cursor
+            finally:
+                cursor.close()
+
+    def _execute(self, conn, query, params):
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor
+
+
+class MySQLStorage(Storage):
+    """Storage on a MySQL server through a sized, thread-safe connection pool
+
+    At most ``pool_size`` connections are open; borrowers wait up to
+    ``timeout`` seconds for one to come back. Connections that sat idle for
+    ``check_after`` seconds are pinged first and replaced when dead.
+    Connections run in autocommit mode, so reads never hold a stale snapshot;
+    multi-statement writes use start_transaction(), and a transaction left
+    open is rolled back on return. Hot queries run as server-side prepared
+    statements cached per connection. Wait times are recorded as the 'pool_wait' stage
+    of ``metrics``, with pool_timeouts and pool_reconnects counters.
+    """
+
+    backend = 'mysql'
+
+    def __init__(self, config=None, pool_size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 check_after=DB_CHECK_AFTER, metrics=None):
+        self.config = config or mysql_config()
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.metrics = metrics
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of the with block"""
+        conn = self._acquire()
+        healthy = True
+        try:
+            yield conn
+        except Exception:
+            healthy = self._rollback(conn)
+            raise
+        finally:
+            self._release(conn, healthy)
+
+    @contextmanager
+    def stream(self, query, params=()):
+        """Unbuffered cursor: rows stay on the server until fetched
+
+        A connection left with unread rows cannot run another statement, so
+        one abandoned mid-stream is closed instead of going back to the pool.
+        """
+        conn = self._acquire()
+        healthy = False
+        try:
+            cursor = conn.cursor(buffered=False)
+            cursor.execute(query, params)
+            yield cursor
+            healthy = not conn.unread_result
+            if healthy:
+                cursor.close()
+        finally:
+            self._release(conn, healthy)
+
+    def initialize(self, track_is_active=True):
+        """Create the tables (adding columns older schemas lack), tombstones and sync triggers
+
+        Missing sync triggers are only logged: attendance still works without
+        them, but running galleries then see deletions on a full reload only.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for statement in MYSQL_SCHEMA:
+                    cursor.execute(statement)
+                upgrade_mysql_schema(cursor)
+                conn.commit()
+                try:
+                    create_sync_schema(cursor, track_is_active)
+                    conn.commit()
+                except Exception as e:
+                    logging.error(f"Could not create the gallery sync triggers ({e}); "
+                                  "run db_utils.py once with an account that has the TRIGGER privilege")
+            finally:
+                cursor.close()
+
+    def close(self):
+        """Close the idle connections; borrowed ones are closed when returned"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.discard()
+
+    def _execute(self, conn, query, params):
+        cursor = conn.prepared(query)
+        cursor.execute(query, params)
+        return cursor
+
+    def _acquire(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            if self.metrics is not None:
+                self.metrics.count('pool_timeouts')
+            raise ConnectionError(f"No database connection free after {self.timeout:g}s "
+                                  f"(pool size {self.pool_size})")
+        if self.metrics is not None:
+            self.metrics.observe('pool_wait', time.perf_counter() - start)
+
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is not None and not self._healthy(conn):
+                conn = None
+            return conn or self._open()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, conn, healthy):
+        try:
+            if healthy and conn.in_transaction:
+                healthy = self._rollback(conn)
+            if healthy:
+                conn.last_used = time.monotonic()
+                with self._lock:
+                    self._idle.append(conn)
+            else:
+                conn.discard()
+        finally:
+            self._slots.release()
+
+    def _healthy(self, conn):
+        """Ping a connection that sat idle for a while; False (and closed) when it is gone"""
+        if time.monotonic() - conn.last_used < self.check_after:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception as e:
+            logging.warning(f"Replacing dead pooled database connection: {e}")
+            if self.metrics is not None:
+                self.metrics.count('pool_reconnects')
+            conn.discard()
+            return False
+
+    @staticmethod
+    def _rollback(conn):
+        try:
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _open(self):
+        # Imported here so SQLite-only kiosks do not need the MySQL driver
+        import mysql.connector
+        from mysql.connector.constants import ClientFlag
+
+        # Report changed rather than matched rows, so a no-op upsert has rowcount 0
+        raw = mysql.connector.connect(autocommit=True, client_flags=[-ClientFlag.FOUND_ROWS], **self.config)
+        return PooledConnection(raw)
+
+
+class PooledConnection:
+    """mysql.connector connection on loan from MySQLStorage"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.last_used = time.monotonic()
+        self._prepared = {}
+
+    def prepared(self, query):
+        """Prepared cursor for ``query``, created on first use of this connection"""
+        cursor = self._prepared.get(query)
+        if cursor is None:
+            cursor = self._prepared[query] = self.raw.cursor(prepared=True)
+        return cursor
+
+    def close(self):
+        # Returned to the pool when the borrowing with block ends
+        pass
+
+    def discard(self):
+        try:
+            self.raw.close()
+        except Exception:
+            pass
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class SQLiteStorage(Storage):
+    """Storage in an embedded SQLite file
+
+    A drop-in for MySQLStorage: connection() yields a connection that accepts
+    the MySQL-style statements the rest of the code issues (``%s``
+    placeholders, ON DUPLICATE KEY UPDATE, NOW()), rewritten once per distinct
+    statement. Each thread keeps one connection open, so sqlite3's statement
+    cache serves as prepared statements. The database runs in WAL mode, so
+    readers never block the attendance writer.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, path=SQLITE_PATH, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.initialize()
+
+    @contextmanager
+    def connection(self):
+        """Context manager yielding this thread's connection; rolls back on error"""
+        conn = self._connection()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+
+    def initialize(self, track_is_active=True):
+        """Create the tables, tombstones and sync triggers (is_active is always tracked)"""
+        with self.connection() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.raw.close()
+
+    def _connection(self):
+        # Connections are never shared across threads or forked processes
+        pid, conn = getattr(self._local, 'conn', (None, None))
+        if conn is not None and pid == os.getpid():
+            return conn
+
+        # Only this thread uses it; close() may run on another one
+        raw = sqlite3.connect(self.path, timeout=self.busy_timeout, cached_statements=256,
+                              detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                              check_same_thread=False)
+        raw.execute("PRAGMA journal_mode = WAL")
+        raw.execute("PRAGMA synchronous = NORMAL")
+        raw.execute("PRAGMA foreign_keys = ON")
+        conn = SQLiteConnection(raw)
+        self._local.conn = (os.getpid(), conn)
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+
+class SQLiteConnection:
+    """sqlite3 connection with the mysql.connector methods the app calls"""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def cursor(self, *args, **kwargs):
+        return SQLiteCursor(self.raw.cursor())
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def start_transaction(self):
+        if not self.raw.in_transaction:
+            self.raw.execute("BEGIN")
+
+    def executescript(self, script):
+        self.raw.executescript(script)
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        # Owned by the storage and reused by the next caller on this thread
+        pass
+
+
+class SQLiteCursor:
+    """sqlite3 cursor that runs MySQL-style statements"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        return self._cursor.execute(to_sqlite(query), [_adapt(value) for value in params])
+
+    def executemany(self, query, rows):
+        return self._cursor.executemany(to_sqlite(query), ([_adapt(value) for value in row] for row in rows))
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+@lru_cache(maxsize=512)
+def to_sqlite(query):
+    """Rewrite one MySQL-style statement for SQLite"""
+    stripped = query.strip()
+    if stripped.upper() == "SELECT CURRENT_TIMESTAMP":
+        return "SELECT datetime('now', 'localtime') AS \"now [TIMESTAMP]\""
+
+    # Placeholders outside string literals
+    query = re.sub(r"('[^']*')|%s", lambda m: m.group(1) or '?', query)
+    query = re.sub(r"\bNOW\(\)|\bCURRENT_TIMESTAMP\b", "datetime('now', 'localtime')", query)
+    # TIME columns are already stored as HH:MM:SS text
+    query = re.sub(r"TIME_FORMAT\(([\w.]+), '%H:%i:%s'\)", r"\1", query)
+    query = re.sub(r"ON DUPLICATE KEY UPDATE\s+student_id\s*=\s*student_id", "ON CONFLICT DO NOTHING", query)
+    query = re.sub(r"ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET", query)
+    return re.sub(r"\bVALUES\((\w+)\)", r"excluded.\1", query)
+
+
+def _adapt(value):
+    """Dates and times as the text SQLite compares and the converters below parse"""
+    if isinstance(value, datetime):
+        return value.isoformat(' ', timespec='seconds')
+    if isinstance(value, (date, dtime)):
+        return value.isoformat()
+    return value
+
+
+sqlite3.register_converter('TIMESTAMP', lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('DATE', lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter('TIME', lambda value: dtime.fromisoformat(value.decode()))
+
+
+def open_storage(backend=STORAGE_BACKEND, metrics=None):
+    """The configured storage: a pooled MySQLStorage or, with FACE_STORAGE=sqlite, a SQLiteStorage"""
+    if backend == 'sqlite':
+        logging.info(f"Using embedded SQLite storage at {SQLITE_PATH}")
+        return SQLiteStorage(SQLITE_PATH)
+    if backend != 'mysql':
+        raise ValueError(f"Unknown FACE_STORAGE backend {backend!r}")
+    return MySQLStorage(metrics=metrics)
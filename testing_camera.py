@@ -1,5 +1,5 @@
-import cv2
-cap = cv2.VideoCapture(0)
-ret, frame = cap.read()
-print(f"Camera working: {ret}")
+import cv2
+cap = cv2.VideoCapture(0)
+ret, frame = cap.read()
+print(f"Camera working: {ret}")
 cap.release()
\ No newline at end of file
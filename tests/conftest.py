@@ -0,0 +1,22 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Modules live at the repository root, as for the benchmarks
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_gallery import ENCODING_DIM
+
+
+def unit_vectors(count, seed=0):
+    """Random unit-norm encodings standing in for enrolled students"""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, ENCODING_DIM))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def encodings():
+    return unit_vectors(200)
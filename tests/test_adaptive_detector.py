@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('face_recognition')
+
+import adaptive_detector
+from adaptive_detector import AdaptiveDetector, Detection, encode_faces, _widen
+
+SCALES = (0.25, 0.5, 1.0)
+
+
+class FakeFaceRecognition:
+    """Finds one face, given in full-frame pixels, in whatever image it is shown"""
+
+    def __init__(self, box=None):
+        self.box = box
+        self.calls = []
+
+    def face_locations(self, image, model='hog'):
+        self.calls.append(image.shape[:2])
+        if self.box is None:
+            return []
+        scale = image.shape[0] / 400
+        return [tuple(int(round(v * scale)) for v in self.box)]
+
+    def face_encodings(self, image, boxes):
+        self.calls.append((image.shape[:2], list(boxes)))
+        return [np.zeros(128) for _ in boxes]
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeFaceRecognition()
+    monkeypatch.setattr(adaptive_detector, 'face_recognition', fake)
+    return fake
+
+
+def frame():
+    return np.zeros((400, 400, 3), dtype=np.uint8)
+
+
+def test_large_faces_are_found_at_the_smallest_scale(fake):
+    fake.box = (80, 340, 340, 80)
+    detector = AdaptiveDetector(SCALES, probe_every=0)
+
+    detection = detector.detect(frame())
+
+    assert detection.scale == 0.25 and fake.calls == [(100, 100)]
+    assert detection.face_locations == [(80, 340, 340, 80)]
+    assert detector.scale == 0.25
+
+
+def test_small_face_raises_the_scale_until_it_ages_out(fake, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(adaptive_detector, 'time', type('Clock', (), {'monotonic': lambda: now[0]}))
+    fake.box = (100, 180, 180, 100)  # 80 px needs 60 px after scaling
+    detector = AdaptiveDetector(SCALES, probe_every=0, memory=30)
+
+    detector.detect(frame())
+    assert detector.scale == 1.0
+
+    fake.box = None
+    now[0] = 31.0
+    detector.detect(frame())
+    assert detector.scale == 0.25
+
+
+def test_probe_runs_at_the_largest_scale(fake):
+    detector = AdaptiveDetector(SCALES, probe_every=3)
+
+    scales = [detector.detect(frame()).scale for _ in range(6)]
+
+    assert scales == [0.25, 0.25, 1.0, 0.25, 0.25, 1.0]
+
+
+def test_regions_limit_where_hog_runs(fake):
+    fake.box = (0, 200, 200, 0)
+    detector = AdaptiveDetector(SCALES, probe_every=0)
+    detector.scale = 0.5
+
+    detection = detector.detect(frame(), regions=[(0, 40, 40, 0), (10, 50, 50, 10)])
+
+    # Each region is widened to the 64 px minimum; overlapping crops report one face
+    assert fake.calls == [(64, 64), (64, 64)]
+    assert len(detection.face_locations) == 1
+
+
+def test_encode_reuses_the_detection_image(fake):
+    image = np.zeros((100, 100, 3), dtype=np.uint8)
+    detection = Detection(image, 0.25, [], [(40, 80, 80, 40)])
+
+    encode_faces(frame(), detection, detection.face_locations)
+    encode_faces(frame(), detection, detection.face_locations, scale=1.0)
+
+    assert fake.calls == [((100, 100), [(10, 20, 20, 10)]), ((400, 400), [(40, 80, 80, 40)])]
+    assert encode_faces(frame(), detection, []) == []
+
+
+def test_widen_keeps_the_region_inside_the_image():
+    assert _widen(10, 20, 64, 400) == (0, 64)
+    assert _widen(390, 400, 64, 400) == (336, 400)
+    assert _widen(100, 300, 64, 400) == (100, 300)
+    assert _widen(0, 10, 64, 32) == (0, 32)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from ann_index import IVFIndex, kmeans
+from conftest import unit_vectors
+
+
+def test_kmeans_recovers_separated_clusters():
+    rng = np.random.default_rng(0)
+    centres = np.array([[0, 0], [10, 10], [-10, 10]], dtype=np.float32)
+    sample = np.concatenate([centre + rng.standard_normal((100, 2)).astype(np.float32) for centre in centres])
+
+    found = kmeans(sample, 3, 10, np.random.default_rng(1))
+
+    for centre in centres:
+        assert np.min(np.linalg.norm(found - centre, axis=1)) < 0.5
+
+
+def test_candidates_with_every_list_probed_cover_all_keys():
+    vectors = unit_vectors(300)
+    index = IVFIndex(n_lists=6, n_probe=6)
+    index.add(np.arange(300), vectors)
+
+    (candidates,) = index.candidates(vectors[:1])
+
+    assert sorted(candidates.tolist()) == list(range(300))
+
+
+def test_nearest_key_is_a_candidate():
+    vectors = unit_vectors(400, seed=2)
+    index = IVFIndex(n_lists=10, n_probe=2)
+    index.add(np.arange(400), vectors)
+
+    for key, candidates in enumerate(index.candidates(vectors[:50])):
+        assert key in candidates
+
+
+def test_remove_and_re_add():
+    vectors = unit_vectors(100)
+    index = IVFIndex(n_lists=4, n_probe=4)
+    index.add(np.arange(100), vectors)
+
+    index.remove([3, 4, 999])
+    assert len(index) == 98
+    assert 3 not in np.concatenate(index.candidates(vectors[:1]))
+
+    # Adding an existing key moves it instead of duplicating it
+    index.add([5], vectors[[3]])
+    assert len(index) == 98
+    assert np.count_nonzero(np.concatenate(index.candidates(vectors[:1])) == 5) == 1
+
+
+def test_copy_is_independent():
+    vectors = unit_vectors(100)
+    index = IVFIndex(n_lists=4, n_probe=4)
+    index.add(np.arange(100), vectors)
+
+    clone = index.copy()
+    clone.remove([0])
+
+    assert len(index) == 100 and len(clone) == 99
+    assert clone.centroids is index.centroids
+    assert not index.empty_copy().is_trained
+
+
+def test_train_requires_vectors():
+    with pytest.raises(ValueError):
+        IVFIndex().train(np.empty((0, 128)))
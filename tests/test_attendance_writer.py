@@ -0,0 +1,89 @@
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import attendance_writer
+from attendance_writer import AttendanceWriter
+
+
+class SlowDatabase:
+    """Connection factory whose inserts take ``delay`` seconds; records each batch's rows"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.active = 0
+        self.overlapped = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connect(self):
+        yield self
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params):
+        with self._lock:
+            self.active += 1
+            self.overlapped |= self.active > 1
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+            self.batches.append(len(params) // 4)
+        self.rowcount = len(params) // 4
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_close_flushes_pending_marks():
+    database = SlowDatabase()
+    writer = AttendanceWriter(database.connect, flush_interval=10)
+    for i in range(5):
+        assert writer.submit(f"S{i}", when=datetime(2025, 3, 1, 9, 0, i))
+
+    writer.close()
+
+    assert sum(database.batches) == 5
+    assert not writer.submit('S9')
+
+
+def test_close_timeout_does_not_start_a_second_flush():
+    database = SlowDatabase(delay=0.3)
+    writer = AttendanceWriter(database.connect, flush_interval=0.01)
+    writer.submit('S1')
+    time.sleep(0.05)
+    writer.submit('S2')
+
+    writer.close(timeout=0.01)
+    writer._thread.join(2)
+
+    assert not database.overlapped
+    assert sum(database.batches) == 2
+
+
+class BrokenDatabase:
+    @contextmanager
+    def connect(self):
+        raise ConnectionError("database is down")
+        yield
+
+
+def test_dropped_marks_are_reported(monkeypatch):
+    monkeypatch.setattr(attendance_writer, 'MAX_RETRIES', 0)
+    failed = []
+    writer = AttendanceWriter(BrokenDatabase().connect, flush_interval=0.01,
+                              on_failed=lambda *mark: failed.append(mark))
+
+    assert writer.submit('S1', when=datetime(2025, 3, 1, 9, 0))
+    deadline = time.time() + 5
+    while not failed and time.time() < deadline:
+        time.sleep(0.01)
+    writer.close()
+
+    assert failed == [('S1', datetime(2025, 3, 1).date())]
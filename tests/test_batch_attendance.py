@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('face_recognition')
+
+import batch_attendance
+from recognition_pipeline import FrameResult
+
+
+class InlinePipeline:
+    """Stand-in pipeline: each 'frame' is the list of matches it yields"""
+
+    def __init__(self, gallery_provider, *args, **kwargs):
+        self.results = []
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def submit(self, frame, timestamp=None):
+        seq = len(self.results)
+        self.results.append(FrameResult(seq, timestamp, [(0, 1, 1, 0)] * len(frame), frame))
+        return seq
+
+    def get(self, timeout=None):
+        for i, result in enumerate(self.results):
+            if result is not None:
+                self.results[i] = None
+                return result
+        return None
+
+
+@pytest.fixture(autouse=True)
+def inline_pipeline(monkeypatch):
+    monkeypatch.setattr(batch_attendance, 'RecognitionPipeline', InlinePipeline)
+
+
+def sightings(*ids, day=3):
+    return [([(student_id, student_id, 0.3)], datetime(2025, 3, day, 9, 0, second))
+            for second, student_id in enumerate(ids)]
+
+
+def test_each_student_is_marked_once_per_day():
+    calls = []
+    frames = sightings('S1', 'S1', 'S2') + sightings('S1', day=4)
+
+    stats = batch_attendance.run_batch(frames, None, lambda *call: calls.append(call) or True)
+
+    assert [(student_id, when.day) for student_id, when in calls] == [('S1', 3), ('S2', 3), ('S1', 4)]
+    assert (stats['frames'], stats['recognized'], stats['marked']) == (4, 4, 3)
+
+
+def test_rejected_mark_is_retried_on_the_next_sighting():
+    answers = iter([False, True])
+    calls = []
+
+    def on_match(student_id, when):
+        calls.append(student_id)
+        return next(answers, True)
+
+    stats = batch_attendance.run_batch(sightings('S1', 'S1', 'S1'), None, on_match)
+
+    assert calls == ['S1', 'S1']
+    assert stats['marked'] == 1
+
+
+def test_mark_that_fails_to_write_is_retried():
+    seen = set()
+    calls = []
+    first, *rest = sightings('S1', 'S1', 'S1')
+
+    def frames():
+        yield first
+        # The queued mark is rejected by the database, and the writer forgets it
+        seen.discard(('S1', first[1].date()))
+        yield from rest
+
+    batch_attendance.run_batch(frames(), None, lambda student_id, when: calls.append(student_id) or True,
+                               seen=seen)
+
+    assert calls == ['S1', 'S1']
+    assert seen == {('S1', first[1].date())}
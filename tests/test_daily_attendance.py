@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from daily_attendance import DailyAttendanceSet
+
+
+class RowsConnection:
+    """Connection whose cursor returns fixed rows, recording the query parameters"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params):
+        self.params.append(params)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self):
+        pass
+
+
+def test_add_is_test_and_set():
+    marked = DailyAttendanceSet()
+    assert marked.add('S1') is True
+    assert marked.add('S1') is False
+    assert 'S1' in marked and len(marked) == 1
+
+
+def test_discard_lets_the_next_sighting_retry():
+    marked = DailyAttendanceSet()
+    marked.add('S1')
+    marked.discard('S1')
+    assert marked.add('S1') is True
+
+
+def test_other_days_are_always_let_through():
+    marked = DailyAttendanceSet()
+    yesterday = date.today() - timedelta(days=1)
+    marked.add('S1')
+    assert marked.add('S1', day=yesterday) is True
+    assert marked.add('S1', day=yesterday) is True
+    marked.update(['S2'], day=yesterday)
+    assert 'S2' not in marked
+
+
+def test_preload_merges_todays_marks():
+    conn = RowsConnection([('S1',), ('S2',)])
+
+    @contextmanager
+    def connect():
+        yield conn
+
+    marked = DailyAttendanceSet(connect)
+    marked.add('S3')
+
+    assert marked.preload() == 2
+    assert conn.params == [(date.today(),)]
+    assert marked.add('S1') is False
+    assert len(marked) == 3
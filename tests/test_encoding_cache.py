@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('dotenv')
+
+from encoding_cache import load_gallery
+from storage import SQLiteStorage
+from conftest import unit_vectors
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'attendance.sqlite3'))
+    for i, encoding in enumerate(unit_vectors(5)):
+        storage.save_student(f"S{i}", f"name {i}", 'cs', encoding)
+    with storage.connection() as conn:
+        # Backdate so later changes land in a later second
+        conn.cursor().execute("UPDATE face_encodings SET last_updated = '2020-01-01 00:00:00'")
+        conn.commit()
+    yield storage
+    storage.close()
+
+
+def load(storage, cache_dir):
+    with storage.connection() as conn:
+        return load_gallery(conn, cache_dir=str(cache_dir))
+
+
+def test_warm_start_reads_the_cache(storage, tmp_path):
+    cold = load(storage, tmp_path / 'cache')
+    warm = load(storage, tmp_path / 'cache')
+
+    assert any((tmp_path / 'cache').iterdir())
+    assert warm.ids == cold.ids
+    assert np.array_equal(warm.encodings, cold.encodings)
+
+
+def test_rename_invalidates_the_cache(storage, tmp_path):
+    load(storage, tmp_path / 'cache')
+    with storage.connection() as conn:
+        conn.cursor().execute("UPDATE students SET name = 'renamed' WHERE student_id = 'S2'")
+        conn.commit()
+
+    gallery = load(storage, tmp_path / 'cache')
+
+    assert gallery.names[gallery.ids.index('S2')] == 'renamed'
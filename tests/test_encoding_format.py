@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import encoding_format
+from encoding_format import HEADER, decode, encode, parse, stack
+from conftest import unit_vectors
+
+
+@pytest.mark.parametrize('dtype', ['float16', 'float32', 'float64'])
+def test_round_trip(dtype):
+    vector = unit_vectors(1)[0]
+    blob = encode(vector, dtype)
+
+    assert len(blob) == HEADER.size + 128 * np.dtype(dtype).itemsize
+    source, payload = parse(blob)
+    assert source == np.dtype(dtype)
+    assert np.allclose(decode(blob, np.float64), vector, atol=1e-3 if dtype == 'float16' else 1e-7)
+
+
+def test_legacy_headerless_float64_blob_is_read():
+    vector = unit_vectors(1)[0]
+    legacy = vector.astype('<f8').tobytes()
+
+    source, _ = parse(legacy)
+
+    assert source == np.dtype('<f8')
+    assert np.array_equal(decode(legacy, np.float64), vector)
+
+
+@pytest.mark.parametrize('blob', [None, b'', b'FE', b'XX' + bytes(HEADER.size + 256)])
+def test_unusable_blobs_raise(blob):
+    with pytest.raises(ValueError):
+        parse(blob)
+
+
+def test_other_model_is_rejected():
+    blob = encode(unit_vectors(1)[0], model_id=encoding_format.MODEL_ID + 1)
+    with pytest.raises(ValueError, match='model'):
+        parse(blob)
+
+
+def test_truncated_payload_is_rejected():
+    with pytest.raises(ValueError, match='size'):
+        parse(encode(unit_vectors(1)[0], 'float32')[:-4])
+
+
+def test_stack_mixes_stored_dtypes_in_row_order():
+    vectors = unit_vectors(4)
+    blobs = [encode(vectors[0], 'float16'), vectors[1].astype('<f8').tobytes(),
+             encode(vectors[2], 'float32'), encode(vectors[3], 'float64')]
+
+    matrix = stack([parse(blob) for blob in blobs], dtype=np.float32)
+
+    assert matrix.shape == (4, 128) and matrix.dtype == np.float32
+    assert np.allclose(matrix, vectors, atol=1e-3)
@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+
+from ann_index import IVFIndex, MIN_TRAINING_ROWS, RETRAIN_GROWTH
+from face_gallery import FaceGallery
+from conftest import unit_vectors
+
+
+def brute_force(gallery_encodings, queries):
+    return np.linalg.norm(queries[:, None, :] - gallery_encodings[None, :, :], axis=2)
+
+
+def test_match_returns_k_nearest_in_order(encodings):
+    gallery = FaceGallery(encodings, range(len(encodings)))
+    queries = encodings[[3, 50, 199]] + 0.01
+
+    indices, distances = gallery.match(queries, k=5)
+
+    expected = brute_force(encodings, queries)
+    assert indices.shape == distances.shape == (3, 5)
+    assert np.array_equal(indices, np.argsort(expected, axis=1)[:, :5])
+    assert np.allclose(distances, np.sort(expected, axis=1)[:, :5])
+    assert np.array_equal(indices[:, 0], [3, 50, 199])
+
+
+def test_match_caps_k_at_gallery_size(encodings):
+    gallery = FaceGallery(encodings[:3], ['a', 'b', 'c'])
+    indices, distances = gallery.match(encodings[:1], k=10)
+    assert indices.shape == (1, 3)
+    assert np.all(np.diff(distances[0]) >= 0)
+
+
+def test_identify_applies_tolerance(encodings):
+    gallery = FaceGallery(encodings, [f"S{i}" for i in range(len(encodings))],
+                          [f"name {i}" for i in range(len(encodings))])
+    near = encodings[7] + 0.001
+    far = -encodings[7]
+
+    match, miss = gallery.identify([near, far], tolerance=0.6)
+
+    assert match[:2] == ('S7', 'name 7')
+    assert match[2] == pytest.approx(np.linalg.norm(near - encodings[7]), abs=1e-6)
+    assert miss is None
+
+
+def test_empty_gallery_matches_nothing(encodings):
+    gallery = FaceGallery([], [])
+    assert len(gallery) == 0
+    assert gallery.identify(encodings[:2]) == [None, None]
+    indices, _ = gallery.match(encodings[:2])
+    assert indices.shape == (2, 0)
+
+
+def test_float32_input_stays_float32(encodings):
+    assert FaceGallery(encodings.astype(np.float32), range(len(encodings))).encodings.dtype == np.float32
+    assert FaceGallery(encodings, range(len(encodings))).encodings.dtype == np.float64
+
+
+def test_gallery_is_read_only(encodings):
+    gallery = FaceGallery(encodings, range(len(encodings)))
+    with pytest.raises(ValueError):
+        gallery.encodings[0, 0] = 1.0
+
+
+def test_with_changes_swap_removes_and_upserts(encodings):
+    ids = ['a', 'b', 'c', 'd']
+    gallery = FaceGallery(encodings[:4], ids)
+    new_encoding = encodings[10]
+
+    updated = gallery.with_changes(upserts=[('b', 'Bee', new_encoding), ('e', 'e', encodings[11])],
+                                   removed_ids=['a'])
+
+    # The last row moved into the hole left by 'a'
+    assert updated.ids == ('d', 'b', 'c', 'e')
+    assert updated.names == ('d', 'Bee', 'c', 'e')
+    assert np.allclose(updated.encodings[0], encodings[3])
+    assert np.allclose(updated.encodings[1], new_encoding)
+    assert 'a' not in updated and 'e' in updated
+    assert [match[0] for match in updated.identify(encodings[[3, 10, 11]])] == ['d', 'b', 'e']
+    # The original snapshot is untouched
+    assert gallery.ids == tuple(ids)
+    assert np.allclose(gallery.encodings[1], encodings[1])
+
+
+def test_with_changes_returns_same_gallery_when_nothing_changed(encodings):
+    gallery = FaceGallery(encodings[:4], ['a', 'b', 'c', 'd'])
+    assert gallery.with_changes(upserts=[('b', 'b', encodings[1])], removed_ids=['zz']) is gallery
+
+
+def test_indexed_gallery_matches_brute_force_with_all_lists_probed():
+    encodings = unit_vectors(MIN_TRAINING_ROWS, seed=3)
+    exact = FaceGallery(encodings, range(len(encodings)))
+    indexed = FaceGallery(encodings, range(len(encodings)), index=IVFIndex(n_lists=8, n_probe=8))
+    queries = encodings[::50] + 0.02
+
+    assert len(indexed.index) == len(encodings)
+    assert np.array_equal(indexed.match(queries, k=3)[0], exact.match(queries, k=3)[0])
+
+
+def test_indexed_gallery_follows_changes():
+    encodings = unit_vectors(MIN_TRAINING_ROWS + 100, seed=4)
+    gallery = FaceGallery(encodings[:MIN_TRAINING_ROWS], range(MIN_TRAINING_ROWS),
+                          index=IVFIndex(n_lists=4, n_probe=4))
+
+    updated = gallery.with_changes(upserts=[(5000, 5000, encodings[-1])], removed_ids=[0, 5])
+
+    assert updated.index.centroids is gallery.index.centroids
+    assert len(updated.index) == len(updated) == MIN_TRAINING_ROWS - 1
+    assert updated.identify(encodings[[-1]])[0][0] == 5000
+    assert updated.identify(encodings[[0]], tolerance=0.1) == [None]
+
+
+def test_small_gallery_is_searched_exactly_until_the_index_can_be_trained():
+    encodings = unit_vectors(MIN_TRAINING_ROWS + 50, seed=5)
+    gallery = FaceGallery(encodings[:10], range(10), index=IVFIndex())
+
+    assert not gallery.index.is_trained
+    assert gallery.identify(encodings[[3]])[0][0] == 3
+
+    # Registrations arriving as deltas train the index once there are enough
+    grown = gallery.with_changes(upserts=[(row, row, encodings[row]) for row in range(10, len(encodings))])
+
+    assert grown.index.is_trained and grown.index.trained_rows == len(encodings)
+    assert len(grown.index) == len(grown)
+    assert grown.index.n_lists == int(4 * np.sqrt(len(encodings)))
+    assert [match[0] for match in grown.identify(encodings[[3, 1060]])] == [3, 1060]
+
+
+def test_index_is_retrained_after_the_gallery_grows():
+    encodings = unit_vectors(RETRAIN_GROWTH * MIN_TRAINING_ROWS, seed=6)
+    gallery = FaceGallery(encodings[:MIN_TRAINING_ROWS], range(MIN_TRAINING_ROWS), index=IVFIndex())
+    upserts = [(row, row, encodings[row]) for row in range(MIN_TRAINING_ROWS, len(encodings))]
+
+    almost = gallery.with_changes(upserts=upserts[:-1])
+    grown = gallery.with_changes(upserts=upserts)
+
+    assert almost.index.centroids is gallery.index.centroids
+    assert grown.index.trained_rows == len(encodings) and grown.index.n_lists > gallery.index.n_lists
+    assert [match[0] for match in grown.identify(encodings[[7, 4000]])] == [7, 4000]
+
+
+def test_nbytes_counts_matrix_and_norms(encodings):
+    gallery = FaceGallery(encodings, range(len(encodings)))
+    assert gallery.nbytes == encodings.nbytes + len(encodings) * 8
@@ -0,0 +1,101 @@
+from face_gallery import FaceGallery
+from face_tracker import FaceTracker
+from conftest import unit_vectors
+
+BOX = (100, 200, 200, 100)
+
+
+class Scene:
+    """Encoder double: whoever stands at a box, and the encoder calls made"""
+
+    def __init__(self, encodings):
+        self.encodings = encodings
+        self.standing = {}
+        self.calls = []
+
+    def encode(self, locations):
+        self.calls.append(list(locations))
+        return [self.encodings[self.standing[location]] for location in locations]
+
+
+def setup(count=3, **options):
+    encodings = unit_vectors(count, seed=11)
+    gallery = FaceGallery(encodings, [f"S{i}" for i in range(count)])
+    return FaceTracker(**options), Scene(encodings), gallery
+
+
+def test_confirmed_face_is_only_reverified_periodically():
+    tracker, scene, gallery = setup(reverify_every=4)
+    scene.standing[BOX] = 0
+
+    ids = [tracker.identify([BOX], scene.encode, gallery)[0][0] for _ in range(9)]
+
+    assert ids == ['S0'] * 9
+    # Encoded on frames 1, 5 and 9
+    assert len(scene.calls) == 3
+    assert (tracker.encoded, tracker.skipped) == (3, 6)
+
+
+def test_reverification_picks_up_a_changed_identity():
+    tracker, scene, gallery = setup(reverify_every=3)
+    scene.standing[BOX] = 0
+    tracker.identify([BOX], scene.encode, gallery)
+
+    scene.standing[BOX] = 1
+    seen = [tracker.identify([BOX], scene.encode, gallery)[0][0] for _ in range(3)]
+
+    assert seen == ['S0', 'S0', 'S1']
+
+
+def test_track_expires_after_missed_frames():
+    tracker, scene, gallery = setup(max_missed=2)
+    scene.standing[BOX] = 0
+    tracker.identify([BOX], scene.encode, gallery)
+
+    tracker.update([])
+    tracker.update([])
+    assert len(tracker.tracks) == 1
+    tracker.update([])
+    assert tracker.tracks == []
+
+
+def test_new_face_in_an_expired_place_is_encoded_afresh():
+    tracker, scene, gallery = setup(max_missed=2, reverify_every=100)
+    scene.standing[BOX] = 0
+    tracker.identify([BOX], scene.encode, gallery)
+    first = tracker.tracks[0]
+
+    # The student leaves; frames without faces still age the track
+    for _ in range(3):
+        tracker.update([])
+    scene.standing[BOX] = 2
+    match = tracker.identify([BOX], scene.encode, gallery)[0]
+
+    assert match[0] == 'S2'
+    assert tracker.tracks[0] is not first
+
+
+def test_moving_face_keeps_its_track_and_identity():
+    tracker, scene, gallery = setup(reverify_every=100)
+    moved = (130, 230, 230, 130)
+    scene.standing[BOX] = 0
+    tracker.identify([BOX], scene.encode, gallery)
+    track = tracker.tracks[0]
+
+    # Walking across the view, the same student is not re-encoded
+    assert tracker.identify([moved], scene.encode, gallery)[0][0] == 'S0'
+    assert tracker.tracks == [track] and track.box == moved
+    assert len(scene.calls) == 1
+
+
+def test_two_faces_are_handed_their_own_tracks():
+    tracker, scene, gallery = setup(reverify_every=100)
+    other = (100, 500, 200, 400)
+    scene.standing.update({BOX: 0, other: 1})
+
+    tracker.identify([BOX, other], scene.encode, gallery)
+    # Listed in the other order, each box stays with its own track
+    matches = tracker.identify([other, BOX], scene.encode, gallery)
+
+    assert [match[0] for match in matches] == ['S1', 'S0']
+    assert len(scene.calls) == 1 and len(scene.calls[0]) == 2
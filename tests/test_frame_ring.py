@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from frame_ring import FrameRing
+
+SHAPE = (4, 6, 3)
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(SHAPE, slots=3)
+    yield ring
+    ring.close()
+
+
+def frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+def test_latest_returns_newest_frame_read_only(ring):
+    ring.write(frame(1))
+    seq = ring.write(frame(2))
+
+    latest = ring.latest()
+
+    assert latest.seq == seq
+    assert np.all(latest.image == 2)
+    assert not latest.image.flags.writeable
+    ring.release(latest)
+
+
+def test_latest_waits_for_a_newer_frame(ring):
+    seq = ring.write(frame(1))
+    assert ring.latest(after=seq, timeout=0.01) is None
+
+
+def test_pinned_frames_are_never_overwritten(ring):
+    pinned = ring.write(frame(7), pin=True)
+    for value in range(10):
+        ring.write(frame(value))
+
+    kept = ring.get(pinned, pin=False)
+    assert kept is not None and np.all(kept.image == 7)
+
+    ring.release(pinned)
+    for value in range(10):
+        ring.write(frame(value))
+    assert ring.get(pinned) is None
+
+
+def test_write_returns_none_when_every_slot_is_pinned(ring):
+    seqs = [ring.write(frame(value), pin=True) for value in range(3)]
+    assert None not in seqs
+    assert ring.write(frame(9)) is None
+
+    ring.release(seqs[0])
+    assert ring.write(frame(9)) is not None
+
+
+def test_wrong_shape_raises_and_frees_the_slot(ring):
+    with pytest.raises(ValueError):
+        ring.write(np.zeros((2, 2, 3), dtype=np.uint8))
+    seqs = [ring.write(frame(value), pin=True) for value in range(3)]
+    assert None not in seqs
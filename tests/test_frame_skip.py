@@ -0,0 +1,35 @@
+from frame_skip import FrameSkipController
+
+
+def run(controller, frames, interval, processing, latency=None):
+    """Feed ``frames`` camera frames; processed ones report the given timings"""
+    now = 1000.0
+    for _ in range(frames):
+        now += interval
+        if controller.should_process(now):
+            controller.processed(processing, latency)
+
+
+def test_skips_the_configured_number_of_frames():
+    controller = FrameSkipController(initial_skip=2, hold_frames=1000)
+    decisions = [controller.should_process(1000.0 + i / 30) for i in range(9)]
+    assert decisions == [False, False, True] * 3
+
+
+def test_skip_grows_when_processing_is_slower_than_the_frames_it_covers():
+    controller = FrameSkipController(target_latency=0.2, initial_skip=0, max_skip=6, hold_frames=3)
+    run(controller, 300, interval=1 / 30, processing=0.15)
+    assert controller.skip >= 4
+    assert controller.skip <= 6
+
+
+def test_skip_comes_down_with_headroom():
+    controller = FrameSkipController(target_latency=0.2, initial_skip=5, hold_frames=3)
+    run(controller, 600, interval=1 / 30, processing=0.005)
+    assert controller.skip == 0
+
+
+def test_waiting_latency_over_budget_raises_skip():
+    controller = FrameSkipController(target_latency=0.2, initial_skip=1, hold_frames=2)
+    run(controller, 100, interval=1 / 30, processing=0.03, latency=0.4)
+    assert controller.skip > 1
@@ -0,0 +1,116 @@
+import pytest
+
+from gallery_sync import GallerySync, create_sync_schema, TRIGGER_EXISTS_ERRNO
+from conftest import unit_vectors
+
+
+class TriggerExists(Exception):
+    errno = TRIGGER_EXISTS_ERRNO
+
+
+class RecordingCursor:
+    """Answers the information_schema lookup and records the DDL it is given"""
+
+    def __init__(self, existing=(), racing=()):
+        self.existing = list(existing)
+        self.racing = set(racing)
+        self.statements = []
+
+    def execute(self, statement, params=()):
+        statement = ' '.join(statement.split())
+        self.statements.append(statement)
+        for name in self.racing:
+            if statement.startswith(f"CREATE TRIGGER {name} "):
+                raise TriggerExists(name)
+
+    def fetchall(self):
+        return [(name,) for name in self.existing]
+
+    def created(self):
+        return [statement.split()[2] for statement in self.statements
+                if statement.startswith('CREATE TRIGGER')]
+
+
+def test_creates_all_triggers_on_a_fresh_database():
+    cursor = RecordingCursor()
+    create_sync_schema(cursor)
+
+    assert cursor.created() == ['face_encodings_tombstone', 'students_tombstone',
+                                'students_name_touch', 'students_active_touch']
+    assert not any(statement.startswith('DROP') for statement in cursor.statements)
+
+
+def test_existing_triggers_are_left_alone():
+    cursor = RecordingCursor(existing=['face_encodings_tombstone', 'students_tombstone'])
+    create_sync_schema(cursor, track_is_active=False)
+
+    assert cursor.created() == ['students_name_touch']
+
+
+def test_trigger_created_concurrently_is_not_an_error():
+    cursor = RecordingCursor(racing=['students_tombstone'])
+    create_sync_schema(cursor, track_is_active=False)
+
+    assert 'students_name_touch' in cursor.created()
+
+
+def test_other_errors_propagate():
+    class Denied(Exception):
+        errno = 1142
+
+    class DeniedCursor(RecordingCursor):
+        def execute(self, statement, params=()):
+            if statement.lstrip().startswith('CREATE TRIGGER'):
+                raise Denied()
+            super().execute(statement, params)
+
+    with pytest.raises(Denied):
+        create_sync_schema(DeniedCursor())
+
+
+@pytest.fixture
+def storage(tmp_path):
+    pytest.importorskip('dotenv')
+    from storage import SQLiteStorage
+    storage = SQLiteStorage(str(tmp_path / 'attendance.sqlite3'))
+    for i, encoding in enumerate(unit_vectors(3)):
+        storage.save_student(f"S{i}", f"name {i}", 'cs', encoding)
+    yield storage
+    storage.close()
+
+
+def execute(storage, statement, params=()):
+    with storage.connection() as conn:
+        conn.cursor().execute(statement, params)
+        conn.commit()
+
+
+def test_refresh_applies_upserts_renames_and_deletes(storage, tmp_path, monkeypatch):
+    # The gallery cache goes to FACE_CACHE_DIR, relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    sync = GallerySync(storage.connection)
+    sync.load()
+    assert sorted(sync.gallery.ids) == ['S0', 'S1', 'S2']
+
+    new_encoding = unit_vectors(1, seed=7)[0]
+    storage.save_student('S3', 'name 3', 'ee', new_encoding)
+    execute(storage, "UPDATE students SET name = 'renamed' WHERE student_id = 'S1'")
+    execute(storage, "DELETE FROM students WHERE student_id = 'S0'")
+    sync.refresh()
+
+    gallery = sync.gallery
+    assert sorted(gallery.ids) == ['S1', 'S2', 'S3']
+    assert gallery.names[gallery.ids.index('S1')] == 'renamed'
+    assert gallery.identify([new_encoding])[0][0] == 'S3'
+
+
+def test_deactivated_students_leave_an_active_only_gallery(storage, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sync = GallerySync(storage.connection, active_only=True)
+    sync.load()
+
+    execute(storage, "UPDATE students SET is_active = FALSE WHERE student_id = 'S2'")
+    sync.refresh()
+
+    assert sorted(sync.gallery.ids) == ['S0', 'S1']
+    assert sync.refresh() == 0
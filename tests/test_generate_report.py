@@ -0,0 +1,89 @@
+import zipfile
+from datetime import date, datetime
+
+import pytest
+
+pytest.importorskip('dotenv')
+openpyxl = pytest.importorskip('openpyxl')
+pd = pytest.importorskip('pandas')
+
+from generate_report import (ATTENDANCE_QUERY, ROSTER_QUERY, SUMMARY_COLUMNS, SUMMARY_QUERY,
+                             ExcelReportWriter, SummaryAccumulator, column_widths, write_excel_fast)
+from conftest import unit_vectors
+
+
+def test_summary_counts_statuses_case_insensitively():
+    summary = SummaryAccumulator([('cs', 3), ('ee', 2), (None, 1)])
+    summary.add([('S1', 'cs', 'Present'), ('S2', 'cs', 'late'), ('S3', 'cs', 'present'),
+                 ('S4', None, 'ABSENT'), ('S5', 'cs', 'excused')], 1, 2)
+
+    rows = summary.rows()
+
+    assert rows[0] == [None, 1, 0, 1, 0, 0.0]
+    assert rows[1][:5] == ['cs', 3, 2, 0, 1]
+    assert rows[1][5] == pytest.approx(200 / 3)
+    # Departments without marks keep their roster size and no percentage
+    assert rows[2] == ['ee', 2, 0, 0, 0, None]
+
+
+def test_column_widths_from_longest_value_or_header():
+    widths = column_widths(['id', 'name', 'notes'], [('S1', 'A much longer name', None), ('S22', 'B', None)])
+    assert widths == [(3 + 2) * 1.2, (18 + 2) * 1.2, (5 + 2) * 1.2]
+    assert column_widths(['id'], []) == [(2 + 2) * 1.2]
+
+
+def test_summary_query_agrees_with_streamed_counts(tmp_path):
+    from storage import SQLiteStorage
+    storage = SQLiteStorage(str(tmp_path / 'attendance.sqlite3'))
+    for i, encoding in enumerate(unit_vectors(4)):
+        storage.save_student(f"S{i}", f"name {i}", 'cs' if i < 3 else 'ee', encoding)
+    # The CLIs write capitalised statuses
+    storage.mark_attendance('S0', datetime(2025, 3, 3, 9, 0), 'Present')
+    storage.mark_attendance('S1', datetime(2025, 3, 3, 9, 5), 'present')
+    storage.mark_attendance('S2', datetime(2025, 3, 3, 9, 30), 'Late')
+    period = (date(2025, 3, 1), date(2025, 3, 31))
+
+    with storage.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(SUMMARY_QUERY, period)
+        queried = [list(row) for row in cursor.fetchall()]
+        cursor.execute(ROSTER_QUERY)
+        summary = SummaryAccumulator(cursor.fetchall())
+        cursor.execute(ATTENDANCE_QUERY, period)
+        summary.add(cursor.fetchall(), 2, 5)
+    storage.close()
+
+    assert queried == [['cs', 3, 2, 0, 1], ['ee', 1, 0, 0, 0]]
+    assert [row[:5] for row in summary.rows()] == queried
+
+
+def test_details_continue_on_a_new_sheet_at_the_row_limit(tmp_path):
+    path = tmp_path / 'report.xlsx'
+    excel = ExcelReportWriter(str(path), max_rows=4)
+    excel.add_rows(['id', 'n'], [('S1', 1), ('S2', 2)])
+    excel.add_rows(['id', 'n'], [('S3', 3), ('S4', 4), ('S5', 5)])
+    excel.write_summary(['department'], [('cs',)])
+    excel.save()
+
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    sheets = {name: list(workbook[name].values) for name in workbook.sheetnames}
+
+    assert list(sheets) == ['Attendance Details', 'Attendance Details 2', 'Summary Statistics']
+    assert sheets['Attendance Details'] == [('id', 'n'), ('S1', 1), ('S2', 2), ('S3', 3)]
+    assert sheets['Attendance Details 2'] == [('id', 'n'), ('S4', 4), ('S5', 5)]
+
+
+def test_fast_excel_leaves_missing_percentages_blank(tmp_path):
+    path = tmp_path / 'report.xlsx'
+    details = pd.DataFrame([('S1', 'cs', 'present', None)], columns=['id', 'department', 'status', 'notes'])
+    summary = pd.DataFrame([['cs', 3, 1, 0, 0, 100.0], ['ee', 2, 0, 0, 0, float('nan')]],
+                           columns=SUMMARY_COLUMNS)
+
+    write_excel_fast(str(path), details, summary)
+
+    with zipfile.ZipFile(path) as archive:
+        for name in archive.namelist():
+            if name.startswith('xl/worksheets/'):
+                assert b'<v />' not in archive.read(name)
+    sheet = openpyxl.load_workbook(path)['Summary Statistics']
+    assert [cell.value for cell in sheet[3]] == ['ee', 2, 0, 0, 0, None]
@@ -0,0 +1,82 @@
+import pytest
+
+import metrics as metrics_module
+from metrics import Metrics, RollingHistogram
+
+
+class Clock:
+    """Stands in for the time module inside metrics"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_percentiles_are_within_a_bucket():
+    histogram = RollingHistogram(window=60)
+    for ms in range(1, 101):
+        histogram.record(ms)
+
+    summary = histogram.summary()
+
+    assert summary['count'] == summary['total'] == 100
+    assert summary['p50_ms'] == pytest.approx(50, rel=0.2)
+    assert summary['p99_ms'] == pytest.approx(99, rel=0.2)
+
+
+def test_old_slices_age_out_of_the_window(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(metrics_module, 'time', clock)
+    histogram = RollingHistogram(window=60, slices=6)
+    histogram.record(5)
+
+    clock.now += 30
+    histogram.record(500)
+    assert histogram.summary()['count'] == 2
+
+    clock.now += 40
+    summary = histogram.summary()
+    assert (summary['count'], summary['total']) == (1, 2)
+    assert summary['p50_ms'] == pytest.approx(500, rel=0.2)
+
+
+def test_empty_stage_has_no_percentiles():
+    assert RollingHistogram().summary()['p50_ms'] is None
+
+
+def test_status_line_summarises_one_snapshot(monkeypatch):
+    metrics = Metrics()
+    for _ in range(10):
+        metrics.observe('detect', 0.020)
+        metrics.observe('latency', 0.100)
+    metrics.count('gate_checks', 4)
+    metrics.count('gate_skipped', 1)
+    snapshots = []
+    snapshot = metrics.snapshot
+    monkeypatch.setattr(metrics, 'snapshot', lambda: snapshots.append(1) or snapshot())
+
+    line = metrics.status_line()
+
+    assert len(snapshots) == 1
+    parts = line.split(" | ")
+    assert parts[0].endswith(" fps")
+    assert parts[1].startswith("detect ") and parts[2].startswith("latency ")
+    assert parts[-1] == "gate skip 25%"
+
+
+def test_status_line_without_samples():
+    assert Metrics().status_line() == "0.0 fps"
+
+
+def test_render_text_lists_stages_and_counters():
+    metrics = Metrics()
+    metrics.observe('match', 0.002)
+    metrics.count('frames', 3)
+
+    text = metrics.render_text()
+
+    assert 'face_stage_latency_ms{stage="match",quantile="0.50"}' in text
+    assert 'face_stage_total{stage="match"} 1' in text
+    assert 'face_frames_total 3' in text
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('cv2')
+
+from motion_gate import MotionGate
+
+
+def test_static_scene_closes_after_hold_frames_and_motion_reopens():
+    gate = MotionGate(hold_frames=3)
+    still = np.full((120, 160, 3), 80, dtype=np.uint8)
+
+    results = [gate.check(still) for _ in range(5)]
+    assert results == [True, True, True, False, False]
+    assert gate.skipped == 2 and gate.checks == 5
+
+    moved = still.copy()
+    moved[20:100, 40:120] = 250
+    assert gate.check(moved) is True
+    assert gate.is_open
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('face_recognition')
+
+from multi_camera import FrameSource, MultiCameraHost, parse_source
+from recognition_pipeline import FrameResult
+
+
+class FakePipeline:
+    """Accepts up to ``capacity`` frames and hands back queued results"""
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.frames = []
+        self.results = []
+
+    def submit(self, frame, timestamp=None):
+        if len(self.frames) >= self.capacity:
+            return None
+        self.frames.append(frame)
+        return len(self.frames) - 1
+
+    def get(self, timeout=None):
+        return self.results.pop(0) if self.results else None
+
+
+def host_with(names, capacity=100, frame_shape=None, **options):
+    sources = [FrameSource(name) for name in names]
+    host = MultiCameraHost(sources, lambda: None, **options)
+    host.pipeline = FakePipeline(capacity)
+    host.frame_shape = frame_shape
+    return host
+
+
+def show(source, number, shape=(4, 4, 3)):
+    source.latest = (number, 100.0 + number, np.zeros(shape, dtype=np.uint8))
+
+
+def test_sources_take_turns():
+    host = host_with(['a', 'b', 'c'])
+    for source in host.sources:
+        show(source, 1)
+
+    turns = [host._schedule_turn(turn, 3) for turn in (0, 1, 2)]
+
+    assert turns == [0, 1, 2]
+    assert [host._pending[seq].name for seq in range(3)] == ['a', 'b', 'c']
+
+
+def test_busy_source_is_skipped_until_its_frames_come_back():
+    host = host_with(['a', 'b'], max_in_flight=1)
+    a, b = host.sources
+    show(a, 1)
+    assert host._schedule_turn(0, 2) == 0
+
+    show(a, 2)
+    show(b, 1)
+    # 'a' already has its one frame in flight, so 'b' is served even on a's turn
+    assert host._schedule_turn(0, 2) == 1
+    assert host._schedule_turn(0, 2) is None
+    assert host.stats['a'].in_flight == host.stats['b'].in_flight == 1
+
+
+def test_frames_replaced_before_their_turn_count_as_skipped():
+    host = host_with(['a'])
+    source = host.sources[0]
+    show(source, 1)
+    host._schedule_turn(0, 1)
+    show(source, 5)
+    host._schedule_turn(0, 1)
+
+    stats = host.stats['a']
+    assert (stats.submitted, stats.skipped, stats.last_submitted) == (2, 3, 5)
+    # Nothing new to send
+    assert host._schedule_turn(0, 1) is None
+
+
+def test_full_pipeline_leaves_the_frame_for_next_time():
+    host = host_with(['a'], capacity=0)
+    show(host.sources[0], 1)
+
+    assert host._schedule_turn(0, 1) is None
+    assert host.stats['a'].last_submitted == 0 and host.stats['a'].in_flight == 0
+
+
+def test_frames_of_another_size_are_resized_or_rejected():
+    host = host_with(['a', 'b'], frame_shape=(4, 4, 3))
+    a, b = host.sources
+    show(a, 1, shape=(8, 6, 3))
+    show(b, 1, shape=(4, 4))
+
+    host._schedule_turn(0, 2)
+    host._schedule_turn(1, 2)
+
+    assert [frame.shape for frame in host.pipeline.frames] == [(4, 4, 3)]
+    assert host.stats['a'].resized == 1
+    assert host.stats['b'].rejected == 1 and host.stats['b'].last_submitted == 1
+    assert host.stats['b'].submitted == 0
+
+
+def test_results_are_credited_to_their_source():
+    marks = []
+    host = host_with(['a', 'b'], on_match=lambda name, match, _: marks.append((name, match[0])) or True)
+    for source in host.sources:
+        show(source, 1)
+    host._schedule_turn(0, 2)
+    host._schedule_turn(1, 2)
+    host.pipeline.results = [
+        FrameResult(0, 101.0, [(0, 1, 1, 0)], [None]),
+        FrameResult(1, 101.0, [(0, 1, 1, 0), (2, 3, 3, 2)], [('S1', 'Asha', 0.3), ('S2', 'Ben', 0.4)]),
+    ]
+    host._drained.set()
+
+    host._collect()
+
+    assert marks == [('b', 'S1'), ('b', 'S2')]
+    a, b = host.stats['a'], host.stats['b']
+    assert (a.processed, a.faces, a.recognized, a.in_flight) == (1, 1, 0, 0)
+    assert (b.processed, b.faces, b.recognized, b.marked) == (1, 2, 2, 2)
+    assert host._pending == {}
+
+
+def test_parse_source_reads_an_optional_budget():
+    camera = parse_source('0@2.5')
+    assert (camera.spec, camera.budget) == ('0', 2.5)
+    assert parse_source('videos/door@night.mp4', default_budget=4).budget == 4
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from face_gallery import FaceGallery
+from pq_gallery import PQGallery, ProductQuantizer, MIN_TRAINING_ROWS, RETRAIN_GROWTH
+from conftest import unit_vectors
+
+
+@pytest.fixture(scope='module')
+def enrolled():
+    encodings = unit_vectors(3000, seed=5).astype(np.float32)
+    rng = np.random.default_rng(6)
+    rows = rng.choice(len(encodings), 100, replace=False)
+    jitter = rng.standard_normal((100, 128))
+    queries = encodings[rows] + 0.3 * jitter / np.linalg.norm(jitter, axis=1, keepdims=True)
+    return encodings, queries, rows
+
+
+@pytest.mark.parametrize('n_subquantizers', [8, 16])
+def test_recall_against_brute_force(enrolled, n_subquantizers):
+    encodings, queries, rows = enrolled
+    exact = FaceGallery(encodings, range(len(encodings)))
+    compressed = PQGallery(encodings, range(len(encodings)), n_subquantizers=n_subquantizers, rerank=32)
+
+    found, distances = compressed.match(queries, k=1)
+
+    assert np.mean(found[:, 0] == exact.match(queries, k=1)[0][:, 0]) >= 0.98
+    assert np.mean(found[:, 0] == rows) >= 0.98
+    # Re-ranked distances are exact up to the float16 cache
+    assert np.allclose(distances[:, 0], np.linalg.norm(queries - encodings[found[:, 0]], axis=1), atol=5e-3)
+
+
+def test_table_distances_approximate_true_distances(enrolled):
+    encodings, queries, _ = enrolled
+    quantizer = ProductQuantizer(16)
+    quantizer.train(encodings)
+
+    approx = np.sqrt(quantizer.sq_distances(quantizer.encode(encodings), queries[:5]))
+
+    true = np.linalg.norm(queries[:5, None, :] - encodings[None], axis=2)
+    assert np.mean(np.abs(approx - true)) < 0.1
+
+
+def test_memory_is_codes_plus_float16_cache(enrolled):
+    encodings, _, _ = enrolled
+    compressed = PQGallery(encodings, range(len(encodings)), n_subquantizers=16, rerank=32)
+    codes_only = PQGallery(encodings, range(len(encodings)), n_subquantizers=16, rerank=0)
+
+    assert compressed.codes.shape == (16, len(encodings)) and compressed.codes.dtype == np.uint8
+    assert compressed.nbytes == codes_only.nbytes + len(encodings) * 128 * 2
+    assert codes_only.nbytes == 16 * len(encodings) + 16 * 256 * 8 * 4
+
+
+def test_identify_and_changes(enrolled):
+    encodings, _, _ = enrolled
+    ids = [f"S{i}" for i in range(1200)]
+    gallery = PQGallery(encodings[:1200], ids, n_subquantizers=16)
+
+    updated = gallery.with_changes(upserts=[('S1', 'renamed', encodings[1500]), ('NEW', 'new', encodings[2000])],
+                                   removed_ids=['S0'])
+
+    assert updated.quantizer is gallery.quantizer
+    assert len(updated) == 1200 and 'S0' not in updated
+    assert [match[:2] for match in updated.identify(encodings[[1500, 2000, 2]])] == [
+        ('S1', 'renamed'), ('NEW', 'new'), ('S2', 'S2')]
+    assert updated.identify(encodings[[0]], tolerance=0.1) == [None]
+    assert updated.with_changes(upserts=[('S2', 'S2', encodings[2])]) is updated
+
+
+def test_empty_start_learns_full_codebooks_from_deltas(enrolled):
+    encodings, queries, rows = enrolled
+    ids = [f"S{i}" for i in range(len(encodings))]
+    gallery = PQGallery([], [], n_subquantizers=16)
+
+    # A first registration is searched exactly, not coded with a 1-code codebook
+    gallery = gallery.with_changes(upserts=[(ids[0], ids[0], encodings[0])])
+    assert not gallery.quantizer.is_trained and gallery.codes is None
+    assert gallery.identify(encodings[[0]])[0][0] == 'S0'
+
+    # Then registrations keep arriving as GallerySync deltas
+    trained_at = []
+    for start in range(1, len(encodings), 100):
+        upserts = [(ids[row], ids[row], encodings[row]) for row in range(start, min(start + 100, len(encodings)))]
+        previous, gallery = gallery, gallery.with_changes(upserts=upserts)
+        if gallery.quantizer is not previous.quantizer:
+            trained_at.append(len(gallery))
+
+    # Trained once, by the first delta that reached MIN_TRAINING_ROWS
+    assert len(trained_at) == 1 and MIN_TRAINING_ROWS <= trained_at[0] < MIN_TRAINING_ROWS + 100
+    assert gallery.quantizer.codebooks.shape == (16, 256, 8)
+    assert gallery.codes.shape == (16, len(encodings))
+    assert np.mean([match[0] for match in gallery.identify(queries)] == np.array(ids)[rows]) >= 0.98
+
+
+def test_codebooks_are_relearned_after_the_gallery_grows():
+    encodings = unit_vectors(RETRAIN_GROWTH * 1100, seed=8).astype(np.float32)
+    gallery = PQGallery(encodings[:1100], range(1100), n_subquantizers=16)
+    upserts = [(row, row, encodings[row]) for row in range(1100, len(encodings))]
+
+    almost = gallery.with_changes(upserts=upserts[:-1])
+    grown = gallery.with_changes(upserts=upserts)
+
+    assert almost.quantizer is gallery.quantizer
+    assert grown.quantizer is not gallery.quantizer and grown.quantizer.trained_rows == len(encodings)
+    assert [match[0] for match in grown.identify(encodings[[5, 4000]])] == [5, 4000]
+
+
+def test_codes_only_gallery_keeps_its_codebooks(enrolled):
+    encodings, _, _ = enrolled
+    gallery = PQGallery(encodings[:1100], range(1100), n_subquantizers=16, rerank=0)
+
+    grown = gallery.with_changes(upserts=[(row, row, encodings[row]) for row in range(1100, 3000)])
+
+    assert grown.quantizer is gallery.quantizer and grown.vectors is None
+
+
+def test_subquantizers_must_divide_the_dimension():
+    with pytest.raises(ValueError):
+        ProductQuantizer(7)
@@ -0,0 +1,91 @@
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip('face_recognition')
+
+from face_gallery import FaceGallery
+from recognition_pipeline import RecognitionPipeline
+from conftest import unit_vectors
+
+SHAPE = (4, 4, 3)
+
+
+def frame(value=0):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+def take(pipeline):
+    """Stand in for a detect worker picking up the next queued frame"""
+    return pipeline._frame_queue.get(timeout=5)
+
+
+def collect(pipeline, results):
+    """Run the collector on hand-made worker results until it has released them all"""
+    collector = threading.Thread(target=pipeline._collect, daemon=True)
+    collector.start()
+    for result in results:
+        pipeline._result_queue.put(result)
+    released = [pipeline.get(timeout=10) for _ in range(len(pipeline._submitted))]
+    pipeline._result_queue.put(None)
+    collector.join(timeout=10)
+    return released
+
+
+def test_submit_returns_none_when_the_queue_is_full():
+    pipeline = RecognitionPipeline(lambda: None, queue_size=1, frame_shape=SHAPE)
+    try:
+        assert pipeline.submit(frame(), 1.0) == 0
+        assert pipeline.submit(frame(), 2.0) is None
+        assert list(pipeline._submitted) == [0]
+
+        take(pipeline)
+        assert pipeline.submit(frame(), 3.0) == 1
+        # The rejected frame used up a ring seq, so the two numberings differ
+        assert pipeline._submitted[1] == (3.0, 2)
+    finally:
+        pipeline._ring.close()
+
+
+def test_results_are_released_in_submission_order():
+    encodings = unit_vectors(3, seed=2)
+    gallery = FaceGallery(encodings, ['S0', 'S1', 'S2'])
+    pipeline = RecognitionPipeline(lambda: gallery, queue_size=4, scale=0.25)
+    for timestamp in (1.0, 2.0, 3.0):
+        pipeline.submit(frame(), timestamp)
+
+    released = collect(pipeline, [(2, 3.0, [], []),
+                                  (0, 1.0, [], []),
+                                  (1, 2.0, [(1, 2, 3, 0)], [encodings[1]])])
+
+    assert [result.seq for result in released] == [0, 1, 2]
+    assert [result.timestamp for result in released] == [1.0, 2.0, 3.0]
+    assert released[1].face_locations == [(4, 8, 12, 0)]
+    assert released[1].matches[0][0] == 'S1'
+    assert pipeline._submitted == {}
+
+
+def test_lost_frame_is_skipped_and_its_ring_slot_freed():
+    pipeline = RecognitionPipeline(lambda: None, detect_workers=1, queue_size=2,
+                                   frame_shape=SHAPE, lost_after=0)
+    ring = pipeline._ring
+    try:
+        assert pipeline.submit(frame(), 1.0) == 0
+        assert pipeline.submit(frame(), 2.0) == 1
+        assert pipeline.submit(frame(), 3.0) is None
+        first, second = take(pipeline), take(pipeline)
+        assert pipeline.submit(frame(), 4.0) == 2
+        take(pipeline)  # The worker holding frame 2 dies before finishing it
+
+        # Workers release their pin once a frame is detected
+        ring.release(first[2])
+        ring.release(second[2])
+        released = collect(pipeline, [(0, 1.0, [], []), (1, 2.0, [], [])])
+
+        assert [(result.seq, result.timestamp, result.face_locations) for result in released] == \
+            [(0, 1.0, []), (1, 2.0, []), (2, 4.0, [])]
+        # Every slot can be pinned again, so no pin was leaked
+        assert all(ring.write(frame(), pin=True) is not None for _ in range(ring.slots))
+    finally:
+        ring.close()
@@ -0,0 +1,54 @@
+from roi_planner import RegionPlanner, merge_regions, zones_from_env
+
+SHAPE = (480, 640, 3)
+
+
+def test_first_plan_is_a_full_scan():
+    planner = RegionPlanner(full_scan_every=10)
+    assert planner.plan(SHAPE, [(100, 200, 200, 100)]) is None
+    assert planner.full_scans == 1
+
+
+def test_regions_are_expanded_track_boxes_and_zones():
+    planner = RegionPlanner(zones=[(0, 0, 0.25, 1)], expand=0.5, full_scan_every=10)
+    planner.plan(SHAPE, [])
+
+    regions = planner.plan(SHAPE, [(100, 400, 200, 300)])
+
+    assert sorted(regions) == sorted([(50, 450, 250, 250), (0, 160, 480, 0)])
+    assert planner.region_scans == 1
+
+
+def test_periodic_full_scan():
+    planner = RegionPlanner(full_scan_every=3)
+    plans = [planner.plan(SHAPE, [(100, 200, 200, 100)]) for _ in range(7)]
+    assert [plan is None for plan in plans] == [True, False, False, True, False, False, True]
+
+
+def test_lost_track_forces_full_scan():
+    planner = RegionPlanner(full_scan_every=100)
+    planner.plan(SHAPE, [])
+    regions = planner.plan(SHAPE, [(100, 200, 200, 100), (300, 500, 400, 400)])
+
+    planner.update(regions, [(100, 200, 200, 100)])
+
+    assert planner.plan(SHAPE, [(100, 200, 200, 100)]) is None
+
+
+def test_nothing_to_focus_on_means_full_scan():
+    planner = RegionPlanner(full_scan_every=100)
+    planner.plan(SHAPE, [])
+    assert planner.plan(SHAPE, []) is None
+
+
+def test_merge_regions_unions_overlaps_only():
+    merged = merge_regions([(0, 100, 100, 0), (50, 150, 150, 50), (300, 400, 400, 300)])
+    assert sorted(merged) == [(0, 150, 150, 0), (300, 400, 400, 300)]
+
+
+def test_zones_from_env(monkeypatch):
+    monkeypatch.setenv('FACE_ENTRANCE_ZONES', '0,0.2,0.35,1; bad ;0.8,0.2,1,1')
+    monkeypatch.setenv('FACE_ENTRANCE_ZONES_2', '0,0,1,0.5')
+    assert zones_from_env() == [(0, 0.2, 0.35, 1), (0.8, 0.2, 1, 1)]
+    assert zones_from_env(2) == [(0, 0, 1, 0.5)]
+    assert zones_from_env(1) == zones_from_env()
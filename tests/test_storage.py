@@ -0,0 +1,104 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+pytest.importorskip('dotenv')
+
+from encoding_format import decode
+from storage import SQLiteStorage, to_sqlite, upgrade_mysql_schema
+from conftest import unit_vectors
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'attendance.sqlite3'))
+    storage.save_student('S1', 'Asha', 'cs', unit_vectors(1, seed=1)[0])
+    storage.save_student('S2', 'Ben', 'ee', unit_vectors(1, seed=2)[0])
+    yield storage
+    storage.close()
+
+
+class ColumnsCursor:
+    """Answers the information_schema column lookup and records the ALTERs"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.statements = []
+
+    def execute(self, statement, params=()):
+        self.statements.append(' '.join(statement.split()))
+
+    def fetchall(self):
+        return list(self.columns)
+
+
+def test_upgrade_adds_sync_columns_to_the_original_schema():
+    # Tables as the first attendance_ui version created them
+    cursor = ColumnsCursor([('students', 'student_id'), ('students', 'name'), ('students', 'department'),
+                            ('face_encodings', 'student_id'), ('face_encodings', 'encoding'),
+                            ('attendance', 'id'), ('attendance', 'student_id'), ('attendance', 'status')])
+
+    added = upgrade_mysql_schema(cursor)
+
+    assert {'students.is_active', 'face_encodings.last_updated', 'attendance.recorded_by'} <= set(added)
+    assert ("ALTER TABLE face_encodings ADD COLUMN last_updated TIMESTAMP "
+            "DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP") in cursor.statements
+
+
+def test_upgrade_leaves_a_current_schema_alone():
+    cursor = ColumnsCursor([('STUDENTS', 'IS_ACTIVE'), ('students', 'email'), ('students', 'phone'),
+                            ('students', 'registration_date'), ('face_encodings', 'last_updated'),
+                            ('attendance', 'recorded_by'), ('attendance', 'notes')])
+
+    assert upgrade_mysql_schema(cursor) == []
+    assert len(cursor.statements) == 1
+
+
+def test_mark_attendance_once_per_day(storage):
+    morning = datetime(2025, 3, 3, 9, 0)
+
+    assert storage.mark_attendance('S1', morning)
+    assert not storage.mark_attendance('S1', morning.replace(hour=15))
+    assert storage.mark_attendance('S1', datetime(2025, 3, 4, 9, 0))
+    assert storage.marked_on(morning.date()) == {'S1'}
+
+
+def test_status_is_stored_lowercase_like_mysql(storage):
+    storage.mark_attendance('S1', datetime(2025, 3, 3, 9, 0), 'Present')
+    storage.mark_attendance('S2', datetime(2025, 3, 3, 9, 5), 'LATE')
+
+    rows = storage.attendance_on(datetime(2025, 3, 3).date())
+
+    assert [(row[0], row[3]) for row in rows] == [('S1', 'present'), ('S2', 'late')]
+
+
+def test_save_student_updates_in_place(storage):
+    encoding = unit_vectors(1, seed=9)[0]
+    storage.save_student('S1', 'Asha K', 'me', encoding)
+
+    with storage.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name, department FROM students WHERE student_id = %s", ('S1',))
+        assert cursor.fetchall() == [('Asha K', 'me')]
+        cursor.execute("SELECT encoding FROM face_encodings WHERE student_id = %s", ('S1',))
+        (blob,), = cursor.fetchall()
+        cursor.execute("SELECT COUNT(*) FROM students")
+        assert cursor.fetchone() == (2,)
+
+    assert np.allclose(decode(blob), encoding, atol=1e-6)
+
+
+@pytest.mark.parametrize('mysql, sqlite', [
+    ("SELECT name FROM students WHERE student_id = %s AND note = '%s'",
+     "SELECT name FROM students WHERE student_id = ? AND note = '%s'"),
+    ("INSERT INTO attendance (student_id) VALUES (%s) ON DUPLICATE KEY UPDATE student_id = student_id",
+     "INSERT INTO attendance (student_id) VALUES (?) ON CONFLICT DO NOTHING"),
+    ("INSERT INTO students (student_id, name) VALUES (%s, %s) ON DUPLICATE KEY UPDATE name = VALUES(name)",
+     "INSERT INTO students (student_id, name) VALUES (?, ?) ON CONFLICT DO UPDATE SET name = excluded.name"),
+    ("SELECT TIME_FORMAT(a.time, '%H:%i:%s') FROM attendance a WHERE d < NOW()",
+     "SELECT a.time FROM attendance a WHERE d < datetime('now', 'localtime')"),
+    ("SELECT CURRENT_TIMESTAMP", "SELECT datetime('now', 'localtime') AS \"now [TIMESTAMP]\""),
+])
+def test_to_sqlite_rewrites(mysql, sqlite):
+    assert to_sqlite(mysql) == sqlite